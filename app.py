@@ -2,34 +2,88 @@
 from __future__ import annotations
 
 import math
-import random
+import os
+import re
+import threading
 import time
-from datetime import date, timedelta
+import uuid
+from collections import deque
 from pathlib import Path
-from typing import Any
+from typing import TYPE_CHECKING, Any, Callable, Iterator, Sequence
 
-import folium
 import streamlit as st
-from streamlit_folium import st_folium
 
-from assets.patients import PATIENTS, get_patient_by_id
+from assets import conversation
+from assets.cache import LRUCache
+from assets.copilot import CopilotBackend, CopilotBackendError, OpenAICompatBackend, ScriptedBackend
+from assets.conversation import batch_deltas, compute_deltas
+from assets.generator import REF_DATE, build_roster_records
+from assets.metrics import EdgeMetrics, RollingWindow, format_rate, format_seconds, instrument_stream
+from assets.mock_server import MockServer
+from assets.patients import PATIENTS
+from assets.ranking import Cursor, RankingOverlay, RosterCounters, RosterRanking, compute_patient_meta, priority_score
+from assets.roster import RosterSnapshot, RosterStore
+from assets.routing import plan_route, walk_km
 from assets.scenario import SCENARIO_STEPS
+from assets.spatial import GridIndex, cluster_cell_deg
+from assets.storage import DEFAULT_DB_PATH, RosterDB, open_roster_db, roster_signature
+from assets.triage import batch_urgency
+
+if TYPE_CHECKING:
+    import folium
 
 APP_TABS = ["Home", "Triage", "Handoff"]
 TRIAGE_STAGES = ["Danger Signs", "Breathing", "Triage", "Referral Packet", "Follow-up"]
 HOME_FILTERS = ["All", "Urgent", "Due today", "New visits", "Overdue"]
+# Compare either hand-picked households or a whole filter cohort, capped at the top COMPARE_LIMIT by priority.
+COMPARE_COHORTS = ["Pick patients", *HOME_FILTERS[1:]]
+COMPARE_LIMIT = 200
+NEARBY_RADIUS_KM = 0.5
+MAP_DEFAULT_ZOOM = 13
+# Rosters at least this large open the Memory Map in clustered viewport mode.
+MAP_CLUSTER_MIN_HOUSEHOLDS = 200
+# Built maps are shared by every session in the process, so this bounds map memory for the whole server.
+MAP_CACHE_SIZE = 32
+# Route stops are the top of the Home list for the active filter; stops past ROUTE_LABEL_MAX get no number marker.
+ROUTE_STOP_OPTIONS = [6, 12, 25, 50, 100, 250, 500, 1000]
+ROUTE_LABEL_MAX = 25
+# The follow-up list renders one window of this many rows; Previous/Next move a cursor instead of growing the list.
+HOME_PAGE_SIZE = 6
+# The sidebar selector offers this many households (top of the priority list, or search matches).
+PATIENT_PICKER_LIMIT = 50
+COPILOT_BACKENDS = ["Scripted", "Local server", "Mock server"]
+COPILOT_BASE_URL = os.environ.get("COPILOT_BASE_URL", "http://127.0.0.1:8080")
+COPILOT_MODEL = os.environ.get("COPILOT_MODEL", "medgemma-4b-it")
+MOCK_TOKENS_PER_SEC = float(os.environ.get("COPILOT_MOCK_TOKENS_PER_SEC", "12"))
+MOCK_TTFT = float(os.environ.get("COPILOT_MOCK_TTFT", "0.9"))
+# Newest messages render as chat bubbles; older ones collapse into one archived block.
+CHAT_LIVE_WINDOW = 8
+CHAT_ARCHIVE_LIMIT = 200
+DUMMY_ROSTER_SIZE = int(os.environ.get("CHW_DUMMY_HOUSEHOLDS", "18"))
+DUMMY_ROSTER_SEED = int(os.environ.get("CHW_DUMMY_SEED", "42"))
+ROSTER_DB_PATH = os.environ.get("CHW_ROSTER_DB", str(DEFAULT_DB_PATH))
+# (label, meta flag) for the Home KPI cards; None counts every assigned household.
 WORKLOAD_KPIS = [
-    ("Assigned households", "145"),
-    ("Follow-ups due this week", "28"),
-    ("Due today", "12"),
-    ("Urgent today", "2"),
-    ("Showing", "Top 6 (prioritized)"),
+    ("Assigned households", None),
+    ("Follow-ups due this week", "due_this_week"),
+    ("Due today", "due_today"),
+    ("Urgent today", "is_urgent"),
 ]
 
 
+@st.cache_resource(show_spinner=False)
+def stylesheet() -> str:
+    # Read and minified once per process; every rerun still has to emit the <style> element.
+    css = (Path(__file__).parent / "assets" / "style.css").read_text(encoding="utf-8-sig")
+    css = re.sub(r"/\*.*?\*/", "", css, flags=re.S)
+    css = re.sub(r"\s+", " ", css)
+    css = re.sub(r"\s*([{};,>])\s*", r"\1", css)
+    css = re.sub(r"([{;][-\w]+):\s+", r"\1:", css)
+    return f"<style>{css.replace(';}', '}').strip()}</style>"
+
+
 def load_css() -> None:
-    css = (Path(__file__).parent / "assets" / "style.css").read_text(encoding="utf-8")
-    st.markdown(f"<style>{css}</style>", unsafe_allow_html=True)
+    st.markdown(stylesheet(), unsafe_allow_html=True)
 
 
 def badge(text: str, color: str) -> str:
@@ -44,186 +98,54 @@ def status_color(status: str) -> str:
     return "blue"
 
 
-def default_patient_state(patient: dict[str, Any]) -> dict[str, Any]:
-    return {
-        "patient_id": patient["id"],
-        "age_months": patient.get("age_months"),
-        "symptoms": [],
-        "seizures": None,
-        "unable_to_drink": None,
-        "vomiting_everything": None,
-        "danger_sign": False,
-        "rr": None,
-        "chest_indrawing": None,
-        "rr_delta": None,
-        "trend": None,
-        "last_visit_summary": patient.get("last_visit_summary"),
-    }
-
-
-def initial_triage() -> dict[str, Any]:
-    return {
-        "classification": "Pending",
-        "color": "yellow",
-        "reasons": ["Awaiting guideline steps"],
-    }
-
-
-def generate_dummy_patients(base_patients: list[dict[str, Any]], n: int = 18, seed: int = 42) -> list[dict[str, Any]]:
-    rng = random.Random(seed)
-    ref_date = date(2026, 2, 14)
-
-    first_names = [
-        "Safa",
-        "Imani",
-        "Kito",
-        "Ayo",
-        "Nia",
-        "Tari",
-        "Mosi",
-        "Zuri",
-        "Kena",
-        "Lela",
-        "Pendo",
-        "Ari",
-        "Jabari",
-        "Nala",
-        "Rafi",
-        "Tamu",
-        "Eshe",
-        "Moyo",
-    ]
-    last_initials = [
-        "Q.", "W.", "E.", "R.", "T.", "Y.", "U.", "I.", "O.",
-        "P.", "A.", "S.", "D.", "F.", "G.", "H.", "J.", "K.",
-    ]
-    avatars = ["🧒", "👦", "👧", "🧑", "👶"]
+@st.cache_resource(show_spinner=False)
+def shared_roster(n: int, seed: int) -> RosterSnapshot:
+    # One immutable catchment per (n, seed) for the whole process; sessions layer their edits on top.
+    return RosterSnapshot(build_roster_records(PATIENTS, n=n, seed=seed))
 
-    dummies: list[dict[str, Any]] = []
-    categories = ["due_today", "overdue", "new_visit", "due_week"]
-    weights = [0.35, 0.30, 0.20, 0.15]
 
-    for i in range(n):
-        template = base_patients[i % len(base_patients)]
-        due_category = rng.choices(categories, weights=weights, k=1)[0]
+@st.cache_resource(show_spinner=False)
+def roster_db(path: str, n: int, seed: int) -> RosterDB:
+    # Households are reloaded only when the generated catchment changes; visit history is kept.
+    signature = roster_signature(len(PATIENTS), n, seed)
+    return open_roster_db(path, shared_roster(n, seed).records, signature, today=REF_DATE)
 
-        overdue_days = rng.randint(1, 5) if due_category == "overdue" else 0
-        is_new = due_category == "new_visit"
-        due_today = due_category == "due_today"
-        due_this_week = due_category in {"due_today", "overdue", "due_week"}
-        follow_up_due = due_this_week
 
-        urgent = (due_category in {"overdue", "due_today"} and rng.random() < 0.38) or (i % 11 == 0)
-        status = "urgent follow-up" if urgent else ("new visit" if is_new else "normal follow-up")
+def device_db() -> RosterDB:
+    return roster_db(ROSTER_DB_PATH, DUMMY_ROSTER_SIZE, DUMMY_ROSTER_SEED)
 
-        rr_last = None if is_new else rng.randint(34, 62)
-        rr_curr = None if rr_last is None else max(26, rr_last + rng.randint(-7, 4))
 
-        if is_new:
-            last_visit_date = None
-            last_visit_summary = "No prior visit. New household in catchment."
-            last_visit_fields: dict[str, Any] = {}
-            current_seed: dict[str, Any] = {}
-        else:
-            last_visit_date = (ref_date - timedelta(days=rng.randint(1, 12))).isoformat()
-            danger_last = urgent and rng.random() < 0.55
-            indrawing_last = urgent and rng.random() < 0.45
-            last_visit_summary = (
-                "Recent respiratory follow-up. "
-                "Continue close reassessment based on local protocol."
-            )
-            last_visit_fields = {
-                "rr": rr_last,
-                "danger_sign": danger_last,
-                "unable_to_drink": danger_last,
-                "vomiting_everything": danger_last and rng.random() < 0.5,
-                "chest_indrawing": indrawing_last,
-            }
-            current_seed = {
-                "rr": rr_curr,
-                "danger_sign": danger_last if due_category != "due_week" else False,
-                "unable_to_drink": danger_last and rng.random() < 0.75,
-                "vomiting_everything": danger_last and rng.random() < 0.45,
-                "chest_indrawing": indrawing_last and rng.random() < 0.7,
-            }
+def roster() -> RosterStore:
+    return st.session_state.roster
 
-        protocol_followup_due = follow_up_due or urgent
-        facility_referral_pending = urgent or (due_category == "overdue" and rng.random() < 0.5)
 
-        name = f"{first_names[i % len(first_names)]} {last_initials[i % len(last_initials)]}"
-        lat = template["lat"] + rng.uniform(-0.0125, 0.0125)
-        lon = template["lon"] + rng.uniform(-0.0125, 0.0125)
+def session_counters(store: RosterStore) -> RosterCounters:
+    """The on-device store's load-time totals, then adjusted by each of this session's adds and updates."""
+    counters = device_db().counters()
+    store.watch(
+        lambda old, new: counters.apply(None if old is None else compute_patient_meta(old), compute_patient_meta(new))
+    )
+    return counters
 
-        dummies.append(
-            {
-                "id": f"d{i + 1:03d}",
-                "pseudonym": name,
-                "age_months": rng.randint(8, 48),
-                "avatar": avatars[i % len(avatars)],
-                "lat": round(lat, 6),
-                "lon": round(lon, 6),
-                "last_visit_date": last_visit_date,
-                "last_visit_summary": last_visit_summary,
-                "last_visit_fields": last_visit_fields,
-                "current_visit_seed": current_seed,
-                "follow_up_due": follow_up_due,
-                "status": status,
-                "due_category": due_category,
-                "overdue_days": overdue_days,
-                "due_today": due_today,
-                "due_this_week": due_this_week,
-                "facility_referral_pending": facility_referral_pending,
-                "protocol_followup_due": protocol_followup_due,
-                "is_dummy": True,
-            }
-        )
 
-    return dummies
+def workload_counters() -> RosterCounters:
+    return st.session_state.workload_counters
 
 
-def all_patients() -> list[dict[str, Any]]:
-    return PATIENTS + st.session_state.dummy_patients
+def all_patients() -> Sequence[dict[str, Any]]:
+    return roster().records
 
 
 def get_patient_by_id_any(patient_id: str) -> dict[str, Any] | None:
-    real = get_patient_by_id(patient_id)
-    if real:
-        return real
-    for patient in st.session_state.dummy_patients:
-        if patient["id"] == patient_id:
-            return patient
-    return None
+    return roster().get(patient_id)
 
-def patient_meta(patient: dict[str, Any]) -> dict[str, Any]:
-    due_category = patient.get("due_category")
-    overdue_days = int(patient.get("overdue_days", 0) or 0)
-
-    is_new = bool(patient.get("status") == "new visit" or patient.get("last_visit_date") is None or due_category == "new_visit")
-    is_urgent = patient.get("status") == "urgent follow-up"
 
-    if due_category == "due_today":
-        due_today = True
-    elif due_category == "overdue":
-        due_today = False
-    else:
-        due_today = bool(patient.get("follow_up_due", False) and not is_new and overdue_days == 0)
-
-    overdue = due_category == "overdue" or overdue_days > 0
-    due_this_week = bool(patient.get("due_this_week", patient.get("follow_up_due", False) or due_today or overdue))
-
-    protocol_due = bool(patient.get("protocol_followup_due", patient.get("follow_up_due", False) or due_today or overdue))
-    referral_pending = bool(patient.get("facility_referral_pending", is_urgent))
-
-    return {
-        "is_new": is_new,
-        "is_urgent": is_urgent,
-        "due_today": due_today,
-        "overdue": overdue,
-        "overdue_days": overdue_days,
-        "due_this_week": due_this_week,
-        "protocol_due": protocol_due,
-        "referral_pending": referral_pending,
-    }
+def patient_meta(patient: dict[str, Any]) -> dict[str, Any]:
+    store = roster()
+    # Cached per (id, version); a stale copy of an edited record is computed as given.
+    if not store.is_current(patient):
+        return compute_patient_meta(patient)
+    return store.meta(patient["id"], compute_patient_meta)
 
 
 def patient_badges(patient: dict[str, Any]) -> list[tuple[str, str]]:
@@ -243,53 +165,67 @@ def patient_badges(patient: dict[str, Any]) -> list[tuple[str, str]]:
 
 
 def patient_priority(patient: dict[str, Any]) -> int:
-    meta = patient_meta(patient)
-    score = 0
-
-    if meta["is_urgent"]:
-        score += 80
-    if meta["overdue"]:
-        score += 60 + min(meta["overdue_days"], 7)
-    if meta["due_today"]:
-        score += 40
-    if meta["due_this_week"]:
-        score += 20
-    if meta["referral_pending"]:
-        score += 14
-    if meta["protocol_due"]:
-        score += 8
-    if meta["is_new"]:
-        score += 4
-
-    return score
-
-
-def matches_home_filter(patient: dict[str, Any], filter_name: str) -> bool:
-    meta = patient_meta(patient)
-
-    if filter_name == "Urgent":
-        return meta["is_urgent"]
-    if filter_name == "Due today":
-        return meta["due_today"]
-    if filter_name == "New visits":
-        return meta["is_new"]
-    if filter_name == "Overdue":
-        return meta["overdue"]
-    return True
+    return priority_score(patient_meta(patient))
+
+
+def roster_ranking() -> RosterRanking | RankingOverlay:
+    store = roster()
+    # Whole-roster builds bypass the meta cache, which only holds records a session actually looked at.
+    base = store.base.derived("ranking", lambda records: RosterRanking(records, compute_patient_meta))
+    if store.pristine:
+        return base
+    # The session keeps only its own edited and added rows; they are merged into the shared order per page.
+    cached = st.session_state.get("roster_ranking")
+    if cached is None or cached[0] != store.revision:
+        rows = {
+            store.position(patient["id"]): (patient["pseudonym"], patient_meta(patient))
+            for patient in (*store.changed.values(), *store.added)
+        }
+        cached = (store.revision, RankingOverlay(base, rows))
+        st.session_state.roster_ranking = cached
+    return cached[1]
+
+
+def spatial_index() -> GridIndex:
+    store = roster()
+    # Edits never move a household, so the shared index holds until the session adds one.
+    if not store.added:
+        return store.base.derived("spatial", GridIndex)
+    cached = st.session_state.get("spatial_index")
+    if cached is None or cached[0] != store.revision:
+        cached = (store.revision, GridIndex(store.records))
+        st.session_state.spatial_index = cached
+    return cached[1]
+
+
+def ordered_home_patients(
+    filter_name: str, limit: int, first_page: list[dict[str, Any]] | None = None
+) -> tuple[list[dict[str, Any]], bool]:
+    """Top limit households; first_page, when the caller already fetched page 1, is reused instead of queried again."""
+    if first_page is not None and len(first_page) >= limit:
+        ordered = first_page[:limit]
+    else:
+        ordered, _ = home_page(filter_name, None, limit)
+    fill_used = filter_name != "All" and workload_counters().filter_count(filter_name) < 6
 
+    return ordered, fill_used
 
-def ordered_home_patients(filter_name: str) -> tuple[list[dict[str, Any]], bool]:
-    ranked = sorted(all_patients(), key=lambda p: (-patient_priority(p), p["pseudonym"]))
 
-    if filter_name == "All":
-        return ranked, False
+def home_page(filter_name: str, cursor: Cursor | None, limit: int) -> tuple[list[dict[str, Any]], Cursor | None]:
+    if roster().pristine:
+        return device_db().page(filter_name, cursor, limit)
+    positions, next_cursor = roster_ranking().page(filter_name, cursor, limit)
+    records = all_patients()
+    return [records[pos] for pos in positions], next_cursor
 
-    matched = [patient for patient in ranked if matches_home_filter(patient, filter_name)]
-    matched_ids = {patient["id"] for patient in matched}
-    remainder = [patient for patient in ranked if patient["id"] not in matched_ids]
-    fill_used = len(matched) < 6
 
-    return matched + remainder, fill_used
+def home_cursors() -> list[Cursor | None]:
+    """Cursors of the pages visited so far; the last one is the visible page. Reset when the filter or roster changes."""
+    key = (st.session_state.home_filter, roster().revision)
+    if st.session_state.get("home_cursor_key") != key:
+        st.session_state.home_cursor_key = key
+        st.session_state.home_cursors = [None]
+    return st.session_state.home_cursors
 
 
 def reset_demo_state(keep_patient: bool = True) -> None:
@@ -297,45 +233,41 @@ def reset_demo_state(keep_patient: bool = True) -> None:
     patient = get_patient_by_id_any(selected) or all_patients()[0]
 
     st.session_state.selected_patient_id = patient["id"]
-    st.session_state.step_idx = -1
-    st.session_state.messages = []
-    st.session_state.patient_state = default_patient_state(patient)
-    st.session_state.guideline_trace_step = "Memory Map"
-    st.session_state.triage_result = initial_triage()
-    st.session_state.demo_running = False
-    st.session_state.demo_complete = False
-    st.session_state.next_actions = []
-    st.session_state.caregiver_message = ""
-    st.session_state.referral_packet = ""
-    st.session_state.show_referral = False
-    st.session_state.show_metrics = False
-    st.session_state.metrics_badges = []
-    st.session_state.timer_end = None
+    seek_to_step(-1, patient)
+
+
+def seek_to_step(step_idx: int, patient: dict[str, Any] | None = None) -> None:
+    """Jump to the state right after SCENARIO_STEPS[step_idx] (-1 = start) without replaying steps.
+
+    The transcript uses the scripted replies; playback pauses and any breathing timer is skipped.
+    """
+    conversation.seek(st.session_state, step_idx, patient or current_patient())
 
 
 def ensure_state() -> None:
-    if "dummy_patients" not in st.session_state:
-        st.session_state.dummy_patients = generate_dummy_patients(PATIENTS, n=18, seed=42)
+    if "roster" not in st.session_state:
+        st.session_state.roster = RosterStore(shared_roster(DUMMY_ROSTER_SIZE, DUMMY_ROSTER_SEED))
+        st.session_state.roster_token = uuid.uuid4().hex
+        st.session_state.workload_counters = session_counters(st.session_state.roster)
 
     if "selected_patient_id" not in st.session_state:
         st.session_state.selected_patient_id = PATIENTS[0]["id"]
 
-    all_ids = {patient["id"] for patient in all_patients()}
-    if st.session_state.selected_patient_id not in all_ids:
+    if st.session_state.selected_patient_id not in roster():
         st.session_state.selected_patient_id = PATIENTS[0]["id"]
 
-    if "compare_patient_a_id" not in st.session_state:
-        st.session_state.compare_patient_a_id = PATIENTS[0]["id"]
-    if "compare_patient_b_id" not in st.session_state:
-        st.session_state.compare_patient_b_id = PATIENTS[1]["id"]
+    if "compare_cohort" not in st.session_state:
+        st.session_state.compare_cohort = COMPARE_COHORTS[0]
+    if "compare_patient_ids" not in st.session_state:
+        st.session_state.compare_patient_ids = [PATIENTS[0]["id"], PATIENTS[1]["id"]]
     if "speed" not in st.session_state:
         st.session_state.speed = 0.6
+    if "copilot_backend" not in st.session_state:
+        st.session_state.copilot_backend = COPILOT_BACKENDS[0]
     if "active_tab" not in st.session_state:
         st.session_state.active_tab = "Home"
     if "home_filter" not in st.session_state:
         st.session_state.home_filter = "All"
-    if "home_show_more" not in st.session_state:
-        st.session_state.home_show_more = False
     if "step_idx" not in st.session_state:
         reset_demo_state(keep_patient=True)
 
@@ -347,110 +279,110 @@ def set_active_tab(tab: str) -> None:
     st.rerun()
 
 
-def generate_copilot_reply(context: dict[str, Any]) -> str:
-    """Placeholder for future MedGemma integration.
+@st.cache_resource
+def local_server_backend(base_url: str, model: str) -> OpenAICompatBackend:
+    # One pooled client per process so keep-alive connections survive reruns and sessions.
+    return OpenAICompatBackend(base_url, model)
 
-    This demo intentionally returns scripted text only.
-    """
-    return context.get("text", "")
 
+@st.cache_resource
+def mock_server_backend(tokens_per_sec: float, ttft: float) -> OpenAICompatBackend:
+    server = MockServer(tokens_per_sec=tokens_per_sec, ttft=ttft).start()
+    return OpenAICompatBackend(server.base_url, server.model)
 
-def role_for_speaker(speaker: str) -> str:
-    return "user" if speaker == "CHW" else "assistant"
 
+def copilot_backend() -> CopilotBackend:
+    choice = st.session_state.copilot_backend
+    if choice == "Local server":
+        return local_server_backend(COPILOT_BASE_URL, COPILOT_MODEL)
+    if choice == "Mock server":
+        return mock_server_backend(MOCK_TOKENS_PER_SEC, MOCK_TTFT)
+    # Spread the old per-message typing delay across the streamed words.
+    return ScriptedBackend(token_delay=typing_delay(st.session_state.speed) / 10)
 
-def apply_step(step: dict[str, Any]) -> None:
-    text = step.get("text", "")
-    if step.get("speaker") == "COPILOT":
-        text = generate_copilot_reply(step)
 
-    st.session_state.messages.append(
-        {
-            "speaker": step["speaker"],
-            "text": text,
-            "trace": step.get("trace", st.session_state.guideline_trace_step),
-        }
-    )
+def edge_metrics() -> EdgeMetrics:
+    if "edge_metrics" not in st.session_state:
+        st.session_state.edge_metrics = EdgeMetrics()
+    return st.session_state.edge_metrics
 
-    st.session_state.guideline_trace_step = step.get("trace", st.session_state.guideline_trace_step)
 
-    for key, value in step.get("updates", {}).items():
-        st.session_state.patient_state[key] = value
+def generate_copilot_reply(context: dict[str, Any]) -> Iterator[str]:
+    """Stream a copilot reply chunk by chunk, timing TTFT, tok/s and total latency."""
+    return instrument_stream(copilot_reply_chunks(context), edge_metrics())
 
-    if step.get("triage_update"):
-        st.session_state.triage_result = step["triage_update"]
 
-    if step.get("next_actions"):
-        st.session_state.next_actions = step["next_actions"]
+def copilot_reply_chunks(context: dict[str, Any]) -> Iterator[str]:
+    # Falls back to the scripted text if the backend fails before its first chunk; a reply cut off
+    # mid-stream keeps what arrived and says so.
+    request = {**context, "history": st.session_state.messages}
+    if st.session_state.copilot_backend == "Mock server":
+        # The mock replays the scripted reply so the demo stays coherent at mock token rates.
+        request["extra_body"] = {"mock_reply": context.get("text", "")}
+
+    emitted = False
+    try:
+        for chunk in copilot_backend().stream(request):
+            emitted = True
+            yield chunk
+    except CopilotBackendError as exc:
+        if emitted:
+            st.toast(f"{exc}. Reply was cut short.")
+            yield "\n\n_(Reply interrupted: the copilot server stopped responding.)_"
+            return
+        st.toast(f"{exc}. Using scripted reply.")
+        yield from ScriptedBackend(token_delay=0).stream(context)
+
+
+def role_for_speaker(speaker: str) -> str:
+    return "user" if speaker == "CHW" else "assistant"
 
-    if step.get("caregiver_message"):
-        st.session_state.caregiver_message = step["caregiver_message"]
 
-    if step.get("referral_packet"):
-        st.session_state.referral_packet = step["referral_packet"]
+def apply_step(step: dict[str, Any], reply: str | None = None) -> None:
+    text = step.get("text", "")
+    if step.get("speaker") == "COPILOT":
+        text = reply if reply is not None else "".join(generate_copilot_reply(step))
+
+    if conversation.apply_step(st.session_state, step, text):
+        record_visit(st.session_state.selected_patient_id)
 
-    ui_event = step.get("ui_event")
-    if ui_event == "show_timer":
-        st.session_state.timer_end = time.time() + float(step.get("timer_seconds", 5))
-    elif ui_event == "show_referral":
-        st.session_state.show_referral = True
-    elif ui_event == "show_metrics":
-        st.session_state.show_metrics = True
-        st.session_state.metrics_badges = step.get("metrics", [])
 
-    if step["id"] == SCENARIO_STEPS[-1]["id"]:
-        st.session_state.demo_complete = True
-        st.session_state.demo_running = False
+def record_visit(patient_id: str) -> None:
+    """Save the finished visit on device and fold it into this session's roster overlay (and so its counters)."""
+    device_db().record_visit(patient_id, st.session_state.patient_state, st.session_state.triage_result)
+    roster().update(
+        patient_id,
+        **conversation.completed_visit(st.session_state.patient_state, st.session_state.triage_result, REF_DATE),
+    )
 
-    st.session_state.step_idx += 1
 
 def timer_active() -> bool:
-    end = st.session_state.timer_end
-    return bool(end and time.time() < end)
+    return conversation.timer_active(st.session_state)
 
 
 def typing_delay(speed: float) -> float:
     return max(0.3, min(0.8, speed))
 
 
-def maybe_apply_next_step() -> str:
-    next_idx = st.session_state.step_idx + 1
-    if next_idx >= len(SCENARIO_STEPS):
-        st.session_state.demo_complete = True
-        st.session_state.demo_running = False
-        return "done"
+def stream_copilot_reply(step: dict[str, Any], stream_slot: Any) -> str:
+    with stream_slot:
+        with st.chat_message("assistant", avatar="🤖"):
+            return st.write_stream(generate_copilot_reply(step))
 
-    step = SCENARIO_STEPS[next_idx]
 
-    # Wait for demo timer before applying RR step.
-    if step["id"] == 10 and timer_active():
-        return "wait_timer"
+def maybe_apply_next_step(stream_slot: Any = None) -> str:
+    status, step = conversation.next_step(st.session_state)
+    if step is None:
+        return status
 
-    if step["speaker"] == "COPILOT":
-        with st.spinner("Copilot is typing..."):
-            time.sleep(typing_delay(st.session_state.speed))
+    reply = None
+    if step["speaker"] == "COPILOT" and stream_slot is not None:
+        reply = stream_copilot_reply(step, stream_slot)
 
-    apply_step(step)
+    apply_step(step, reply)
     return "applied"
 
 
-def compute_deltas(last_fields: dict[str, Any], current_fields: dict[str, Any]) -> dict[str, Any]:
-    deltas: dict[str, Any] = {}
-    rr_last = last_fields.get("rr") if last_fields else None
-    rr_curr = current_fields.get("rr")
-    if rr_last is not None and rr_curr is not None:
-        deltas["rr_delta"] = rr_curr - rr_last
-    else:
-        deltas["rr_delta"] = None
-
-    for key in ["danger_sign", "unable_to_drink", "vomiting_everything", "chest_indrawing"]:
-        if last_fields and key in last_fields and current_fields.get(key) is not None:
-            deltas[key] = f"{last_fields.get(key)} -> {current_fields.get(key)}"
-        else:
-            deltas[key] = "n/a"
-    return deltas
-
-
 def bool_text(value: Any) -> str:
     if value is True:
         return "Yes"
@@ -486,10 +418,25 @@ def render_phone_header() -> None:
     )
 
 
+def compact_count(count: int) -> str:
+    if count < 1000:
+        return str(count)
+    if count < 1_000_000:
+        return f"{count / 1000:.1f}".rstrip("0").rstrip(".") + "k"
+    return f"{count / 1_000_000:.1f}".rstrip("0").rstrip(".") + "M"
+
+
+def workload_kpis() -> list[tuple[str, str]]:
+    counters = workload_counters()
+    kpis = [(label, f"{counters.total if flag is None else counters.counts[flag]:,}") for label, flag in WORKLOAD_KPIS]
+    return kpis + [("Showing", "Top 6 (prioritized)")]
+
+
 def render_workload_kpis() -> None:
+    kpis = workload_kpis()
     cards = []
-    for idx, (label, value) in enumerate(WORKLOAD_KPIS):
-        full = " kpi-card-full" if idx == len(WORKLOAD_KPIS) - 1 else ""
+    for idx, (label, value) in enumerate(kpis):
+        full = " kpi-card-full" if idx == len(kpis) - 1 else ""
         cards.append(
             "<div class='kpi-card" + full + "'>"
             f"<div class='kpi-label'>{label}</div>"
@@ -507,10 +454,10 @@ def render_home_filters() -> None:
     for idx, option in enumerate(HOME_FILTERS):
         with cols[idx]:
             button_type = "primary" if st.session_state.home_filter == option else "secondary"
-            if st.button(option, key=f"home_filter_{option}", use_container_width=True, type=button_type):
+            label = f"{option} ({compact_count(workload_counters().filter_count(option))})"
+            if st.button(label, key=f"home_filter_{option}", use_container_width=True, type=button_type):
                 if st.session_state.home_filter != option:
                     st.session_state.home_filter = option
-                    st.session_state.home_show_more = False
                     st.rerun()
 
 
@@ -540,75 +487,314 @@ def followup_item(patient: dict[str, Any], rank: int, is_top_priority: bool) ->
     st.markdown("</div>", unsafe_allow_html=True)
 
 
-def nearest_patient(lat: float, lon: float, patients: list[dict[str, Any]]) -> str | None:
-    best_id = None
-    best_dist = 999.0
-    for patient in patients:
-        dist = math.hypot(patient["lat"] - lat, patient["lon"] - lon)
-        if dist < best_dist:
-            best_dist = dist
-            best_id = patient["id"]
-    if best_dist < 0.012:
-        return best_id
-    return None
+def render_followup_pager(cursors: list[Cursor | None], next_cursor: Cursor | None) -> None:
+    if len(cursors) == 1 and next_cursor is None:
+        return
+    c1, c2 = st.columns(2)
+    with c1:
+        if st.button("Previous", use_container_width=True, key="home_page_prev", disabled=len(cursors) == 1):
+            cursors.pop()
+            st.rerun()
+    with c2:
+        if st.button("Next", use_container_width=True, key="home_page_next", disabled=next_cursor is None):
+            cursors.append(next_cursor)
+            st.rerun()
+    pages = math.ceil(len(roster()) / HOME_PAGE_SIZE)
+    st.caption(f"Page {len(cursors)} of {pages:,} in the prioritized catchment")
+
+
+def nearest_patient(lat: float, lon: float) -> str | None:
+    return spatial_index().nearest(lat, lon)
+
+
+def households_within(patient: dict[str, Any], radius_km: float) -> list[tuple[str, float]]:
+    nearby = spatial_index().within_km(patient["lat"], patient["lon"], radius_km)
+    return [(pid, dist) for pid, dist in nearby if pid != patient["id"]]
+
+def patient_marker(patient: dict[str, Any], highlighted_ids: set[str]) -> folium.Marker:
+    import folium
+
+    is_selected = patient["id"] == st.session_state.selected_patient_id
+    is_highlighted = patient["id"] in highlighted_ids
+
+    if is_selected:
+        border = "#b32020"
+        size = 30
+        opacity = 1.0
+    elif is_highlighted:
+        border = "#2e5b88"
+        size = 26
+        opacity = 0.96
+    else:
+        border = "#97a8ba"
+        size = 20
+        opacity = 0.78
+
+    summary_badges = patient_badges(patient)
+    badge_preview = summary_badges[0][0] if summary_badges else "Routine check"
+    popup = f"{patient['avatar']} {patient['pseudonym']} ({patient['status']})<br/>{badge_preview}"
+    icon_html = (
+        f"<div style='width:{size}px;height:{size}px;border-radius:50%;"
+        f"border:3px solid {border};background:#fff9f1;display:flex;opacity:{opacity};"
+        "align-items:center;justify-content:center;font-size:14px;'>"
+        f"{patient['avatar']}</div>"
+    )
+    return folium.Marker(
+        location=[patient["lat"], patient["lon"]],
+        tooltip=patient["pseudonym"],
+        popup=popup,
+        icon=folium.DivIcon(html=icon_html),
+    )
+
+
+def cluster_marker(lat: float, lon: float, count: int) -> folium.Marker:
+    import folium
+
+    size = 26 if count < 10 else (32 if count < 100 else 38)
+    icon_html = (
+        f"<div style='width:{size}px;height:{size}px;border-radius:50%;"
+        "border:3px solid #97a8ba;background:#e8eef4;display:flex;"
+        "align-items:center;justify-content:center;font-size:12px;font-weight:600;'>"
+        f"{count}</div>"
+    )
+    return folium.Marker(
+        location=[lat, lon],
+        tooltip=f"{count} households",
+        popup=f"{count} households. Zoom in to see them.",
+        icon=folium.DivIcon(html=icon_html),
+    )
+
+
+def map_view(map_patients: list[dict[str, Any]]) -> dict[str, Any]:
+    view = st.session_state.get("map_view")
+    if view is None:
+        if not roster().added:
+            center_lat, center_lon = device_db().centroid()
+        else:
+            center_lat = sum(p["lat"] for p in map_patients) / len(map_patients)
+            center_lon = sum(p["lon"] for p in map_patients) / len(map_patients)
+        view = {"center": (center_lat, center_lon), "zoom": MAP_DEFAULT_ZOOM, "bounds": None}
+    return view
+
+
+def update_map_view(data: Any) -> bool:
+    # Only the browser reports "center"; st_folium's initial defaults describe marker bounds, not the viewport.
+    if not isinstance(data, dict) or not data.get("center") or not data.get("bounds"):
+        return False
+
+    south_west = data["bounds"]["_southWest"]
+    north_east = data["bounds"]["_northEast"]
+    view = {
+        "center": (round(data["center"]["lat"], 5), round(data["center"]["lng"], 5)),
+        "zoom": int(data.get("zoom") or MAP_DEFAULT_ZOOM),
+        "bounds": (
+            round(south_west["lat"], 5),
+            round(south_west["lng"], 5),
+            round(north_east["lat"], 5),
+            round(north_east["lng"], 5),
+        ),
+    }
+    if view == st.session_state.get("map_view"):
+        return False
+    st.session_state.map_view = view
+    return True
+
+
+def viewport_clusters(view: dict[str, Any], pinned_ids: set[str]) -> list[tuple[int, float, float, Any]]:
+    """(count, lat, lon, record) per cluster cell in the viewport; record is set for single households."""
+    store = roster()
+    if not store.added:
+        # Edited households keep their place on the map; only their records come from the overlay.
+        clusters = device_db().clusters(view["bounds"], cluster_cell_deg(view["zoom"]), pinned_ids)
+        return [(count, lat, lon, record and store.get(record["id"])) for count, lat, lon, record in clusters]
+
+    index = spatial_index()
+    records = all_patients()
+    if view["bounds"] is None:
+        positions = range(len(index))
+    else:
+        positions = index.in_bounds(*view["bounds"])
+    loose = [pos for pos in positions if index.ids[pos] not in pinned_ids]
+
+    groups = []
+    for group in index.clusters(loose, view["zoom"]):
+        lat, lon = index.centroid(group)
+        groups.append((len(group), lat, lon, records[group[0]] if len(group) == 1 else None))
+    return groups
+
+
+def add_clustered_markers(
+    fmap: folium.Map,
+    view: dict[str, Any],
+    highlighted_ids: set[str],
+) -> tuple[int, set[tuple[float, float]]]:
+    pinned_ids = highlighted_ids | {st.session_state.selected_patient_id}
+
+    emitted = 0
+    cluster_points: set[tuple[float, float]] = set()
+    for count, lat, lon, patient in viewport_clusters(view, pinned_ids):
+        if count == 1:
+            patient_marker(patient, highlighted_ids).add_to(fmap)
+        else:
+            cluster_marker(lat, lon, count).add_to(fmap)
+            cluster_points.add((round(lat, 6), round(lon, 6)))
+        emitted += 1
+
+    # Top 6 and the selected household are drawn even when they sit outside the viewport.
+    for patient_id in pinned_ids:
+        patient = get_patient_by_id_any(patient_id)
+        if patient:
+            patient_marker(patient, highlighted_ids).add_to(fmap)
+            emitted += 1
+
+    return emitted, cluster_points
+
+
+def build_map(
+    map_patients: list[dict[str, Any]],
+    highlighted_ids: set[str],
+    view: dict[str, Any],
+    clustered: bool,
+    route: tuple[dict[str, Any], list[dict[str, Any]]] | None = None,
+) -> tuple[folium.Map, int, set[tuple[float, float]]]:
+    import folium
+
+    fmap = folium.Map(
+        location=list(view["center"]),
+        zoom_start=view["zoom"],
+        tiles="OpenStreetMap",
+        control_scale=False,
+        prefer_canvas=True,
+    )
+
+    if route is not None:
+        add_route(fmap, *route)
+
+    if clustered:
+        emitted, cluster_points = add_clustered_markers(fmap, view, highlighted_ids)
+        return fmap, emitted, cluster_points
+
+    for patient in map_patients:
+        patient_marker(patient, highlighted_ids).add_to(fmap)
+    return fmap, len(map_patients), set()
+
+
+def visit_route(stop_count: int) -> tuple[dict[str, Any], list[dict[str, Any]], dict[str, Any]]:
+    """(start household, stops in visit order, plan) starting from the selected household.
+
+    Replanned only when the roster, filter, selection or stop count changes.
+    """
+    start = current_patient()
+    key = (roster().revision, st.session_state.home_filter, start["id"], stop_count)
+    cached = st.session_state.get("visit_route")
+    if cached is None or cached[0] != key:
+        listed, _ = home_page(st.session_state.home_filter, None, stop_count + 1)
+        stops = [p for p in listed if p["id"] != start["id"]][:stop_count]
+        plan = plan_route(
+            [p["lat"] for p in stops],
+            [p["lon"] for p in stops],
+            [patient_priority(p) for p in stops],
+            (start["lat"], start["lon"]),
+        )
+        plan["listed_km"] = walk_km([p["lat"] for p in stops], [p["lon"] for p in stops], (start["lat"], start["lon"]))
+        cached = (key, [stops[i] for i in plan["order"]], plan)
+        st.session_state.visit_route = cached
+    return start, cached[1], cached[2]
+
+
+def add_route(fmap: folium.Map, start: dict[str, Any], stops: list[dict[str, Any]]) -> None:
+    import folium
+
+    folium.PolyLine(
+        [(start["lat"], start["lon"])] + [(p["lat"], p["lon"]) for p in stops],
+        color="#b32020",
+        weight=3,
+        opacity=0.75,
+    ).add_to(fmap)
+    for number, patient in enumerate(stops[:ROUTE_LABEL_MAX], start=1):
+        icon_html = (
+            "<div style='width:18px;height:18px;border-radius:50%;background:#b32020;color:#fff;"
+            "display:flex;align-items:center;justify-content:center;font-size:10px;font-weight:600;'>"
+            f"{number}</div>"
+        )
+        folium.Marker(
+            location=[patient["lat"], patient["lon"]],
+            tooltip=f"Stop {number}: {patient['pseudonym']}",
+            icon=folium.DivIcon(html=icon_html, icon_anchor=(9, 30)),
+        ).add_to(fmap)
+
+
+@st.cache_resource(show_spinner=False)
+def map_cache() -> LRUCache:
+    # Values are (map, render lock, marker count, cluster points); st_folium rewrites element ids
+    # while rendering, so two sessions must not render the same map at once.
+    return LRUCache(maxsize=MAP_CACHE_SIZE)
+
+
+def map_roster_key() -> tuple[Any, ...]:
+    """The roster part of a map cache key: shared by unedited sessions, private once a session edits."""
+    store = roster()
+    if store.pristine:
+        return ("shared", DUMMY_ROSTER_SIZE, DUMMY_ROSTER_SEED)
+    return (st.session_state.roster_token, store.revision)
+
+
+def build_cached_map(*args: Any) -> tuple[folium.Map, threading.Lock, int, set[tuple[float, float]]]:
+    fmap, emitted, cluster_points = build_map(*args)
+    return fmap, threading.Lock(), emitted, cluster_points
+
 
 def render_map(map_patients: list[dict[str, Any]], highlighted_ids: set[str]) -> None:
     st.markdown("### Memory Map")
     st.caption(f"Catchment view: {len(map_patients)} households. Highlighted markers are the current Top 6.")
 
-    center_lat = sum(p["lat"] for p in map_patients) / len(map_patients)
-    center_lon = sum(p["lon"] for p in map_patients) / len(map_patients)
+    if "map_clustered" not in st.session_state:
+        st.session_state.map_clustered = len(map_patients) >= MAP_CLUSTER_MIN_HOUSEHOLDS
+    clustered = st.toggle("Cluster markers to the visible area", key="map_clustered")
+    route = None
+    if st.toggle("Plan today's route from the selected household", key="map_route"):
+        stop_count = st.select_slider("Route stops", ROUTE_STOP_OPTIONS, value=ROUTE_STOP_OPTIONS[1], key="route_stops")
+        start, stops, plan = visit_route(stop_count)
+        route = (start, stops)
+        names = " → ".join(p["pseudonym"] for p in stops[:4])
+        st.caption(
+            f"Route: {len(stops)} stops, {plan['km']:.1f} km walking ({plan['listed_km']:.1f} km in list order). "
+            f"{names}{' → ...' if len(stops) > 4 else ''}"
+        )
+    view = map_view(map_patients)
+
+    map_key = f"map_{st.session_state.selected_patient_id}_{st.session_state.home_filter}"
+    # Markers depend on the roster contents, the selection/filter in map_key, the route and the viewport.
+    route_key = None if route is None else len(route[1])
+    cache_key = (map_roster_key(), map_key, clustered, route_key, view["center"], view["zoom"], view["bounds"])
 
     try:
-        fmap = folium.Map(
-            location=[center_lat, center_lon],
-            zoom_start=13,
-            tiles="OpenStreetMap",
-            control_scale=False,
-            prefer_canvas=True,
-        )
+        # The map stack costs about a second to import, so only sessions that draw the map pay for it.
+        from streamlit_folium import st_folium
 
-        for patient in map_patients:
-            is_selected = patient["id"] == st.session_state.selected_patient_id
-            is_highlighted = patient["id"] in highlighted_ids
-
-            if is_selected:
-                border = "#b32020"
-                size = 30
-                opacity = 1.0
-            elif is_highlighted:
-                border = "#2e5b88"
-                size = 26
-                opacity = 0.96
-            else:
-                border = "#97a8ba"
-                size = 20
-                opacity = 0.78
-
-            summary_badges = patient_badges(patient)
-            badge_preview = summary_badges[0][0] if summary_badges else "Routine check"
-            popup = f"{patient['avatar']} {patient['pseudonym']} ({patient['status']})<br/>{badge_preview}"
-            icon_html = (
-                f"<div style='width:{size}px;height:{size}px;border-radius:50%;"
-                f"border:3px solid {border};background:#fff9f1;display:flex;opacity:{opacity};"
-                "align-items:center;justify-content:center;font-size:14px;'>"
-                f"{patient['avatar']}</div>"
-            )
-            folium.Marker(
-                location=[patient["lat"], patient["lon"]],
-                tooltip=patient["pseudonym"],
-                popup=popup,
-                icon=folium.DivIcon(html=icon_html),
-            ).add_to(fmap)
-
-        map_key = (
-            f"map_{st.session_state.selected_patient_id}_"
-            f"{st.session_state.home_filter}_{int(st.session_state.home_show_more)}"
+        fmap, render_lock, emitted, cluster_points = map_cache().get_or_build(
+            cache_key,
+            lambda: build_cached_map(map_patients, highlighted_ids, view, clustered, route),
         )
-        data = st_folium(fmap, width=350, height=260, key=map_key)
+        if clustered:
+            st.caption(f"Showing {emitted} markers for the visible area at zoom {view['zoom']}.")
+
+        with render_lock:
+            data = st_folium(fmap, width=350, height=260, key=map_key)
+        selected = current_patient()
+        nearby = households_within(selected, NEARBY_RADIUS_KM)
+        st.caption(f"Within {NEARBY_RADIUS_KM} km of {selected['pseudonym']}: {len(nearby)} other households")
+        stats = map_cache().stats()
+        st.caption(f"Map cache (all sessions): {stats['hits']} hits, {stats['misses']} misses")
+        if clustered and update_map_view(data):
+            st.rerun()
+
         clicked = data.get("last_object_clicked") if isinstance(data, dict) else None
         if clicked and clicked.get("lat") is not None and clicked.get("lng") is not None:
-            candidate = nearest_patient(clicked["lat"], clicked["lng"], map_patients)
+            # Cluster markers only open their popup; they do not select a household.
+            if (round(clicked["lat"], 6), round(clicked["lng"], 6)) in cluster_points:
+                return
+            candidate = nearest_patient(clicked["lat"], clicked["lng"])
             if candidate and candidate != st.session_state.selected_patient_id:
                 st.session_state.selected_patient_id = candidate
                 reset_demo_state(keep_patient=True)
@@ -671,15 +857,45 @@ def render_guideline_trace() -> None:
         st.markdown("".join(chips), unsafe_allow_html=True)
 
 
-def render_chat() -> None:
+def speaker_avatar(speaker: str) -> str:
+    return "🧑‍⚕️" if speaker == "CHW" else ("🤖" if speaker == "COPILOT" else "🧭")
+
+
+def chat_archive(messages: list[dict[str, Any]], upto: int) -> deque[str]:
+    """Markdown lines for the last CHAT_ARCHIVE_LIMIT of messages[:upto], extended in place as the transcript grows."""
+    archive = st.session_state.get("chat_archive")
+    # Seek and reset swap in a new list; appends keep the same list, so only the new tail is formatted.
+    if archive is None or archive["source"] is not messages or archive["count"] > upto:
+        archive = {"source": messages, "count": 0, "lines": deque(maxlen=CHAT_ARCHIVE_LIMIT)}
+        st.session_state.chat_archive = archive
+
+    # Lines older than the limit would be evicted straight away, so they are never formatted.
+    for message in messages[max(archive["count"], upto - CHAT_ARCHIVE_LIMIT):upto]:
+        text = message["text"].replace("\n", "  \n")
+        archive["lines"].append(f"{speaker_avatar(message['speaker'])} **{message['speaker']}:** {text}")
+    archive["count"] = upto
+    return archive["lines"]
+
+
+def render_chat() -> Any:
     st.markdown("### CHW Copilot Chat")
 
-    for message in st.session_state.messages:
-        role = role_for_speaker(message["speaker"])
-        avatar = "🧑‍⚕️" if message["speaker"] == "CHW" else ("🤖" if message["speaker"] == "COPILOT" else "🧭")
-        with st.chat_message(role, avatar=avatar):
+    messages = st.session_state.messages
+    archived = max(0, len(messages) - CHAT_LIVE_WINDOW)
+    if archived:
+        lines = chat_archive(messages, archived)
+        with st.expander(f"Earlier messages ({archived})", expanded=False):
+            if archived > CHAT_ARCHIVE_LIMIT:
+                st.caption(f"{archived - CHAT_ARCHIVE_LIMIT} older messages not shown.")
+            st.markdown("\n\n".join(lines))
+
+    for message in messages[archived:]:
+        with st.chat_message(role_for_speaker(message["speaker"]), avatar=speaker_avatar(message["speaker"])):
             st.markdown(message["text"])
 
+    # Copilot replies stream into this slot, directly under the transcript.
+    stream_slot = st.container()
+
     if timer_active() and st.session_state.step_idx >= 9:
         remaining = max(0, int(math.ceil(st.session_state.timer_end - time.time())))
         st.info(f"Breathing timer (simulated): {remaining}s remaining")
@@ -689,8 +905,10 @@ def render_chat() -> None:
     if st.session_state.demo_complete:
         st.success("Demo complete")
 
+    return stream_slot
+
 
-def render_triage_controls() -> None:
+def render_triage_controls(stream_slot: Any) -> None:
     st.markdown("<div class='triage-controls-wrap'>", unsafe_allow_html=True)
     c1, c2, c3 = st.columns(3)
     with c1:
@@ -699,7 +917,7 @@ def render_triage_controls() -> None:
             st.rerun()
     with c2:
         if st.button("Next step", use_container_width=True, key="triage_next"):
-            result = maybe_apply_next_step()
+            result = maybe_apply_next_step(stream_slot)
             if result == "wait_timer":
                 st.info("Timer running. Next step unlocks when timer completes.")
             st.rerun()
@@ -707,8 +925,31 @@ def render_triage_controls() -> None:
         if st.button("Reset", use_container_width=True, key="triage_reset"):
             reset_demo_state(keep_patient=True)
             st.rerun()
+
+    c4, c5 = st.columns([1, 2])
+    with c4:
+        if st.button("Step back", use_container_width=True, key="triage_back", disabled=st.session_state.step_idx < 0):
+            seek_to_step(st.session_state.step_idx - 1)
+            st.rerun()
+    with c5:
+        target = st.select_slider(
+            "Jump to step",
+            options=list(range(-1, len(SCENARIO_STEPS))),
+            value=st.session_state.step_idx,
+            format_func=step_label,
+            label_visibility="collapsed",
+        )
+        if target != st.session_state.step_idx:
+            seek_to_step(target)
+            st.rerun()
     st.markdown("</div>", unsafe_allow_html=True)
 
+
+def step_label(step_idx: int) -> str:
+    if step_idx < 0:
+        return "Start"
+    return f"{step_idx}: {SCENARIO_STEPS[step_idx]['trace']}"
+
 def render_triage_result() -> None:
     triage = st.session_state.triage_result
     color_cls = {
@@ -748,7 +989,7 @@ def render_referral_packet() -> None:
 
 def render_continuity_block(patient: dict[str, Any]) -> None:
     p = st.session_state.patient_state
-    last_fields = patient.get("last_visit_fields", {})
+    last_fields = st.session_state.visit_baseline
     delta = compute_deltas(last_fields, p)
 
     st.markdown("### Continuity & History")
@@ -841,110 +1082,111 @@ def render_bottom_nav() -> None:
     st.markdown("</div>", unsafe_allow_html=True)
 
 
-def score_urgency(patient: dict[str, Any], current_fields: dict[str, Any] | None = None) -> int:
-    score = 0
-    if patient.get("status") == "urgent follow-up":
-        score += 2
-    fields = current_fields or patient.get("current_visit_seed", {})
-    if fields.get("danger_sign"):
-        score += 2
-    if fields.get("chest_indrawing"):
-        score += 1
-    if (fields.get("rr") or 0) >= 50:
-        score += 1
-    return score
-
-
-def mini_compare_card(patient: dict[str, Any], title: str, current_override: dict[str, Any] | None = None) -> None:
-    last = patient.get("last_visit_fields", {})
-    current = current_override if current_override is not None else patient.get("current_visit_seed", {})
-    st.markdown(f"**{title}: {patient['pseudonym']}**")
-
-    if not patient.get("last_visit_date"):
-        st.caption("No prior visit")
-    else:
-        st.caption(f"Last visit: {patient['last_visit_date']}")
-
-    rr_last = last.get("rr")
-    rr_curr = current.get("rr")
-    if rr_last is not None and rr_curr is not None:
-        rr_delta = rr_curr - rr_last
-        rr_delta_text = f"{rr_delta:+d}"
-    else:
-        rr_delta_text = "n/a"
-
-    st.write(
-        {
-            "RR last": rr_last,
-            "RR current": rr_curr,
-            "Delta": rr_delta_text,
-            "Danger sign": current.get("danger_sign", "n/a"),
-            "Chest indrawing": current.get("chest_indrawing", "n/a"),
-        }
+def compare_cohort(cohort: str) -> list[dict[str, Any]]:
+    if cohort == "Pick patients":
+        # Picks survive roster edits only while the household still exists.
+        found = [get_patient_by_id_any(patient_id) for patient_id in st.session_state.compare_patient_ids]
+        return [patient for patient in found if patient]
+    # A flag filter's page continues past its matches; keep only the cohort itself.
+    patients, _ = home_page(cohort, None, COMPARE_LIMIT)
+    return patients[: workload_counters().filter_count(cohort)]
+
+
+def compare_table(patients: list[dict[str, Any]]) -> list[dict[str, Any]]:
+    """One row per household, most urgent first; deltas and urgency are computed for all rows in one pass."""
+    selected_id = st.session_state.selected_patient_id
+    currents = [st.session_state.patient_state if p["id"] == selected_id else None for p in patients]
+    urgency = batch_urgency(patients, currents)
+    deltas = batch_deltas(
+        [p.get("last_visit_fields", {}) for p in patients],
+        [current or p.get("current_visit_seed", {}) for p, current in zip(patients, currents)],
     )
 
+    rows = []
+    for i, patient in enumerate(patients):
+        current = currents[i] or patient.get("current_visit_seed", {})
+        rr_delta = deltas["rr_delta"][i]
+        rows.append(
+            {
+                "Patient": patient["pseudonym"],
+                "Last visit": patient.get("last_visit_date") or "No prior visit",
+                "Urgency": int(urgency[i]),
+                "RR last": patient.get("last_visit_fields", {}).get("rr"),
+                "RR current": current.get("rr"),
+                "Delta": "n/a" if rr_delta is None else f"{rr_delta:+g}",
+                "Danger sign": deltas["danger_sign"][i],
+                "Chest indrawing": deltas["chest_indrawing"][i],
+            }
+        )
+    rows.sort(key=lambda row: -row["Urgency"])
+    return rows
+
 
 def render_compare_view() -> None:
     st.sidebar.markdown("---")
     st.sidebar.markdown("### Compare Patients")
 
-    options = {p["pseudonym"]: p["id"] for p in PATIENTS}
-    name_by_id = {v: k for k, v in options.items()}
-
-    a_name = st.sidebar.selectbox(
-        "Patient A",
-        list(options.keys()),
-        index=list(options.values()).index(st.session_state.compare_patient_a_id),
-    )
-    b_name = st.sidebar.selectbox(
-        "Patient B",
-        list(options.keys()),
-        index=list(options.values()).index(st.session_state.compare_patient_b_id),
-    )
-
-    st.session_state.compare_patient_a_id = options[a_name]
-    st.session_state.compare_patient_b_id = options[b_name]
-
-    pa = get_patient_by_id(st.session_state.compare_patient_a_id)
-    pb = get_patient_by_id(st.session_state.compare_patient_b_id)
-    if not pa or not pb:
+    cohort = st.sidebar.selectbox("Compare", COMPARE_COHORTS, key="compare_cohort")
+    if cohort == "Pick patients":
+        # Offer the top of the priority list plus anything already picked, not the whole roster.
+        offered, _ = home_page("All", None, COMPARE_LIMIT)
+        labels = {p["id"]: f"{p['pseudonym']} ({p['id']})" for p in offered}
+        for patient in compare_cohort(cohort):
+            labels.setdefault(patient["id"], f"{patient['pseudonym']} ({patient['id']})")
+        st.session_state.compare_patient_ids = [i for i in st.session_state.compare_patient_ids if i in labels]
+        st.sidebar.multiselect("Patients", list(labels), format_func=labels.get, key="compare_patient_ids")
+
+    patients = compare_cohort(cohort)
+    if len(patients) < 2:
+        st.sidebar.caption("Pick at least two patients to compare.")
         return
 
     with st.sidebar.expander("Comparison snapshot", expanded=True):
-        a_current = st.session_state.patient_state if pa["id"] == st.session_state.selected_patient_id else pa.get("current_visit_seed", {})
-        b_current = st.session_state.patient_state if pb["id"] == st.session_state.selected_patient_id else pb.get("current_visit_seed", {})
-
-        col_a, col_b = st.columns(2)
-        with col_a:
-            mini_compare_card(pa, "A", a_current)
-        with col_b:
-            mini_compare_card(pb, "B", b_current)
-
-        score_a = score_urgency(pa, a_current)
-        score_b = score_urgency(pb, b_current)
-        if score_a > score_b:
-            hint = f"Most urgent today: {name_by_id[pa['id']]}"
-        elif score_b > score_a:
-            hint = f"Most urgent today: {name_by_id[pb['id']]}"
+        rows = compare_table(patients)
+        if cohort != "Pick patients":
+            st.caption(f"Top {len(rows)} of {workload_counters().filter_count(cohort)} by priority")
+        st.dataframe(rows, hide_index=True, use_container_width=True)
+
+        most_urgent = [row["Patient"] for row in rows if row["Urgency"] == rows[0]["Urgency"]]
+        if len(most_urgent) == 1:
+            hint = f"Most urgent today: {most_urgent[0]}"
+        elif len(most_urgent) == len(rows):
+            hint = "Most urgent today: tie (all need close review)"
         else:
-            hint = "Most urgent today: tie (both need close review)"
+            hint = f"Most urgent today: tie ({len(most_urgent)} patients need close review)"
         st.markdown(badge(hint, "red"), unsafe_allow_html=True)
 
+def patient_label(patient_id: str) -> str:
+    patient = roster().get(patient_id)
+    return f"{patient['pseudonym']} ({patient_id})"
+
+
+def patient_picker_ids(query: str) -> list[str]:
+    """The selected household first, then search matches or the top of the priority list.
+
+    Bounded by PATIENT_PICKER_LIMIT so the options sent to the browser do not grow with the roster.
+    """
+    if query:
+        ids = device_db().search(query, PATIENT_PICKER_LIMIT)
+        needle = query.lower()
+        ids += [p["id"] for p in roster().added if needle in p["id"].lower() or needle in p["pseudonym"].lower()]
+    else:
+        ids = [p["id"] for p in home_page("All", None, PATIENT_PICKER_LIMIT)[0]]
+    selected = st.session_state.selected_patient_id
+    return [selected, *(patient_id for patient_id in ids[:PATIENT_PICKER_LIMIT] if patient_id != selected)]
+
+
 def render_sidebar_controls() -> None:
     st.sidebar.markdown("## Controls")
 
-    patient_pool = all_patients()
-    labels = [f"{p['pseudonym']} ({p['id']})" for p in patient_pool]
-    ids = [p["id"] for p in patient_pool]
-
-    if st.session_state.selected_patient_id not in ids:
-        st.session_state.selected_patient_id = ids[0]
+    if st.session_state.selected_patient_id not in roster():
+        st.session_state.selected_patient_id = all_patients()[0]["id"]
 
-    selected_label = st.sidebar.selectbox(
-        "Patient selector",
-        labels,
-        index=ids.index(st.session_state.selected_patient_id),
-    )
+    query = st.sidebar.text_input("Find patient", placeholder="Name or id", key="patient_query").strip()
+    offered = patient_picker_ids(query)
+    if query and len(offered) == 1:
+        st.sidebar.caption("No other matches.")
+    selected_label = st.sidebar.selectbox("Patient selector", [patient_label(patient_id) for patient_id in offered])
     selected_id = selected_label.split("(")[-1].replace(")", "")
 
     if selected_id != st.session_state.selected_patient_id:
@@ -954,6 +1196,7 @@ def render_sidebar_controls() -> None:
         st.rerun()
 
     st.session_state.speed = st.sidebar.slider("Speed", 0.2, 1.5, float(st.session_state.speed), 0.1)
+    st.sidebar.selectbox("Copilot backend", COPILOT_BACKENDS, key="copilot_backend")
 
     if st.sidebar.button("Reset scenario", use_container_width=True):
         reset_demo_state(keep_patient=True)
@@ -966,25 +1209,24 @@ def render_home_tab(patient: dict[str, Any]) -> None:
     render_workload_kpis()
     render_home_filters()
 
-    ordered, fill_used = ordered_home_patients(st.session_state.home_filter)
-    top_six = ordered[:6]
-
-    visible_limit = 24 if st.session_state.home_show_more else 6
-    visible_patients = ordered[:visible_limit]
+    cursors = home_cursors()
+    visible_patients, next_cursor = home_page(st.session_state.home_filter, cursors[-1], HOME_PAGE_SIZE)
+    top_six, fill_used = ordered_home_patients(
+        st.session_state.home_filter, limit=6, first_page=visible_patients if len(cursors) == 1 else None
+    )
+    first_rank = (len(cursors) - 1) * HOME_PAGE_SIZE + 1
 
-    st.markdown("### Top 6 prioritized for today")
+    if first_rank == 1:
+        st.markdown("### Top 6 prioritized for today")
+    else:
+        st.markdown(f"### Follow-ups #{first_rank}–#{first_rank + len(visible_patients) - 1}")
     if st.session_state.home_filter != "All" and fill_used:
         st.caption("Not enough matches; showing additional prioritized visits.")
 
-    for idx, listed_patient in enumerate(visible_patients, start=1):
+    for idx, listed_patient in enumerate(visible_patients, start=first_rank):
         followup_item(listed_patient, rank=idx, is_top_priority=idx <= 6)
 
-    extra_available = max(0, min(18, len(ordered) - 6))
-    if extra_available > 0:
-        label = f"Show more (+{extra_available})" if not st.session_state.home_show_more else "Show less"
-        if st.button(label, use_container_width=True, key="home_show_more_btn"):
-            st.session_state.home_show_more = not st.session_state.home_show_more
-            st.rerun()
+    render_followup_pager(cursors, next_cursor)
 
     highlighted_ids = {p["id"] for p in top_six}
     render_map(all_patients(), highlighted_ids=highlighted_ids)
@@ -997,20 +1239,73 @@ def render_home_tab(patient: dict[str, Any]) -> None:
         st.rerun()
 
 
+def autoplay_running() -> bool:
+    return st.session_state.demo_running and not st.session_state.demo_complete
+
+
+def render_triage_live(patient: dict[str, Any]) -> Any:
+    trace_slot = st.container()
+    card_slot = st.container()
+    stream_slot = render_chat()
+
+    if autoplay_running():
+        maybe_apply_next_step(stream_slot)
+        if st.session_state.demo_complete:
+            # Refresh the whole page once so controls update and the timer stops.
+            st.rerun()
+
+    # Filled after the step so the trace and card reflect this tick's updates.
+    with trace_slot:
+        render_guideline_trace()
+    with card_slot:
+        render_patient_card(patient)
+    return stream_slot
+
+
+def render_triage_fragment(patient: dict[str, Any]) -> Any:
+    # Full reruns are timed in main(); a run_every tick re-runs only this body, so it times itself.
+    if st.session_state.get("page_rendering"):
+        return render_triage_live(patient)
+    started = time.perf_counter()
+    try:
+        return render_triage_live(patient)
+    finally:
+        edge_metrics().record_render(time.perf_counter() - started)
+
+
 def render_triage_tab(patient: dict[str, Any]) -> None:
-    render_guideline_trace()
-    render_patient_card(patient)
-    render_chat()
-    render_triage_controls()
+    # During autoplay only this fragment re-runs, once per tick, without sleeping the script thread.
+    run_every = st.session_state.speed if autoplay_running() else None
+    stream_slot = st.fragment(render_triage_fragment, run_every=run_every)(patient)
+    render_triage_controls(stream_slot)
 
     if st.session_state.demo_complete:
         if st.button("Go to Handoff", use_container_width=True, key="go_handoff"):
             set_active_tab("Handoff")
 
 
+def p50_p95(window: RollingWindow, fmt: Callable[[float | None], str]) -> str:
+    return f"p50 {fmt(window.percentile(50))} / p95 {fmt(window.percentile(95))}"
+
+
+def edge_metric_badges() -> list[str]:
+    metrics = edge_metrics()
+    return [
+        f"Backend: {st.session_state.copilot_backend}",
+        f"TTFT {p50_p95(metrics.ttft, format_seconds)}",
+        f"tok/s {p50_p95(metrics.tokens_per_sec, format_rate)}",
+        f"Reply {p50_p95(metrics.reply_latency, format_seconds)}",
+        f"Rerun {p50_p95(metrics.render_time, format_seconds)}",
+        f"{len(metrics.reply_latency)} replies, {len(metrics.render_time)} reruns sampled",
+    ]
+
+
 def render_handoff_tab(patient: dict[str, Any]) -> None:
     st.markdown("### Triage Result")
     render_triage_result()
+    if st.session_state.demo_complete:
+        visits = device_db().visit_count(patient["id"])
+        st.caption(f"Saved on device: {visits} recorded visit{'s' if visits != 1 else ''} for this household.")
 
     st.markdown("### Next Actions")
     render_next_actions()
@@ -1026,9 +1321,11 @@ def render_handoff_tab(patient: dict[str, Any]) -> None:
 
     render_continuity_block(patient)
 
-    if st.session_state.show_metrics and st.session_state.metrics_badges:
-        st.markdown("### Edge Metrics (simulated)")
-        st.markdown("".join(badge(text, "blue") for text in st.session_state.metrics_badges), unsafe_allow_html=True)
+    st.markdown("### Edge Metrics (measured)")
+    metric_badges = edge_metric_badges()
+    if st.session_state.show_metrics:
+        metric_badges += st.session_state.metrics_badges
+    st.markdown("".join(badge(text, "blue") for text in metric_badges), unsafe_allow_html=True)
 
     if st.button("Back to Home", use_container_width=True, key="back_home"):
         set_active_tab("Home")
@@ -1043,33 +1340,26 @@ def render_active_tab(patient: dict[str, Any]) -> None:
         render_handoff_tab(patient)
 
 
-def maybe_run_autoplay() -> None:
-    if st.session_state.active_tab != "Triage":
-        return
-    if st.session_state.demo_running and not st.session_state.demo_complete:
-        outcome = maybe_apply_next_step()
-        if outcome == "wait_timer":
-            time.sleep(0.2)
-        elif outcome == "applied":
-            time.sleep(st.session_state.speed)
-        st.rerun()
-
-
 def main() -> None:
+    started = time.perf_counter()
     st.set_page_config(page_title="CHW Copilot Demo", page_icon="+", layout="centered")
     load_css()
     ensure_state()
 
-    render_sidebar_controls()
-
-    patient = current_patient()
-
-    render_phone_header()
-    render_top_nav()
-    render_active_tab(patient)
-    render_bottom_nav()
-
-    maybe_run_autoplay()
+    st.session_state.page_rendering = True
+    try:
+        render_sidebar_controls()
+
+        patient = current_patient()
+
+        render_phone_header()
+        render_top_nav()
+        render_active_tab(patient)
+        render_bottom_nav()
+    finally:
+        # Recorded even when a handler calls st.rerun() mid-render.
+        st.session_state.page_rendering = False
+        edge_metrics().record_render(time.perf_counter() - started)
 
 
 if __name__ == "__main__":
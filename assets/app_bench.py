@@ -0,0 +1,214 @@
+﻿"""App rendering benchmark: rerun wall time, peak memory and payload size per tab across roster sizes.
+
+Drives app.py through Streamlit's AppTest, so no browser or server is needed:
+
+    python -m assets.app_bench --sizes 24,1000,10000,100000 --json app_bench.json
+
+AppTest recompiles the script on every rerun, which a server does once; that compile alone peaks near
+6 MB for app.py and would mask the app's own allocations, so the bench shares one compiled copy across
+reruns. Memory is then reported above what an AppTest rerun of an empty script allocates.
+"""
+
+from __future__ import annotations
+
+import argparse
+import contextlib
+import json
+import os
+import platform
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Any, Iterator
+
+import streamlit as st
+from streamlit.runtime.scriptrunner.script_cache import ScriptCache
+from streamlit.testing.v1 import AppTest, local_script_runner
+
+from assets.metrics import RollingWindow
+from assets.patients import PATIENTS
+
+APP_PATH = Path(__file__).parent.parent / "app.py"
+DEFAULT_SIZES = (24, 1_000, 10_000, 100_000)
+TABS = ("Home", "Triage", "Handoff")
+
+
+@contextlib.contextmanager
+def environ(**values: str) -> Iterator[None]:
+    """Set environment variables for the duration of the block, then restore the previous values."""
+    saved = {name: os.environ.get(name) for name in values}
+    os.environ.update(values)
+    try:
+        yield
+    finally:
+        for name, value in saved.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+
+
+@contextlib.contextmanager
+def shared_script_cache() -> Iterator[None]:
+    """Compile each script once for every rerun in the block, as a Streamlit server does."""
+    cache = ScriptCache()
+    original = local_script_runner.ScriptCache
+    local_script_runner.ScriptCache = lambda: cache
+    try:
+        yield
+    finally:
+        local_script_runner.ScriptCache = original
+
+
+def payload_stats(node: Any) -> tuple[int, int]:
+    """(serialized bytes, element count) of everything the last run sent to the browser."""
+    proto = getattr(node, "proto", None)
+    size = proto.ByteSize() if proto is not None and hasattr(proto, "ByteSize") else 0
+    count = 1 if size else 0
+    for child in getattr(node, "children", {}).values():
+        child_size, child_count = payload_stats(child)
+        size += child_size
+        count += child_count
+    return size, count
+
+
+def timed_run(at: AppTest) -> float:
+    started = time.perf_counter()
+    at.run()
+    return time.perf_counter() - started
+
+
+def traced_run(at: AppTest) -> tuple[int, int]:
+    """(peak, retained) bytes Python allocated during one rerun, above what was live before it."""
+    tracemalloc.start()
+    try:
+        before, _ = tracemalloc.get_traced_memory()
+        at.run()
+        after, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak - before, after - before
+
+
+def harness_baseline(timeout: float) -> tuple[int, int]:
+    """traced_run of an empty script: the share of every traced rerun that AppTest itself allocates."""
+    at = AppTest.from_string("", default_timeout=timeout)
+    at.run()
+    return traced_run(at)
+
+
+def app_memory(at: AppTest, baseline: tuple[int, int]) -> tuple[int, int]:
+    peak, retained = traced_run(at)
+    return max(0, peak - baseline[0]), max(0, retained - baseline[1])
+
+
+def phase_result(
+    households: int, phase: str, at: AppTest, walls: list[float], memory: tuple[int, int]
+) -> dict[str, Any]:
+    window = RollingWindow(len(walls))
+    for wall in walls:
+        window.add(wall)
+    main_bytes, main_elements = payload_stats(at.main)
+    sidebar_bytes, sidebar_elements = payload_stats(at.sidebar)
+    payload_bytes, elements = main_bytes + sidebar_bytes, main_elements + sidebar_elements
+    return {
+        "households": households,
+        "phase": phase,
+        "runs": len(walls),
+        "wall_p50_s": window.percentile(50),
+        "wall_max_s": window.percentile(100),
+        "peak_alloc_bytes": memory[0],
+        "retained_bytes": memory[1],
+        "payload_bytes": payload_bytes,
+        "elements": elements,
+        "exceptions": [exception.value for exception in at.exception],
+    }
+
+
+def bench_size(households: int, repeats: int, timeout: float, baseline: tuple[int, int]) -> list[dict[str, Any]]:
+    # The app reads its roster size from the environment on every script run.
+    with environ(CHW_DUMMY_HOUSEHOLDS=str(max(0, households - len(PATIENTS)))):
+        # Builds the shared roster and seeds the on-device store for this size.
+        cold_wall = timed_run(AppTest.from_file(str(APP_PATH), default_timeout=timeout))
+
+        # Tracing slows the run, so memory comes from a second cold start in a new session with the shared
+        # caches dropped. The on-device store is already seeded by then, so its one-off load is not counted.
+        st.cache_resource.clear()
+        at = AppTest.from_file(str(APP_PATH), default_timeout=timeout)
+        results = [phase_result(households, "cold_start", at, [cold_wall], app_memory(at, baseline))]
+        for tab in TABS:
+            at.session_state["active_tab"] = tab
+            walls = [timed_run(at) for _ in range(repeats)]
+            results.append(phase_result(households, tab, at, walls, app_memory(at, baseline)))
+    return results
+
+
+def memory_grows(results: list[dict[str, Any]]) -> bool:
+    """True when cold-start retained memory rises with roster size, i.e. the numbers track the app."""
+    cold = sorted((row["households"], row["retained_bytes"]) for row in results if row["phase"] == "cold_start")
+    return all(smaller[1] < larger[1] for smaller, larger in zip(cold, cold[1:]) if smaller[0] < larger[0])
+
+
+def print_results(results: list[dict[str, Any]]) -> None:
+    print(
+        f"{'households':>10}  {'phase':<10} {'p50 s':>7} {'max s':>7} {'peak MB':>8} {'kept MB':>8} "
+        f"{'payload KB':>10} {'elements':>8}"
+    )
+    for row in results:
+        print(
+            f"{row['households']:>10}  {row['phase']:<10} {row['wall_p50_s']:>7.3f} {row['wall_max_s']:>7.3f} "
+            f"{row['peak_alloc_bytes'] / 2**20:>8.1f} {row['retained_bytes'] / 2**20:>8.1f} "
+            f"{row['payload_bytes'] / 1024:>10.1f} {row['elements']:>8}"
+        )
+        for exception in row["exceptions"]:
+            print(f"            ! {exception}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--sizes",
+        default=",".join(str(size) for size in DEFAULT_SIZES),
+        help="Comma-separated total households per run, including the sample patients.",
+    )
+    parser.add_argument("--repeats", type=int, default=5, help="Timed reruns per tab.")
+    parser.add_argument("--timeout", type=float, default=600, help="Seconds allowed per script run.")
+    parser.add_argument("--db", help="On-device store to use (default: a throwaway file).")
+    parser.add_argument("--json", help="Also write the results as JSON to this path.")
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(",") if size.strip()]
+    with (
+        shared_script_cache(),
+        tempfile.TemporaryDirectory() as scratch,
+        environ(CHW_ROSTER_DB=args.db or str(Path(scratch) / "bench.db")),
+    ):
+        baseline = harness_baseline(args.timeout)
+        results = [row for size in sizes for row in bench_size(size, args.repeats, args.timeout, baseline)]
+
+    print_results(results)
+    if args.json:
+        report = {
+            "config": {
+                "sizes": sizes,
+                "repeats": args.repeats,
+                "python": platform.python_version(),
+                "machine": platform.machine(),
+                # ru_maxrss is KiB on Linux.
+                "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+                "harness_peak_bytes": baseline[0],
+                "harness_retained_bytes": baseline[1],
+            },
+            "results": results,
+        }
+        with open(args.json, "w", encoding="utf-8") as handle:
+            json.dump(report, handle, indent=2)
+    if not memory_grows(results):
+        sys.exit("Cold-start memory did not grow with --sizes; the figures are not measuring the roster.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,198 @@
+"""Scenario conversation engine over any session-state mapping (st.session_state or HeadlessState)."""
+
+from __future__ import annotations
+
+import time
+from datetime import date
+from typing import Any, Mapping, MutableMapping, Sequence
+
+import numpy as np
+
+from assets.guideline import CLASSIFICATIONS, GUIDELINE, URGENT_REFERRAL
+from assets.playback import SCENARIO_MESSAGES, snapshot_at
+from assets.scenario import SCENARIO_STEPS
+
+DELTA_FLAGS = ("danger_sign", "unable_to_drink", "vomiting_everything", "chest_indrawing")
+# The RR answer waits for the breathing timer started by the step before it.
+TIMER_STEP_ID = 10
+# Flag values seen in visit fields; a transition label is looked up by (last code, current code).
+FLAG_VALUES = (False, True, None)
+TRANSITION_LABELS = np.array([[f"{last} -> {current}" for current in FLAG_VALUES] for last in FLAG_VALUES], dtype=object)
+
+
+class HeadlessState(dict):
+    """Plain-dict stand-in for st.session_state with the same attribute access, for runs without Streamlit."""
+
+    def __getattr__(self, key: str) -> Any:
+        try:
+            return self[key]
+        except KeyError:
+            raise AttributeError(key) from None
+
+    def __setattr__(self, key: str, value: Any) -> None:
+        self[key] = value
+
+
+def default_patient_state(patient: Mapping[str, Any]) -> dict[str, Any]:
+    return {
+        "patient_id": patient["id"],
+        "age_months": patient.get("age_months"),
+        "symptoms": [],
+        "seizures": None,
+        "unable_to_drink": None,
+        "vomiting_everything": None,
+        "danger_sign": False,
+        "rr": None,
+        "chest_indrawing": None,
+        "rr_delta": None,
+        "trend": None,
+        "last_visit_summary": patient.get("last_visit_summary"),
+    }
+
+
+def seek(state: MutableMapping[str, Any], step_idx: int, patient: Mapping[str, Any]) -> None:
+    """Set the state right after SCENARIO_STEPS[step_idx] (-1 = start) from the precompiled snapshots."""
+    snapshot = snapshot_at(step_idx)
+
+    state["step_idx"] = step_idx
+    state["messages"] = SCENARIO_MESSAGES[: snapshot["message_count"]]
+    state["patient_state"] = {**default_patient_state(patient), **snapshot["patient_updates"]}
+    # What this visit is compared against, fixed at its start so recording the visit does not change it.
+    state["visit_baseline"] = dict(patient.get("last_visit_fields") or {})
+    state["guideline_trace_step"] = snapshot["guideline_trace_step"]
+    # Re-derived from the full state so the patient's own fields (e.g. age) count too.
+    state["triage_session"] = GUIDELINE.session(state["patient_state"], snapshot["guideline_trace_step"])
+    state["triage_result"] = state["triage_session"].result
+    state["demo_running"] = False
+    state["demo_complete"] = snapshot["demo_complete"]
+    state["next_actions"] = snapshot["next_actions"]
+    state["caregiver_message"] = snapshot["caregiver_message"]
+    state["referral_packet"] = snapshot["referral_packet"]
+    state["show_referral"] = snapshot["show_referral"]
+    state["show_metrics"] = snapshot["show_metrics"]
+    state["metrics_badges"] = snapshot["metrics_badges"]
+    state["timer_end"] = None
+
+
+def timer_active(state: Mapping[str, Any], now: float | None = None) -> bool:
+    end = state["timer_end"]
+    return bool(end and (time.time() if now is None else now) < end)
+
+
+def next_step(state: MutableMapping[str, Any], now: float | None = None) -> tuple[str, dict[str, Any] | None]:
+    """("ready", step) for the step to apply next, ("wait_timer", None) or ("done", None) at the end."""
+    next_idx = state["step_idx"] + 1
+    if next_idx >= len(SCENARIO_STEPS):
+        state["demo_complete"] = True
+        state["demo_running"] = False
+        return "done", None
+
+    step = SCENARIO_STEPS[next_idx]
+    if step["id"] == TIMER_STEP_ID and timer_active(state, now):
+        return "wait_timer", None
+    return "ready", step
+
+
+def apply_step(state: MutableMapping[str, Any], step: dict[str, Any], text: str, now: float | None = None) -> bool:
+    """Append the step's message and fold its updates into the state; True when it completed the scenario."""
+    trace = step.get("trace", state["guideline_trace_step"])
+    state["messages"].append({"speaker": step["speaker"], "text": text, "trace": trace})
+    state["guideline_trace_step"] = trace
+
+    updates = step.get("updates", {})
+    patient_state = state["patient_state"]
+    for key, value in updates.items():
+        patient_state[key] = value
+
+    state["triage_result"] = state["triage_session"].update(updates, stage=trace)
+
+    for key in ("next_actions", "caregiver_message", "referral_packet"):
+        if step.get(key):
+            state[key] = step[key]
+
+    ui_event = step.get("ui_event")
+    if ui_event == "show_timer":
+        state["timer_end"] = (time.time() if now is None else now) + float(step.get("timer_seconds", 5))
+    elif ui_event == "show_referral":
+        state["show_referral"] = True
+    elif ui_event == "show_metrics":
+        state["show_metrics"] = True
+        state["metrics_badges"] = step.get("metrics", [])
+
+    completed = step["id"] == SCENARIO_STEPS[-1]["id"]
+    if completed:
+        state["demo_complete"] = True
+        state["demo_running"] = False
+    state["step_idx"] += 1
+    return completed
+
+
+def completed_visit(patient_state: Mapping[str, Any], triage_result: Mapping[str, Any], today: date) -> dict[str, Any]:
+    """Household fields once a visit is recorded: it becomes the last visit and the follow-up it was due for is done."""
+    urgent = triage_result["classification"] == CLASSIFICATIONS[URGENT_REFERRAL][0]
+    reasons = ", ".join(triage_result.get("reasons", []))
+    return {
+        "last_visit_date": today.isoformat(),
+        "last_visit_summary": f"{triage_result['classification']}: {reasons}.",
+        "last_visit_fields": {key: patient_state.get(key) for key in ("rr", *DELTA_FLAGS)},
+        "status": "urgent follow-up" if urgent else "normal follow-up",
+        "due_category": None,
+        "overdue_days": 0,
+        "follow_up_due": False,
+        "due_today": False,
+        "due_this_week": False,
+        "protocol_followup_due": False,
+        "facility_referral_pending": urgent,
+    }
+
+
+def compute_deltas(last_fields: Mapping[str, Any], current_fields: Mapping[str, Any]) -> dict[str, Any]:
+    deltas: dict[str, Any] = {}
+    rr_last = last_fields.get("rr") if last_fields else None
+    rr_curr = current_fields.get("rr")
+    if rr_last is not None and rr_curr is not None:
+        deltas["rr_delta"] = rr_curr - rr_last
+    else:
+        deltas["rr_delta"] = None
+
+    for key in DELTA_FLAGS:
+        if last_fields and key in last_fields and current_fields.get(key) is not None:
+            deltas[key] = f"{last_fields.get(key)} -> {current_fields.get(key)}"
+        else:
+            deltas[key] = "n/a"
+    return deltas
+
+
+def _flag_codes(values: list[Any]) -> np.ndarray:
+    """Index into FLAG_VALUES per value; -1 for anything that is not a bool or None."""
+    codes = {value: code for code, value in enumerate(FLAG_VALUES)}
+    return np.fromiter(
+        (codes[value] if value is None or isinstance(value, bool) else -1 for value in values),
+        dtype=np.int64,
+        count=len(values),
+    )
+
+
+def batch_deltas(last_rows: Sequence[Mapping[str, Any]], current_rows: Sequence[Mapping[str, Any]]) -> dict[str, list[Any]]:
+    """compute_deltas for many households in one columnar pass: one list per key, row i for household i."""
+    n = len(current_rows)
+    rr_last = [(fields or {}).get("rr") for fields in last_rows]
+    rr_curr = [fields.get("rr") for fields in current_rows]
+    # Plain subtraction keeps integer and fractional RR exactly as compute_deltas reports them.
+    deltas: dict[str, list[Any]] = {
+        "rr_delta": [b - a if a is not None and b is not None else None for a, b in zip(rr_last, rr_curr)]
+    }
+
+    for key in DELTA_FLAGS:
+        recorded = np.fromiter((bool(fields) and key in fields for fields in last_rows), dtype=bool, count=n)
+        last = [(fields or {}).get(key) for fields in last_rows]
+        current = [fields.get(key) for fields in current_rows]
+        last_code, current_code = _flag_codes(last), _flag_codes(current)
+        known = (last_code >= 0) & (current_code >= 0)
+        labels = TRANSITION_LABELS[np.where(known, last_code, 0), np.where(known, current_code, 0)]
+        labels = np.where(recorded & (current_code != FLAG_VALUES.index(None)), labels, "n/a")
+        # Anything other than a bool or None keeps compute_deltas' own formatting.
+        for i in np.flatnonzero(recorded & ~known & (current_code != FLAG_VALUES.index(None))).tolist():
+            labels[i] = f"{last[i]} -> {current[i]}"
+        deltas[key] = labels.tolist()
+    return deltas
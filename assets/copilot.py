@@ -0,0 +1,191 @@
+﻿"""Streaming reply backends for the CHW Copilot chat."""
+
+from __future__ import annotations
+
+import http.client
+import json
+import queue
+import re
+import time
+from abc import ABC, abstractmethod
+from typing import Any, Iterator
+from urllib.parse import urlsplit
+
+TOKEN_PATTERN = re.compile(r"\S+\s*|\s+")
+
+SYSTEM_PROMPT = (
+    "You are an offline copilot for community health workers. "
+    "Follow the guideline-based triage flow, ask one question at a time, "
+    "and never present output as a medical diagnosis."
+)
+
+
+class CopilotBackendError(RuntimeError):
+    """Raised when a backend cannot produce a reply."""
+
+
+def chunk_text(text: str) -> list[str]:
+    """Split text into word-sized chunks that join back to the original string."""
+    return TOKEN_PATTERN.findall(text)
+
+
+def build_messages(context: dict[str, Any]) -> list[dict[str, str]]:
+    """Turn a scenario step plus chat history into OpenAI-style chat messages."""
+    messages = [{"role": "system", "content": SYSTEM_PROMPT}]
+    for message in context.get("history", []):
+        if message["speaker"] == "CHW":
+            messages.append({"role": "user", "content": message["text"]})
+        elif message["speaker"] == "COPILOT":
+            messages.append({"role": "assistant", "content": message["text"]})
+    messages.append({"role": "system", "content": f"Current guideline stage: {context.get('trace', 'Triage')}."})
+    return messages
+
+
+class CopilotBackend(ABC):
+    """Interface for reply backends: stream() yields text chunks as they are produced."""
+
+    name = "base"
+
+    @abstractmethod
+    def stream(self, context: dict[str, Any]) -> Iterator[str]:
+        """Yield reply chunks; any failure, before or during the reply, raises CopilotBackendError."""
+
+    def close(self) -> None:
+        pass
+
+
+class ScriptedBackend(CopilotBackend):
+    """Streams the scripted scenario text one word at a time."""
+
+    name = "scripted"
+
+    def __init__(self, token_delay: float = 0.05) -> None:
+        self.token_delay = token_delay
+
+    def stream(self, context: dict[str, Any]) -> Iterator[str]:
+        for idx, chunk in enumerate(chunk_text(context.get("text", ""))):
+            # The first chunk goes out immediately; later chunks are paced like generated tokens.
+            if idx and self.token_delay > 0:
+                time.sleep(self.token_delay)
+            yield chunk
+
+
+class ConnectionPool:
+    """Keep-alive HTTP connections to one host, reused across requests."""
+
+    def __init__(self, base_url: str, size: int = 4, timeout: float = 30.0) -> None:
+        parts = urlsplit(base_url)
+        self.scheme = parts.scheme or "http"
+        self.host = parts.hostname or "127.0.0.1"
+        self.port = parts.port
+        self.path_prefix = parts.path.rstrip("/")
+        self.timeout = timeout
+        self._idle: queue.LifoQueue[http.client.HTTPConnection] = queue.LifoQueue(maxsize=size)
+
+    def acquire(self, fresh: bool = False) -> http.client.HTTPConnection:
+        if not fresh:
+            try:
+                return self._idle.get_nowait()
+            except queue.Empty:
+                pass
+        conn_cls = http.client.HTTPSConnection if self.scheme == "https" else http.client.HTTPConnection
+        return conn_cls(self.host, self.port, timeout=self.timeout)
+
+    def release(self, conn: http.client.HTTPConnection, reusable: bool) -> None:
+        if not reusable:
+            conn.close()
+            return
+        try:
+            self._idle.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+
+    def close(self) -> None:
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+class OpenAICompatBackend(CopilotBackend):
+    """Client for a local OpenAI-compatible server (llama.cpp, vLLM, Ollama) using SSE streaming."""
+
+    name = "openai-compatible"
+
+    def __init__(
+        self,
+        base_url: str,
+        model: str,
+        pool_size: int = 4,
+        timeout: float = 30.0,
+        max_tokens: int = 256,
+        extra_body: dict[str, Any] | None = None,
+    ) -> None:
+        self.model = model
+        self.max_tokens = max_tokens
+        self.extra_body = extra_body or {}
+        self.pool = ConnectionPool(base_url, size=pool_size, timeout=timeout)
+
+    def request_body(self, context: dict[str, Any]) -> dict[str, Any]:
+        body = {
+            "model": self.model,
+            "messages": build_messages(context),
+            "max_tokens": self.max_tokens,
+            "stream": True,
+        }
+        body.update(self.extra_body)
+        body.update(context.get("extra_body", {}))
+        return body
+
+    def _open(self, payload: bytes) -> tuple[http.client.HTTPConnection, http.client.HTTPResponse]:
+        headers = {"Content-Type": "application/json", "Accept": "text/event-stream"}
+        path = f"{self.pool.path_prefix}/v1/chat/completions"
+        # A pooled connection may have been closed by the server while idle; retry once on a new one.
+        for fresh in (False, True):
+            conn = self.pool.acquire(fresh=fresh)
+            try:
+                conn.request("POST", path, body=payload, headers=headers)
+                return conn, conn.getresponse()
+            except (OSError, http.client.HTTPException) as exc:
+                conn.close()
+                error = exc
+        raise CopilotBackendError(f"Copilot server unreachable: {error}") from error
+
+    def stream(self, context: dict[str, Any]) -> Iterator[str]:
+        payload = json.dumps(self.request_body(context)).encode("utf-8")
+        conn, response = self._open(payload)
+        finished = False
+        try:
+            if response.status != 200:
+                detail = response.read().decode("utf-8", "replace")[:200]
+                finished = not response.will_close
+                raise CopilotBackendError(f"Copilot server returned {response.status}: {detail}")
+
+            try:
+                for raw in response:
+                    line = raw.decode("utf-8").strip()
+                    if not line.startswith("data:"):
+                        continue
+                    data = line[len("data:"):].strip()
+                    if data == "[DONE]":
+                        break
+                    delta = json.loads(data)["choices"][0].get("delta", {})
+                    if delta.get("content"):
+                        yield delta["content"]
+                else:
+                    # http.client ends iteration quietly when the server drops the connection mid-body.
+                    raise CopilotBackendError("Copilot stream ended before [DONE]")
+
+                # Drain anything after [DONE] so the keep-alive connection can be reused.
+                response.read()
+            # Dropped sockets, read timeouts, truncated bodies and malformed SSE events all end the reply.
+            except (OSError, http.client.HTTPException, ValueError, LookupError, AttributeError, TypeError) as exc:
+                raise CopilotBackendError(f"Copilot stream failed: {exc!r}") from exc
+            finished = not response.will_close
+        finally:
+            # A reply abandoned mid-stream leaves unread data on the socket, so that connection is dropped.
+            self.pool.release(conn, reusable=finished)
+
+    def close(self) -> None:
+        self.pool.close()
@@ -0,0 +1,247 @@
+﻿"""Vectorized, seed-deterministic synthetic roster generator for demos and load tests."""
+
+from __future__ import annotations
+
+from datetime import date, timedelta
+from typing import Any, Iterator
+
+import numpy as np
+
+from assets.records import CompactRoster
+
+REF_DATE = date(2026, 2, 14)
+CATEGORIES = ["due_today", "overdue", "new_visit", "due_week"]
+CATEGORY_WEIGHTS = [0.35, 0.30, 0.20, 0.15]
+DUE_TODAY, OVERDUE, NEW_VISIT, DUE_WEEK = range(len(CATEGORIES))
+
+FIRST_NAMES = [
+    "Safa",
+    "Imani",
+    "Kito",
+    "Ayo",
+    "Nia",
+    "Tari",
+    "Mosi",
+    "Zuri",
+    "Kena",
+    "Lela",
+    "Pendo",
+    "Ari",
+    "Jabari",
+    "Nala",
+    "Rafi",
+    "Tamu",
+    "Eshe",
+    "Moyo",
+]
+LAST_INITIALS = [
+    "Q.", "W.", "E.", "R.", "T.", "Y.", "U.", "I.", "O.",
+    "P.", "A.", "S.", "D.", "F.", "G.", "H.", "J.", "K.",
+]
+AVATARS = ["🧒", "👦", "👧", "🧑", "👶"]
+# Name and initial both cycle with the row index, so the pseudonym repeats every len(FIRST_NAMES) rows.
+PSEUDONYMS = [f"{FIRST_NAMES[i]} {LAST_INITIALS[i % len(LAST_INITIALS)]}" for i in range(len(FIRST_NAMES))]
+
+STATUSES = ["urgent follow-up", "new visit", "normal follow-up"]
+VISIT_KEYS = ("rr", "danger_sign", "unable_to_drink", "vomiting_everything", "chest_indrawing")
+
+NEW_SUMMARY = "No prior visit. New household in catchment."
+FOLLOW_UP_SUMMARY = "Recent respiratory follow-up. Continue close reassessment based on local protocol."
+LAST_VISIT_DATES = [(REF_DATE - timedelta(days=days)).isoformat() for days in range(13)]
+
+# Each block of rows draws from its own RNG stream, so output depends only on (seed, n), not chunk size.
+BLOCK_SIZE = 8192
+JITTER_DEG = 0.0125
+RECORD_COLUMNS = (
+    "idx", "category", "is_new", "overdue_days", "follow_up_due", "urgent", "rr_last", "rr_curr", "days_ago",
+    "danger_last", "indrawing_last", "vomiting_last", "danger_curr", "unable_curr", "vomiting_curr",
+    "indrawing_curr", "referral_pending", "age_months", "lat", "lon",
+)
+
+
+def _block_columns(base_patients: list[dict[str, Any]], seed: int, block: int, start: int, stop: int) -> dict[str, np.ndarray]:
+    rng = np.random.default_rng([seed, block])
+    size = stop - start
+    idx = np.arange(start, stop)
+
+    category = rng.choice(len(CATEGORIES), size=size, p=CATEGORY_WEIGHTS)
+    draws = rng.random((9, size))
+    is_new = category == NEW_VISIT
+    is_overdue = category == OVERDUE
+    follow_up_due = category != NEW_VISIT
+
+    urgent = ((category == OVERDUE) | (category == DUE_TODAY)) & (draws[0] < 0.38) | (idx % 11 == 0)
+    danger_last = urgent & ~is_new & (draws[1] < 0.55)
+    indrawing_last = urgent & ~is_new & (draws[2] < 0.45)
+
+    rr_last = rng.integers(34, 63, size=size)
+    rr_curr = np.maximum(26, rr_last + rng.integers(-7, 5, size=size))
+
+    template = idx % len(base_patients)
+    base_lat = np.array([patient["lat"] for patient in base_patients])[template]
+    base_lon = np.array([patient["lon"] for patient in base_patients])[template]
+
+    return {
+        "idx": idx,
+        "category": category,
+        "is_new": is_new,
+        "overdue_days": np.where(is_overdue, rng.integers(1, 6, size=size), 0),
+        "follow_up_due": follow_up_due,
+        "urgent": urgent,
+        "rr_last": rr_last,
+        "rr_curr": rr_curr,
+        "days_ago": rng.integers(1, 13, size=size),
+        "danger_last": danger_last,
+        "indrawing_last": indrawing_last,
+        "vomiting_last": danger_last & (draws[3] < 0.5),
+        "danger_curr": danger_last & (category != DUE_WEEK),
+        "unable_curr": danger_last & (draws[4] < 0.75),
+        "vomiting_curr": danger_last & (draws[5] < 0.45),
+        "indrawing_curr": indrawing_last & (draws[6] < 0.7),
+        "referral_pending": urgent | (is_overdue & (draws[7] < 0.5)),
+        "age_months": rng.integers(8, 49, size=size),
+        "lat": np.round(base_lat + rng.uniform(-JITTER_DEG, JITTER_DEG, size=size), 6),
+        "lon": np.round(base_lon + rng.uniform(-JITTER_DEG, JITTER_DEG, size=size), 6),
+    }
+
+
+def _block_records(columns: dict[str, np.ndarray]) -> list[dict[str, Any]]:
+    rows = zip(*(columns[name].tolist() for name in RECORD_COLUMNS))
+    records = []
+    for (
+        i, category, is_new, overdue_days, follow_up_due, urgent, rr_last, rr_curr, days_ago,
+        danger_last, indrawing_last, vomiting_last, danger_curr, unable_curr, vomiting_curr,
+        indrawing_curr, referral_pending, age_months, lat, lon,
+    ) in rows:
+        if is_new:
+            last_visit_date = None
+            last_visit_summary = NEW_SUMMARY
+            last_visit_fields: dict[str, Any] = {}
+            current_seed: dict[str, Any] = {}
+        else:
+            last_visit_date = LAST_VISIT_DATES[days_ago]
+            last_visit_summary = FOLLOW_UP_SUMMARY
+            last_visit_fields = {
+                "rr": rr_last,
+                "danger_sign": danger_last,
+                "unable_to_drink": danger_last,
+                "vomiting_everything": vomiting_last,
+                "chest_indrawing": indrawing_last,
+            }
+            current_seed = {
+                "rr": rr_curr,
+                "danger_sign": danger_curr,
+                "unable_to_drink": unable_curr,
+                "vomiting_everything": vomiting_curr,
+                "chest_indrawing": indrawing_curr,
+            }
+
+        records.append(
+            {
+                "id": f"d{i + 1:03d}",
+                "pseudonym": PSEUDONYMS[i % len(PSEUDONYMS)],
+                "age_months": age_months,
+                "avatar": AVATARS[i % len(AVATARS)],
+                "lat": lat,
+                "lon": lon,
+                "last_visit_date": last_visit_date,
+                "last_visit_summary": last_visit_summary,
+                "last_visit_fields": last_visit_fields,
+                "current_visit_seed": current_seed,
+                "follow_up_due": follow_up_due,
+                "status": "urgent follow-up" if urgent else ("new visit" if is_new else "normal follow-up"),
+                "due_category": CATEGORIES[category],
+                "overdue_days": overdue_days,
+                "due_today": category == DUE_TODAY,
+                "due_this_week": follow_up_due,
+                "facility_referral_pending": referral_pending,
+                "protocol_followup_due": follow_up_due or urgent,
+                "is_dummy": True,
+            }
+        )
+    return records
+
+
+def _block_fields(columns: dict[str, np.ndarray]) -> tuple[list[str], dict[str, Any], dict[str, np.ndarray]]:
+    """Same rows as _block_records, laid out as CompactRoster.extend_columns arguments."""
+    idx = columns["idx"]
+    is_new = columns["is_new"]
+    follow_up_due = columns["follow_up_due"]
+    urgent = columns["urgent"]
+    has_visit = ~is_new
+
+    fields: dict[str, Any] = {
+        "pseudonym": (idx % len(PSEUDONYMS), PSEUDONYMS),
+        "age_months": columns["age_months"],
+        "avatar": (idx % len(AVATARS), AVATARS),
+        "lat": columns["lat"],
+        "lon": columns["lon"],
+        "last_visit_date": (np.where(is_new, 0, columns["days_ago"]), [None, *LAST_VISIT_DATES[1:]]),
+        "last_visit_summary": (has_visit.astype(np.int64), [NEW_SUMMARY, FOLLOW_UP_SUMMARY]),
+        "follow_up_due": follow_up_due,
+        "status": (np.where(urgent, 0, np.where(is_new, 1, 2)), STATUSES),
+        "due_category": (columns["category"], CATEGORIES),
+        "overdue_days": columns["overdue_days"],
+        "due_today": columns["category"] == DUE_TODAY,
+        "due_this_week": follow_up_due,
+        "facility_referral_pending": columns["referral_pending"],
+        "protocol_followup_due": follow_up_due | urgent,
+        "is_dummy": np.ones(len(idx), dtype=bool),
+    }
+    visits = {
+        "last_visit_fields": ("rr_last", "danger_last", "danger_last", "vomiting_last", "indrawing_last"),
+        "current_visit_seed": ("rr_curr", "danger_curr", "unable_curr", "vomiting_curr", "indrawing_curr"),
+    }
+    present: dict[str, np.ndarray] = {}
+    for visit, sources in visits.items():
+        for key, source in zip(VISIT_KEYS, sources):
+            fields[f"{visit}.{key}"] = columns[source]
+            present[f"{visit}.{key}"] = has_visit
+
+    ids = [f"d{i + 1:03d}" for i in idx.tolist()]
+    return ids, fields, present
+
+
+def iter_dummy_patient_columns(
+    base_patients: list[dict[str, Any]],
+    n: int,
+    seed: int = 42,
+) -> Iterator[tuple[list[str], dict[str, Any], dict[str, np.ndarray]]]:
+    """Yield the roster one RNG block at a time as (ids, fields, present) for CompactRoster.extend_columns."""
+    for block, start in enumerate(range(0, n, BLOCK_SIZE)):
+        stop = min(start + BLOCK_SIZE, n)
+        yield _block_fields(_block_columns(base_patients, seed, block, start, stop))
+
+
+def build_roster_records(base_patients: list[dict[str, Any]], n: int, seed: int = 42) -> CompactRoster:
+    """The base patients followed by n generated households, built column-wise."""
+    records = CompactRoster(base_patients)
+    for ids, fields, present in iter_dummy_patient_columns(base_patients, n=n, seed=seed):
+        records.extend_columns(ids, fields, present)
+    return records
+
+
+def iter_dummy_patient_chunks(
+    base_patients: list[dict[str, Any]],
+    n: int,
+    seed: int = 42,
+    chunk_size: int = BLOCK_SIZE * 8,
+) -> Iterator[list[dict[str, Any]]]:
+    """Yield the roster in chunks of about chunk_size records (rounded to whole RNG blocks)."""
+    blocks_per_chunk = max(1, chunk_size // BLOCK_SIZE)
+    chunk: list[dict[str, Any]] = []
+    for block, start in enumerate(range(0, n, BLOCK_SIZE)):
+        stop = min(start + BLOCK_SIZE, n)
+        chunk.extend(_block_records(_block_columns(base_patients, seed, block, start, stop)))
+        if (block + 1) % blocks_per_chunk == 0:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def generate_dummy_patients(base_patients: list[dict[str, Any]], n: int = 18, seed: int = 42) -> list[dict[str, Any]]:
+    patients: list[dict[str, Any]] = []
+    for chunk in iter_dummy_patient_chunks(base_patients, n, seed):
+        patients.extend(chunk)
+    return patients
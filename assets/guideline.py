@@ -0,0 +1,217 @@
+"""Guideline decision table compiled into scalar, incremental and vectorized triage evaluators."""
+
+from __future__ import annotations
+
+from typing import Any, Callable, Mapping
+
+import numpy as np
+
+from assets.scenario import GUIDELINE_STAGES
+
+# Index is the classification code; higher codes are more severe.
+CLASSIFICATIONS = [
+    ("Pending", "yellow"),
+    ("HOME CARE & FOLLOW-UP", "green"),
+    ("CLINIC REVIEW TODAY", "yellow"),
+    ("URGENT REFERRAL", "red"),
+]
+PENDING, HOME_CARE, CLINIC_REVIEW, URGENT_REFERRAL = range(len(CLASSIFICATIONS))
+PENDING_REASON = "Awaiting guideline steps"
+NO_FINDINGS_REASON = "No danger signs or fast breathing"
+
+# Fast breathing for age: (under this many months, breaths/min at or above which breathing is fast).
+FAST_BREATHING_BANDS = [(12, 50), (60, 40)]
+AGE_FIELD = "age_months"
+# The classification is only shown once the conversation reaches this stage.
+DECISION_STAGE = "Triage"
+
+# Each rule fires when any of its findings holds. A fired rule raises the classification to at least
+# its own; its reason is dropped when a rule named in "unless" also fired.
+DECISION_TABLE = [
+    {
+        "stage": "Danger Signs",
+        "reason": "Danger sign present",
+        "any": [
+            ("danger_sign", "is", True),
+            ("unable_to_drink", "is", True),
+            ("vomiting_everything", "is", True),
+            ("seizures", "is", True),
+        ],
+        "classification": URGENT_REFERRAL,
+    },
+    {
+        "stage": "Breathing",
+        "reason": "Respiratory distress",
+        "any": [("chest_indrawing", "is", True)],
+        "classification": URGENT_REFERRAL,
+    },
+    {
+        "stage": "Breathing",
+        "reason": "Fast breathing for age",
+        "any": [("rr", "fast_for_age", FAST_BREATHING_BANDS)],
+        "unless": ["Respiratory distress"],
+        "classification": CLINIC_REVIEW,
+    },
+]
+
+
+def fast_breathing_threshold(age_months: Any, bands: list[tuple[int, int]] = FAST_BREATHING_BANDS) -> int:
+    # Unknown age uses the youngest band, as the batch path reads a missing age as 0.
+    age = age_months or 0
+    for max_months, threshold in bands:
+        if age < max_months:
+            return threshold
+    return bands[-1][1]
+
+
+def _scalar_clause(field: str, op: str, arg: Any) -> Callable[[Mapping[str, Any]], bool]:
+    if op == "is":
+        return lambda state: state.get(field) is arg
+    if op == ">=":
+        return lambda state: state.get(field) is not None and state[field] >= arg
+    if op == "fast_for_age":
+        return lambda state: (
+            state.get(field) is not None and state[field] >= fast_breathing_threshold(state.get(AGE_FIELD), arg)
+        )
+    raise ValueError(f"Unknown guideline operator: {op}")
+
+
+def _column_clause(field: str, op: str, arg: Any, columns: Mapping[str, tuple[np.ndarray, np.ndarray]], n: int) -> np.ndarray:
+    if field not in columns:
+        return np.zeros(n, dtype=bool)
+    values, present = columns[field]
+    if op == "is":
+        return present & (values.astype(bool) if arg is True else ~values.astype(bool))
+    if op == ">=":
+        return present & (values >= arg)
+    if op == "fast_for_age":
+        age = columns[AGE_FIELD][0] if AGE_FIELD in columns else np.zeros(n)
+        threshold = np.full(n, arg[-1][1])
+        for max_months, band_threshold in reversed(arg):
+            threshold = np.where(age < max_months, band_threshold, threshold)
+        return present & (values >= threshold)
+    raise ValueError(f"Unknown guideline operator: {op}")
+
+
+class GuidelineEngine:
+    """A decision table compiled once: per-rule predicates, a field-to-rule dependency map and a
+    precomputed outcome for every combination of fired rules."""
+
+    def __init__(
+        self,
+        table: list[dict[str, Any]] = DECISION_TABLE,
+        stages: list[str] = GUIDELINE_STAGES,
+        decision_stage: str = DECISION_STAGE,
+    ) -> None:
+        for rule in table:
+            if rule["stage"] not in stages:
+                raise ValueError(f"Unknown guideline stage: {rule['stage']}")
+        self.table = table
+        self.stage_order = {stage: pos for pos, stage in enumerate(stages)}
+        self.decision_stage = self.stage_order[decision_stage]
+
+        self.rules = [[_scalar_clause(*clause) for clause in rule["any"]] for rule in table]
+        self.findings = tuple(dict.fromkeys(clause[0] for rule in table for clause in rule["any"]))
+        self.dependents: dict[str, tuple[int, ...]] = {
+            field: tuple(
+                pos for pos, rule in enumerate(table)
+                if any(clause[0] == field or (clause[1] == "fast_for_age" and field == AGE_FIELD) for clause in rule["any"])
+            )
+            for field in (*self.findings, AGE_FIELD)
+        }
+
+        # Outcome k < 2**len(table) is the result when exactly the rules in bitmask k fired; the last is Pending.
+        reason_bit = {rule["reason"]: 1 << pos for pos, rule in enumerate(table)}
+        self.outcomes: list[dict[str, Any]] = []
+        for mask in range(1 << len(table)):
+            fired = [rule for pos, rule in enumerate(table) if mask >> pos & 1]
+            code = max((rule["classification"] for rule in fired), default=HOME_CARE)
+            reasons = [
+                rule["reason"] for rule in fired if not any(mask & reason_bit[other] for other in rule.get("unless", []))
+            ]
+            self.outcomes.append(self._result(code, reasons or [NO_FINDINGS_REASON]))
+        self.pending = len(self.outcomes)
+        self.outcomes.append(self._result(PENDING, [PENDING_REASON]))
+        self.outcome_codes = np.array([CLASSIFICATIONS.index((o["classification"], o["color"])) for o in self.outcomes])
+
+    @staticmethod
+    def _result(code: int, reasons: list[str]) -> dict[str, Any]:
+        label, color = CLASSIFICATIONS[code]
+        return {"classification": label, "color": color, "reasons": reasons}
+
+    def fires(self, pos: int, state: Mapping[str, Any]) -> bool:
+        return any(clause(state) for clause in self.rules[pos])
+
+    def outcome(self, state: Mapping[str, Any], stage: str | None = None) -> int:
+        if stage is not None and self.stage_order.get(stage, -1) < self.decision_stage:
+            return self.pending
+        if all(state.get(field) is None for field in self.findings):
+            return self.pending
+        return sum(1 << pos for pos in range(len(self.rules)) if self.fires(pos, state))
+
+    def evaluate(self, state: Mapping[str, Any], stage: str | None = None) -> dict[str, Any]:
+        """Classification, color and reasons for a patient_state; Pending before the decision stage."""
+        return self.outcomes[self.outcome(state, stage)]
+
+    def evaluate_columns(self, columns: Mapping[str, tuple[np.ndarray, np.ndarray]], n: int) -> np.ndarray:
+        """Outcome index per row for (values, present) columns keyed by field; rows with no findings are Pending."""
+        mask = np.zeros(n, dtype=np.int64)
+        for pos, rule in enumerate(self.table):
+            fired = np.zeros(n, dtype=bool)
+            for clause in rule["any"]:
+                fired |= _column_clause(*clause, columns, n)
+            mask |= fired.astype(np.int64) << pos
+        assessed = np.zeros(n, dtype=bool)
+        for field in self.findings:
+            if field in columns:
+                assessed |= columns[field][1]
+        return np.where(assessed, mask, self.pending)
+
+    def session(self, state: Mapping[str, Any] | None = None, stage: str | None = None) -> "TriageSession":
+        return TriageSession(self, state or {}, stage)
+
+
+class TriageSession:
+    """Incremental evaluation of one visit: each update re-checks only the rules that read a changed field."""
+
+    def __init__(self, engine: GuidelineEngine, state: Mapping[str, Any], stage: str | None = None) -> None:
+        self.engine = engine
+        self.state = dict(state)
+        self.stage = stage
+        self.mask = sum(1 << pos for pos in range(len(engine.rules)) if engine.fires(pos, self.state))
+        self.assessed = {field for field in engine.findings if self.state.get(field) is not None}
+
+    def update(self, changes: Mapping[str, Any], stage: str | None = None) -> dict[str, Any]:
+        engine = self.engine
+        touched: set[int] = set()
+        for field, value in changes.items():
+            self.state[field] = value
+            if field in engine.dependents:
+                touched.update(engine.dependents[field])
+            if field in engine.findings:
+                if value is None:
+                    self.assessed.discard(field)
+                else:
+                    self.assessed.add(field)
+        for pos in touched:
+            if engine.fires(pos, self.state):
+                self.mask |= 1 << pos
+            else:
+                self.mask &= ~(1 << pos)
+        if stage is not None:
+            self.stage = stage
+        return self.result
+
+    @property
+    def outcome(self) -> int:
+        engine = self.engine
+        if self.stage is not None and engine.stage_order.get(self.stage, -1) < engine.decision_stage:
+            return engine.pending
+        return self.mask if self.assessed else engine.pending
+
+    @property
+    def result(self) -> dict[str, Any]:
+        return self.engine.outcomes[self.outcome]
+
+
+GUIDELINE = GuidelineEngine()
@@ -0,0 +1,76 @@
+﻿"""Rolling latency metrics for copilot replies and Streamlit reruns."""
+
+from __future__ import annotations
+
+import math
+import time
+from collections import deque
+from typing import Callable, Iterable, Iterator
+
+
+class RollingWindow:
+    """Keeps the most recent samples and answers nearest-rank percentiles."""
+
+    def __init__(self, size: int = 200) -> None:
+        self.samples: deque[float] = deque(maxlen=size)
+
+    def __len__(self) -> int:
+        return len(self.samples)
+
+    def add(self, value: float) -> None:
+        self.samples.append(value)
+
+    def percentile(self, q: float) -> float | None:
+        if not self.samples:
+            return None
+        ordered = sorted(self.samples)
+        rank = max(1, math.ceil(q / 100 * len(ordered)))
+        return ordered[rank - 1]
+
+
+class EdgeMetrics:
+    """Per-session reply and render timings."""
+
+    def __init__(self, window: int = 200) -> None:
+        self.ttft = RollingWindow(window)
+        self.tokens_per_sec = RollingWindow(window)
+        self.reply_latency = RollingWindow(window)
+        self.render_time = RollingWindow(window)
+
+    def record_reply(self, started_at: float, first_at: float | None, finished_at: float, tokens: int) -> None:
+        self.reply_latency.add(finished_at - started_at)
+        if first_at is None:
+            return
+        self.ttft.add(first_at - started_at)
+        # Rate over the decode phase only, so TTFT does not drag tok/s down.
+        if tokens > 1 and finished_at > first_at:
+            self.tokens_per_sec.add((tokens - 1) / (finished_at - first_at))
+
+    def record_render(self, seconds: float) -> None:
+        self.render_time.add(seconds)
+
+
+def instrument_stream(
+    chunks: Iterable[str],
+    metrics: EdgeMetrics,
+    clock: Callable[[], float] = time.perf_counter,
+) -> Iterator[str]:
+    """Pass chunks through while timing first-chunk latency, chunk rate and total reply time."""
+    started_at = clock()
+    first_at = None
+    tokens = 0
+    for chunk in chunks:
+        if first_at is None:
+            first_at = clock()
+        tokens += 1
+        yield chunk
+
+    metrics.record_reply(started_at, first_at, clock(), tokens)
+
+
+def format_seconds(value: float | None) -> str:
+    return "-" if value is None else f"{value:.2f}s"
+
+
+def format_rate(value: float | None) -> str:
+    return "-" if value is None else f"{value:.1f}"
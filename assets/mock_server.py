@@ -0,0 +1,193 @@
+﻿"""Local OpenAI-compatible mock server that streams tokens at a configurable rate.
+
+Run standalone for load tests:
+
+    python -m assets.mock_server --port 8080 --tokens-per-sec 12 --ttft 0.9
+"""
+
+from __future__ import annotations
+
+import argparse
+import contextlib
+import json
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any
+
+from assets.copilot import chunk_text
+
+DEFAULT_REPLY = (
+    "This is a mock reply from the local copilot server. "
+    "It streams tokens at a fixed rate so the request path can be load-tested offline."
+)
+
+
+class MockCompletionHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: "MockServer"
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+    def _send_json(self, status: int, payload: dict[str, Any]) -> None:
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _write_chunk(self, data: bytes) -> None:
+        self.wfile.write(f"{len(data):X}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+    def do_GET(self) -> None:
+        if self.path.rstrip("/") == "/v1/models":
+            self._send_json(200, {"object": "list", "data": [{"id": self.server.model, "object": "model"}]})
+        else:
+            self._send_json(404, {"error": {"message": f"Unknown path {self.path}"}})
+
+    def do_POST(self) -> None:
+        if self.path.rstrip("/") != "/v1/chat/completions":
+            self._send_json(404, {"error": {"message": f"Unknown path {self.path}"}})
+            return
+
+        length = int(self.headers.get("Content-Length", 0))
+        try:
+            body = json.loads(self.rfile.read(length) or b"{}")
+        except json.JSONDecodeError:
+            self._send_json(400, {"error": {"message": "Request body is not valid JSON"}})
+            return
+
+        tokens = chunk_text(body.get("mock_reply") or self.server.reply)
+        if body.get("max_tokens"):
+            tokens = tokens[: int(body["max_tokens"])]
+        self.server.record_request()
+
+        time.sleep(self.server.ttft)
+        if not body.get("stream"):
+            time.sleep(max(0, len(tokens) - 1) * self.server.token_interval)
+            self._send_json(200, completion_payload(self.server.model, "".join(tokens)))
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        try:
+            for idx, token in enumerate(tokens):
+                if idx:
+                    time.sleep(self.server.token_interval)
+                self._write_chunk(sse_event(chunk_payload(self.server.model, token)))
+            self._write_chunk(b"data: [DONE]\n\n")
+            self._write_chunk(b"")
+        except (BrokenPipeError, ConnectionResetError):
+            # The client stopped reading mid-reply; drop the connection quietly.
+            self.close_connection = True
+
+
+def completion_payload(model: str, text: str) -> dict[str, Any]:
+    return {
+        "object": "chat.completion",
+        "model": model,
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+    }
+
+
+def chunk_payload(model: str, token: str) -> dict[str, Any]:
+    return {
+        "object": "chat.completion.chunk",
+        "model": model,
+        "choices": [{"index": 0, "delta": {"content": token}, "finish_reason": None}],
+    }
+
+
+def sse_event(payload: dict[str, Any]) -> bytes:
+    return f"data: {json.dumps(payload)}\n\n".encode("utf-8")
+
+
+class MockServer(ThreadingHTTPServer):
+    """Threaded mock server; start() serves from a daemon thread on an ephemeral port by default."""
+
+    daemon_threads = True
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        tokens_per_sec: float = 12.0,
+        ttft: float = 0.9,
+        reply: str = DEFAULT_REPLY,
+        model: str = "mock-medgemma",
+    ) -> None:
+        super().__init__((host, port), MockCompletionHandler)
+        self.token_interval = 1.0 / tokens_per_sec if tokens_per_sec > 0 else 0.0
+        self.ttft = ttft
+        self.reply = reply
+        self.model = model
+        self.requests_served = 0
+        self.connections_opened = 0
+        self._lock = threading.Lock()
+        self._open: set[socket.socket] = set()
+        self._thread: threading.Thread | None = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def record_request(self) -> None:
+        with self._lock:
+            self.requests_served += 1
+
+    def process_request(self, request: Any, client_address: Any) -> None:
+        with self._lock:
+            self.connections_opened += 1
+            self._open.add(request)
+        super().process_request(request, client_address)
+
+    def shutdown_request(self, request: Any) -> None:
+        with self._lock:
+            self._open.discard(request)
+        super().shutdown_request(request)
+
+    def start(self) -> "MockServer":
+        if self._thread is None:
+            self._thread = threading.Thread(target=self.serve_forever, name="copilot-mock-server", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.shutdown()
+        # Keep-alive handler threads block reading the next request; closing their sockets lets them exit.
+        with self._lock:
+            open_sockets = list(self._open)
+        for sock in open_sockets:
+            with contextlib.suppress(OSError):
+                sock.shutdown(socket.SHUT_RDWR)
+        self.server_close()
+        self._thread = None
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--tokens-per-sec", type=float, default=12.0)
+    parser.add_argument("--ttft", type=float, default=0.9, help="Seconds before the first token.")
+    args = parser.parse_args()
+
+    server = MockServer(args.host, args.port, tokens_per_sec=args.tokens_per_sec, ttft=args.ttft)
+    print(f"Mock copilot server on {server.base_url} ({args.tokens_per_sec} tok/s, TTFT {args.ttft}s)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
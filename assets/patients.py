@@ -138,8 +138,8 @@ PATIENTS = [
 ]
 
 
+_PATIENTS_BY_ID = {patient["id"]: patient for patient in PATIENTS}
+
+
 def get_patient_by_id(patient_id: str) -> dict | None:
-    for patient in PATIENTS:
-        if patient["id"] == patient_id:
-            return patient
-    return None
+    return _PATIENTS_BY_ID.get(patient_id)
@@ -0,0 +1,79 @@
+﻿"""Precompiled scenario snapshots for O(1) seek and rewind."""
+
+from __future__ import annotations
+
+from typing import Any
+
+from assets.guideline import GUIDELINE
+from assets.scenario import SCENARIO_STEPS
+
+INITIAL_TRACE = "Memory Map"
+
+
+def initial_triage() -> dict[str, Any]:
+    return GUIDELINE.outcomes[GUIDELINE.pending]
+
+
+def initial_snapshot() -> dict[str, Any]:
+    return {
+        "step_idx": -1,
+        "message_count": 0,
+        "patient_updates": {},
+        "guideline_trace_step": INITIAL_TRACE,
+        "triage_result": initial_triage(),
+        "next_actions": [],
+        "caregiver_message": "",
+        "referral_packet": "",
+        "show_referral": False,
+        "show_metrics": False,
+        "metrics_badges": [],
+        "demo_complete": False,
+    }
+
+
+def compile_scenario(steps: list[dict[str, Any]]) -> tuple[list[dict[str, Any]], list[dict[str, Any]]]:
+    """Fold the steps once into cumulative snapshots plus the scripted transcript.
+
+    snapshots[k + 1] is the demo state right after steps[k]; snapshots[0] is the start.
+    Each snapshot's message_count is the transcript prefix visible at that point.
+    """
+    messages: list[dict[str, Any]] = []
+    snapshots = [initial_snapshot()]
+    triage = GUIDELINE.session()
+
+    for idx, step in enumerate(steps):
+        prev = snapshots[-1]
+        trace = step.get("trace", prev["guideline_trace_step"])
+        messages.append({"speaker": step["speaker"], "text": step.get("text", ""), "trace": trace})
+
+        snapshot = {
+            **prev,
+            "step_idx": idx,
+            "message_count": len(messages),
+            "patient_updates": {**prev["patient_updates"], **step.get("updates", {})},
+            "guideline_trace_step": trace,
+            "demo_complete": idx == len(steps) - 1,
+        }
+        snapshot["triage_result"] = triage.update(step.get("updates", {}), stage=trace)
+        for key in ("next_actions", "caregiver_message", "referral_packet"):
+            if step.get(key):
+                snapshot[key] = step[key]
+        if step.get("ui_event") == "show_referral":
+            snapshot["show_referral"] = True
+        elif step.get("ui_event") == "show_metrics":
+            snapshot["show_metrics"] = True
+            snapshot["metrics_badges"] = step.get("metrics", [])
+
+        snapshots.append(snapshot)
+
+    return snapshots, messages
+
+
+SCENARIO_SNAPSHOTS, SCENARIO_MESSAGES = compile_scenario(SCENARIO_STEPS)
+
+
+def snapshot_at(step_idx: int) -> dict[str, Any]:
+    """State after SCENARIO_STEPS[step_idx]; -1 is the start of the scenario."""
+    if not -1 <= step_idx < len(SCENARIO_STEPS):
+        raise IndexError(f"Scenario step {step_idx} out of range")
+    return SCENARIO_SNAPSHOTS[step_idx + 1]
@@ -0,0 +1,245 @@
+﻿"""Columnar roster ranking for the Home follow-up list."""
+
+from __future__ import annotations
+
+import bisect
+from typing import Any, Callable, Mapping, Sequence
+
+import numpy as np
+
+META_FLAGS = (
+    "is_urgent",
+    "overdue",
+    "due_today",
+    "due_this_week",
+    "referral_pending",
+    "protocol_due",
+    "is_new",
+)
+
+# Same weights as patient_priority(); overdue adds min(overdue_days, 7) on top.
+PRIORITY_WEIGHTS = {
+    "is_urgent": 80,
+    "overdue": 60,
+    "due_today": 40,
+    "due_this_week": 20,
+    "referral_pending": 14,
+    "protocol_due": 8,
+    "is_new": 4,
+}
+OVERDUE_DAYS_CAP = 7
+
+FILTER_FLAGS = {
+    "Urgent": "is_urgent",
+    "Due today": "due_today",
+    "New visits": "is_new",
+    "Overdue": "overdue",
+}
+
+# A page cursor is (section, rank of the last row shown): section 0 holds filter matches and, for
+# flag filters, section 1 the remaining households; ranks are positions in the overall priority order.
+Cursor = tuple[int, int]
+
+
+def compute_patient_meta(patient: dict[str, Any]) -> dict[str, Any]:
+    due_category = patient.get("due_category")
+    overdue_days = int(patient.get("overdue_days", 0) or 0)
+
+    is_new = bool(patient.get("status") == "new visit" or patient.get("last_visit_date") is None or due_category == "new_visit")
+    is_urgent = patient.get("status") == "urgent follow-up"
+
+    if due_category == "due_today":
+        due_today = True
+    elif due_category == "overdue":
+        due_today = False
+    else:
+        due_today = bool(patient.get("follow_up_due", False) and not is_new and overdue_days == 0)
+
+    overdue = due_category == "overdue" or overdue_days > 0
+    due_this_week = bool(patient.get("due_this_week", patient.get("follow_up_due", False) or due_today or overdue))
+
+    protocol_due = bool(patient.get("protocol_followup_due", patient.get("follow_up_due", False) or due_today or overdue))
+    referral_pending = bool(patient.get("facility_referral_pending", is_urgent))
+
+    return {
+        "is_new": is_new,
+        "is_urgent": is_urgent,
+        "due_today": due_today,
+        "overdue": overdue,
+        "overdue_days": overdue_days,
+        "due_this_week": due_this_week,
+        "protocol_due": protocol_due,
+        "referral_pending": referral_pending,
+    }
+
+
+class RosterCounters:
+    """Household totals per meta flag, kept current by applying one record change at a time."""
+
+    def __init__(self, total: int = 0, counts: Mapping[str, int] | None = None) -> None:
+        self.total = total
+        self.counts = {flag: 0 for flag in META_FLAGS}
+        self.counts.update(counts or {})
+
+    def apply(self, old_meta: Mapping[str, Any] | None, new_meta: Mapping[str, Any]) -> None:
+        """Account for a household added (old_meta is None) or changed from old_meta to new_meta."""
+        if old_meta is None:
+            self.total += 1
+        for flag in META_FLAGS:
+            self.counts[flag] += bool(new_meta[flag]) - bool(old_meta and old_meta[flag])
+
+    def filter_count(self, filter_name: str) -> int:
+        flag = FILTER_FLAGS.get(filter_name)
+        return self.total if flag is None else self.counts[flag]
+
+    def to_json(self) -> dict[str, Any]:
+        return {"total": self.total, "counts": self.counts}
+
+    @classmethod
+    def from_json(cls, data: Mapping[str, Any]) -> "RosterCounters":
+        return cls(data["total"], data["counts"])
+
+
+def priority_score(meta: dict[str, Any]) -> int:
+    score = sum(weight for flag, weight in PRIORITY_WEIGHTS.items() if meta[flag])
+    if meta["overdue"]:
+        score += min(meta["overdue_days"], OVERDUE_DAYS_CAP)
+    return score
+
+
+def section_count(filter_name: str) -> int:
+    return 2 if filter_name in FILTER_FLAGS else 1
+
+
+class PagedRanking:
+    """Cursor paging over a ranking's sections; subclasses say which rows of a section follow a rank."""
+
+    def rows_after(self, filter_name: str, index: int, after: int, count: int) -> tuple[np.ndarray, np.ndarray]:
+        """(positions, ranks) of up to count rows of section index ranked after after, in list order."""
+        raise NotImplementedError
+
+    def page(self, filter_name: str, cursor: Cursor | None, limit: int) -> tuple[np.ndarray, Cursor | None]:
+        """Up to limit positions following cursor in list order, plus the cursor for the next page (None at the end)."""
+        section, after = cursor or (0, -1)
+        picked: list[tuple[int, np.ndarray, np.ndarray]] = []
+        taken = 0
+        # Reading one row past the page tells whether another page exists.
+        for index in range(section, section_count(filter_name)):
+            if taken > limit:
+                break
+            positions, ranks = self.rows_after(filter_name, index, after if index == section else -1, limit + 1 - taken)
+            picked.append((index, positions, ranks))
+            taken += len(positions)
+
+        if taken <= limit:
+            return np.concatenate([chunk for _, chunk, _ in picked] or [np.arange(0)]), None
+        rows = np.concatenate([chunk for _, chunk, _ in picked])[:limit]
+        row_sections = np.concatenate([np.full(len(chunk), index) for index, chunk, _ in picked])
+        row_ranks = np.concatenate([ranks for _, _, ranks in picked])
+        return rows, (int(row_sections[limit - 1]), int(row_ranks[limit - 1]))
+
+
+class RosterRanking(PagedRanking):
+    """Priority scores and filter masks for a whole roster, held as NumPy columns."""
+
+    def __init__(self, patients: Sequence[dict[str, Any]], meta: Callable[[dict[str, Any]], dict[str, Any]]) -> None:
+        n = len(patients)
+        metas = [meta(patient) for patient in patients]
+
+        self.flags = {flag: np.fromiter((m[flag] for m in metas), dtype=bool, count=n) for flag in META_FLAGS}
+        self.overdue_days = np.fromiter((m["overdue_days"] for m in metas), dtype=np.int64, count=n)
+
+        names = np.array([patient["pseudonym"] for patient in patients], dtype=object)
+        self.names, name_rank = np.unique(names, return_inverse=True)
+        self.name_rank = name_rank.ravel()
+
+        self.scores = self._score()
+        # One int64 sort key reproduces sorted(key=(-priority, pseudonym)) including its stability.
+        self.order_key = ((self.scores.max(initial=0) - self.scores) * (n + 1) + self.name_rank) * (n + 1) + np.arange(n)
+        self.order = np.argsort(self.order_key)
+        self.rank = np.empty(n, dtype=np.int64)
+        self.rank[self.order] = np.arange(n)
+        self._sections: dict[str, list[tuple[np.ndarray, np.ndarray]]] = {}
+
+    def __len__(self) -> int:
+        return len(self.scores)
+
+    def sort_key(self, rank: int) -> tuple[int, str, int]:
+        """(-priority, pseudonym, position) of the row at rank, the tuple order_key encodes."""
+        pos = int(self.order[rank])
+        return -int(self.scores[pos]), self.names[self.name_rank[pos]], pos
+
+    def _score(self) -> np.ndarray:
+        scores = np.zeros(len(self.overdue_days), dtype=np.int64)
+        for flag, weight in PRIORITY_WEIGHTS.items():
+            scores += self.flags[flag] * weight
+        scores += self.flags["overdue"] * np.minimum(self.overdue_days, OVERDUE_DAYS_CAP)
+        return scores
+
+    def filter_mask(self, filter_name: str) -> np.ndarray:
+        flag = FILTER_FLAGS.get(filter_name)
+        if flag is None:
+            return np.ones(len(self), dtype=bool)
+        return self.flags[flag]
+
+    def sections(self, filter_name: str) -> list[tuple[np.ndarray, np.ndarray]]:
+        """(positions, ranks) in priority order: filter matches, then (for flag filters) everything else."""
+        sections = self._sections.get(filter_name)
+        if sections is None:
+            ranks = np.arange(len(self))
+            if filter_name not in FILTER_FLAGS:
+                sections = [(self.order, ranks)]
+            else:
+                in_order = self.filter_mask(filter_name)[self.order]
+                sections = [(self.order[in_order], ranks[in_order]), (self.order[~in_order], ranks[~in_order])]
+            self._sections[filter_name] = sections
+        return sections
+
+    def rows_after(self, filter_name: str, index: int, after: int, count: int) -> tuple[np.ndarray, np.ndarray]:
+        positions, ranks = self.sections(filter_name)[index]
+        start = int(np.searchsorted(ranks, after, side="right"))
+        return positions[start : start + count], ranks[start : start + count]
+
+
+class RankingOverlay(PagedRanking):
+    """A shared RosterRanking with one session's edited and added rows merged in at read time.
+
+    Only the overlay rows are held here. Each is placed in the shared order by binary search, and the rows it
+    replaces are skipped, so ranks and cursors are those of a RosterRanking rebuilt over the edited roster.
+    """
+
+    def __init__(self, base: RosterRanking, rows: Mapping[int, tuple[str, Mapping[str, Any]]]) -> None:
+        """rows maps roster positions to (pseudonym, meta); positions below len(base) replace shared rows."""
+        self.base = base
+        n = len(base)
+        self._stale = np.sort(base.rank[[pos for pos in rows if pos < n]])
+
+        keys = sorted((-priority_score(meta), name, pos) for pos, (name, meta) in rows.items())
+        self.positions = np.array([pos for _, _, pos in keys], dtype=np.int64)
+        metas = [rows[pos][1] for _, _, pos in keys]
+        self.flags = {flag: np.array([bool(meta[flag]) for meta in metas], dtype=bool) for flag in META_FLAGS}
+        # How many shared rows sort before each overlay row, stale ones included.
+        self._anchors = np.array([bisect.bisect_left(range(n), key, key=base.sort_key) for key in keys], dtype=np.int64)
+        self.ranks = self._anchors - np.searchsorted(self._stale, self._anchors) + np.arange(len(keys))
+
+    def merged_rank(self, base_ranks: np.ndarray) -> np.ndarray:
+        """Rank in the merged list of the shared rows at base_ranks; stale rows get a rank that keeps the order."""
+        before = np.searchsorted(self._anchors, base_ranks, side="right")
+        return base_ranks - np.searchsorted(self._stale, base_ranks) + before
+
+    def rows_after(self, filter_name: str, index: int, after: int, count: int) -> tuple[np.ndarray, np.ndarray]:
+        positions, base_ranks = self.base.sections(filter_name)[index]
+        # Merged ranks grow with base ranks, so the first shared row past after is found by bisection.
+        start = bisect.bisect_right(base_ranks, after, key=lambda rank: int(self.merged_rank(rank)))
+        window = slice(start, start + count + len(self._stale))
+        fresh = ~np.isin(base_ranks[window], self._stale)
+        positions = positions[window][fresh]
+        ranks = self.merged_rank(base_ranks[window][fresh])
+
+        flag = FILTER_FLAGS.get(filter_name)
+        in_section = np.ones(len(self.positions), dtype=bool) if flag is None else self.flags[flag] == (index == 0)
+        in_section &= self.ranks > after
+        positions = np.concatenate([positions, self.positions[in_section]])
+        ranks = np.concatenate([ranks, self.ranks[in_section]])
+        order = np.argsort(ranks)[:count]
+        return positions[order], ranks[order]
@@ -0,0 +1,407 @@
+﻿"""Compact struct-of-arrays patient records with read-only dict-like views.
+
+Report memory per household for plain dicts vs the compact roster:
+
+    python -m assets.records --households 100000
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+from array import array
+from collections.abc import Mapping, Sequence
+from types import MappingProxyType
+from typing import Any, Iterable, Iterator
+
+import numpy as np
+
+STR, INT, FLOAT, BOOL, VISIT = "str", "int", "float", "bool", "visit"
+
+# Field order is the key order the dict views report.
+SCHEMA: tuple[tuple[str, str], ...] = (
+    ("pseudonym", STR),
+    ("age_months", INT),
+    ("avatar", STR),
+    ("lat", FLOAT),
+    ("lon", FLOAT),
+    ("last_visit_date", STR),
+    ("last_visit_summary", STR),
+    ("last_visit_fields", VISIT),
+    ("current_visit_seed", VISIT),
+    ("follow_up_due", BOOL),
+    ("status", STR),
+    ("due_category", STR),
+    ("overdue_days", INT),
+    ("due_today", BOOL),
+    ("due_this_week", BOOL),
+    ("facility_referral_pending", BOOL),
+    ("protocol_followup_due", BOOL),
+    ("is_dummy", BOOL),
+)
+VISIT_SCHEMA: tuple[tuple[str, str], ...] = (
+    ("rr", INT),
+    ("danger_sign", BOOL),
+    ("unable_to_drink", BOOL),
+    ("vomiting_everything", BOOL),
+    ("chest_indrawing", BOOL),
+)
+
+VISIT_KINDS = dict(VISIT_SCHEMA)
+
+INT_MIN, INT_MAX = -(2**31), 2**31 - 1
+_MISSING = object()
+_ABSENT = object()
+
+
+def _fits(kind: str, value: Any) -> bool:
+    if kind == STR:
+        return value is None or isinstance(value, str)
+    if kind == BOOL:
+        return isinstance(value, bool)
+    if kind == INT:
+        return type(value) is int and INT_MIN <= value <= INT_MAX
+    return type(value) is float
+
+
+class _Column:
+    """One scalar column: a presence bit, plus a typed array slot (bools live in the bit mask)."""
+
+    __slots__ = ("key", "kind", "bit", "values", "table", "lookup")
+
+    def __init__(self, key: str, kind: str, bit: int) -> None:
+        self.key = key
+        self.kind = kind
+        self.bit = 1 << bit
+        self.values = {STR: array("I"), INT: array("i"), FLOAT: array("d"), BOOL: None}[kind]
+        # Interned string table: each distinct value is stored once.
+        self.table: list[str | None] = []
+        self.lookup: dict[str | None, int] = {}
+
+    def encode(self, value: Any) -> int:
+        if self.kind != STR:
+            return value
+        code = self.lookup.get(value)
+        if code is None:
+            code = self.lookup[value] = len(self.table)
+            self.table.append(value)
+        return code
+
+
+class CompactRoster(Sequence):
+    """Append-only patient roster stored column-wise; indexing returns PatientRecord views."""
+
+    def __init__(self, patients: Iterable[Mapping[str, Any]] = ()) -> None:
+        self.ids: list[str] = []
+        self.present = array("Q")
+        self.flags = array("Q")
+        # Values that do not fit the schema (unknown keys, odd types) are kept verbatim per record.
+        self.extras: dict[int, dict[str, Any]] = {}
+
+        bit = 0
+        self._columns: dict[str, _Column] = {}
+        self._visit_columns: dict[str, tuple[_Column, ...]] = {}
+        self._visit_bits: dict[str, int] = {}
+        # Every scalar column by name; nested visit fields are named like "last_visit_fields.rr".
+        self._named: dict[str, _Column] = {}
+        for key, kind in SCHEMA:
+            if kind == VISIT:
+                self._visit_bits[key] = 1 << bit
+                bit += 1
+                nested = []
+                for sub_key, sub_kind in VISIT_SCHEMA:
+                    nested.append(_Column(sub_key, sub_kind, bit))
+                    self._named[f"{key}.{sub_key}"] = nested[-1]
+                    bit += 1
+                self._visit_columns[key] = tuple(nested)
+            else:
+                self._columns[key] = self._named[key] = _Column(key, kind, bit)
+                bit += 1
+
+        for patient in patients:
+            self.append(patient)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __getitem__(self, pos: Any) -> Any:
+        """A new PatientRecord view per access.
+
+        Views of one row compare equal but are never the same object, so per-record caches key on id.
+        """
+        if isinstance(pos, slice):
+            return [PatientRecord(self, i) for i in range(*pos.indices(len(self)))]
+        if pos < 0:
+            pos += len(self)
+        if not 0 <= pos < len(self):
+            raise IndexError("roster index out of range")
+        return PatientRecord(self, pos)
+
+    def __iter__(self) -> Iterator["PatientRecord"]:
+        for pos in range(len(self.ids)):
+            yield PatientRecord(self, pos)
+
+    def _encode_into(
+        self, columns: Iterable[_Column], values: Mapping[str, Any], skip: Mapping[str, Any], present: int, flags: int
+    ) -> tuple[int, int]:
+        # Every typed array gets one slot per record, so column position always equals record position.
+        for column in columns:
+            value = values.get(column.key, _MISSING)
+            if value is _MISSING or column.key in skip:
+                if column.values is not None:
+                    column.values.append(0)
+                continue
+            present |= column.bit
+            if column.kind == BOOL:
+                if value:
+                    flags |= column.bit
+            else:
+                column.values.append(column.encode(value))
+        return present, flags
+
+    def append(self, patient: Mapping[str, Any]) -> None:
+        extra: dict[str, Any] = {}
+        for key, value in patient.items():
+            if key == "id":
+                continue
+            column = self._columns.get(key)
+            if column is not None:
+                if _fits(column.kind, value):
+                    continue
+            elif key in self._visit_columns:
+                if isinstance(value, Mapping) and all(
+                    _fits(VISIT_KINDS.get(sub_key, ""), sub_value) for sub_key, sub_value in value.items()
+                ):
+                    continue
+            extra[key] = value
+
+        present, flags = self._encode_into(self._columns.values(), patient, extra, 0, 0)
+        for key, columns in self._visit_columns.items():
+            visit = patient.get(key)
+            if visit is None or key in extra:
+                visit = {}
+            else:
+                present |= self._visit_bits[key]
+            present, flags = self._encode_into(columns, visit, {}, present, flags)
+
+        if extra:
+            self.extras[len(self.ids)] = extra
+        self.ids.append(patient["id"])
+        self.present.append(present)
+        self.flags.append(flags)
+
+    def extend_columns(
+        self,
+        ids: list[str],
+        columns: Mapping[str, Any],
+        present: Mapping[str, Any] | None = None,
+    ) -> None:
+        """Bulk-append rows from per-field numpy arrays, without building a dict per record.
+
+        Nested visit fields are named like "last_visit_fields.rr"; string fields take (codes, values)
+        pairs. Fields missing from columns are absent in every row, and present maps a field
+        (or a visit dict) to a bool mask when only some rows carry it.
+        """
+        n = len(ids)
+        present = present or {}
+        present_bits = np.zeros(n, dtype=np.uint64)
+        flag_bits = np.zeros(n, dtype=np.uint64)
+
+        for name, column in self._named.items():
+            if name not in columns:
+                if column.values is not None:
+                    column.values.extend(array(column.values.typecode, bytes(column.values.itemsize * n)))
+                continue
+            mask = np.broadcast_to(np.asarray(present.get(name, True), dtype=bool), (n,))
+            bit = np.uint64(column.bit)
+            present_bits |= np.where(mask, bit, np.uint64(0))
+            data = columns[name]
+            if column.kind == BOOL:
+                flag_bits |= np.where(mask & np.asarray(data, dtype=bool), bit, np.uint64(0))
+            elif column.kind == STR:
+                codes, values = data
+                remap = np.array([column.encode(value) for value in values], dtype=np.uint32)
+                column.values.frombytes(np.where(mask, remap[codes], 0).astype(np.uint32).tobytes())
+            else:
+                dtype = np.int32 if column.kind == INT else np.float64
+                column.values.frombytes(np.where(mask, data, 0).astype(dtype).tobytes())
+
+        for key, nested in self._visit_columns.items():
+            given = key in present or any(f"{key}.{column.key}" in columns for column in nested)
+            if given:
+                mask = np.broadcast_to(np.asarray(present.get(key, True), dtype=bool), (n,))
+                present_bits |= np.where(mask, np.uint64(self._visit_bits[key]), np.uint64(0))
+
+        self.ids.extend(ids)
+        self.present.frombytes(present_bits.tobytes())
+        self.flags.frombytes(flag_bits.tobytes())
+
+    def column(self, key: str) -> list[Any]:
+        """Decode one top-level field for every record; absent values come back as None."""
+        if key == "id":
+            return list(self.ids)
+        column = self._columns[key]
+        bit = column.bit
+        if column.kind == BOOL:
+            values = [bool(flags & bit) if present & bit else None for present, flags in zip(self.present, self.flags)]
+        elif column.kind == STR:
+            table = column.table
+            values = [table[code] if present & bit else None for present, code in zip(self.present, column.values)]
+        else:
+            values = [value if present & bit else None for present, value in zip(self.present, column.values)]
+        for pos, extra in self.extras.items():
+            if key in extra:
+                values[pos] = extra[key]
+        return values
+
+    def numeric_column(self, name: str) -> tuple[np.ndarray, np.ndarray]:
+        """(values, present) arrays for an int, float or bool field, read straight from the buffers.
+
+        Nested visit fields are named like "current_visit_seed.rr"; absent values are 0/False.
+        """
+        column = self._named[name]
+        present_bits = np.frombuffer(self.present, dtype=np.uint64)
+        bit = np.uint64(column.bit)
+        present = (present_bits & bit) != 0
+        if column.kind == BOOL:
+            values = (np.frombuffer(self.flags, dtype=np.uint64) & bit) != 0
+        elif column.kind in (INT, FLOAT):
+            values = np.frombuffer(column.values, dtype=np.int32 if column.kind == INT else np.float64).copy()
+        else:
+            raise TypeError(f"{name} is not a numeric field")
+
+        key, _, sub_key = name.partition(".")
+        for pos, extra in self.extras.items():
+            # Values kept verbatim count as absent unless they are plain numbers or bools.
+            if key not in extra:
+                continue
+            value = extra[key].get(sub_key) if sub_key and isinstance(extra[key], Mapping) else extra[key]
+            present[pos] = isinstance(value, (bool, int, float))
+            values[pos] = value if present[pos] else 0
+        return values, present
+
+    def value(self, pos: int, key: str, default: Any = _MISSING) -> Any:
+        if key == "id":
+            return self.ids[pos]
+        extra = self.extras.get(pos)
+        if extra is not None and key in extra:
+            return extra[key]
+
+        column = self._columns.get(key)
+        if column is not None:
+            if self.present[pos] & column.bit:
+                return self._decode(column, pos)
+        elif key in self._visit_bits and self.present[pos] & self._visit_bits[key]:
+            present = self.present[pos]
+            return MappingProxyType(
+                {c.key: self._decode(c, pos) for c in self._visit_columns[key] if present & c.bit}
+            )
+
+        if default is _MISSING:
+            raise KeyError(key)
+        return default
+
+    def _decode(self, column: _Column, pos: int) -> Any:
+        if column.kind == BOOL:
+            return bool(self.flags[pos] & column.bit)
+        if column.kind == STR:
+            return column.table[column.values[pos]]
+        return column.values[pos]
+
+    def keys_at(self, pos: int) -> Iterator[str]:
+        yield "id"
+        present = self.present[pos]
+        extra = self.extras.get(pos, {})
+        for key, _ in SCHEMA:
+            if key in extra:
+                yield key
+            elif key in self._columns:
+                if present & self._columns[key].bit:
+                    yield key
+            elif present & self._visit_bits[key]:
+                yield key
+        schema_keys = self._columns.keys() | self._visit_columns.keys()
+        yield from (key for key in extra if key not in schema_keys)
+
+    def nbytes(self) -> int:
+        """Approximate heap footprint: column buffers, string tables, ids and extras."""
+        total = sys.getsizeof(self.ids) + sum(sys.getsizeof(patient_id) for patient_id in self.ids)
+        total += sys.getsizeof(self.present) + sys.getsizeof(self.flags)
+        for column in self._named.values():
+            if column.values is not None:
+                total += sys.getsizeof(column.values)
+            total += sys.getsizeof(column.table) + sum(sys.getsizeof(value) for value in column.table)
+        return total + deep_sizeof(self.extras)
+
+
+class PatientRecord(Mapping):
+    """Read-only dict-like view of one CompactRoster row; decodes fields on access.
+
+    Views are built per access and cost two slots, so they are not cached; compare them with ==, not is.
+    """
+
+    __slots__ = ("_roster", "_pos")
+
+    def __init__(self, roster: CompactRoster, pos: int) -> None:
+        self._roster = roster
+        self._pos = pos
+
+    def __getitem__(self, key: str) -> Any:
+        return self._roster.value(self._pos, key)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return self._roster.value(self._pos, key, default)
+
+    def __contains__(self, key: object) -> bool:
+        return self._roster.value(self._pos, key, _ABSENT) is not _ABSENT
+
+    def __iter__(self) -> Iterator[str]:
+        return self._roster.keys_at(self._pos)
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, PatientRecord):
+            return (self._roster is other._roster and self._pos == other._pos) or dict(self) == dict(other)
+        return Mapping.__eq__(self, other)
+
+    __hash__ = None  # type: ignore[assignment]
+
+    def __repr__(self) -> str:
+        return f"PatientRecord({dict(self)!r})"
+
+
+def deep_sizeof(obj: Any, seen: set[int] | None = None) -> int:
+    """sys.getsizeof over an object graph of dicts, lists, tuples and scalars, counting shared objects once."""
+    seen = set() if seen is None else seen
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, (dict, MappingProxyType)):
+        size += sum(deep_sizeof(k, seen) + deep_sizeof(v, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(deep_sizeof(item, seen) for item in obj)
+    return size
+
+
+def main() -> None:
+    from assets.generator import generate_dummy_patients
+    from assets.patients import PATIENTS
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--households", type=int, default=100_000)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    patients = PATIENTS + generate_dummy_patients(PATIENTS, n=args.households, seed=args.seed)
+    dict_bytes = deep_sizeof(patients)
+    compact_bytes = CompactRoster(patients).nbytes()
+    print(f"{len(patients)} households")
+    print(f"dict records:    {dict_bytes / len(patients):8.1f} bytes/household")
+    print(f"compact records: {compact_bytes / len(patients):8.1f} bytes/household")
+
+
+if __name__ == "__main__":
+    main()
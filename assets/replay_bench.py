@@ -0,0 +1,178 @@
+"""Scenario replay benchmark: per-step latency and allocations of the conversation engine, without Streamlit.
+
+Replays SCENARIO_STEPS for many roster households and reports each step's latency percentiles
+plus the memory it allocates, so regressions in the conversation engine show up as numbers:
+
+    python -m assets.replay_bench --patients 200 --replays 20 --json replay.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import math
+import platform
+import sys
+import time
+import tracemalloc
+from typing import Any, Callable, Mapping, Sequence
+
+from assets.conversation import HeadlessState, apply_step, compute_deltas, next_step, seek
+from assets.metrics import RollingWindow
+from assets.scenario import SCENARIO_STEPS
+
+# Phases timed around every scenario step; "seek" is the per-replay reset to the start.
+PHASES = ("apply_step", "compute_deltas")
+
+
+def pick_patients(records: Sequence[Mapping[str, Any]], count: int) -> list[Mapping[str, Any]]:
+    """count households spread evenly over the roster, so new and follow-up visits are both covered."""
+    count = max(1, min(count, len(records)))
+    stride = len(records) / count
+    return [records[int(i * stride)] for i in range(count)]
+
+
+def replay(patient: Mapping[str, Any], on_phase: Callable[[str, int, Callable[[], Any]], Any]) -> int:
+    """Run the scenario once for a patient; on_phase(phase, step_id, fn) runs and measures each phase."""
+    state = HeadlessState()
+    on_phase("seek", -1, lambda: seek(state, -1, patient))
+    last_fields = patient.get("last_visit_fields") or {}
+    steps = 0
+    while True:
+        # An infinite clock means the breathing timer never holds the replay back.
+        status, step = next_step(state, now=math.inf)
+        if step is None:
+            return steps
+        on_phase("apply_step", step["id"], lambda: apply_step(state, step, step.get("text", ""), now=0.0))
+        on_phase("compute_deltas", step["id"], lambda: compute_deltas(last_fields, state["patient_state"]))
+        steps += 1
+
+
+def measure_latency(patients: Sequence[Mapping[str, Any]], replays: int) -> dict[tuple[str, int], RollingWindow]:
+    samples: dict[tuple[str, int], RollingWindow] = {}
+    size = len(patients) * replays
+
+    def on_phase(phase: str, step_id: int, fn: Callable[[], Any]) -> None:
+        started = time.perf_counter_ns()
+        fn()
+        elapsed = time.perf_counter_ns() - started
+        window = samples.get((phase, step_id))
+        if window is None:
+            window = samples[(phase, step_id)] = RollingWindow(size)
+        window.add(elapsed / 1000)
+
+    for _ in range(replays):
+        for patient in patients:
+            replay(patient, on_phase)
+    return samples
+
+
+def measure_allocations(patients: Sequence[Mapping[str, Any]]) -> dict[tuple[str, int], dict[str, float]]:
+    """Mean bytes still held, peak bytes and net allocated blocks per phase, one traced replay per patient."""
+    totals: dict[tuple[str, int], dict[str, float]] = {}
+
+    def on_phase(phase: str, step_id: int, fn: Callable[[], Any]) -> None:
+        tracemalloc.reset_peak()
+        before, _ = tracemalloc.get_traced_memory()
+        blocks = sys.getallocatedblocks()
+        fn()
+        blocks = sys.getallocatedblocks() - blocks
+        after, peak = tracemalloc.get_traced_memory()
+        row = totals.setdefault((phase, step_id), {"net_bytes": 0.0, "peak_bytes": 0.0, "blocks": 0.0})
+        row["net_bytes"] += (after - before) / len(patients)
+        row["peak_bytes"] += (peak - before) / len(patients)
+        row["blocks"] += blocks / len(patients)
+
+    tracemalloc.start()
+    try:
+        for patient in patients:
+            replay(patient, on_phase)
+    finally:
+        tracemalloc.stop()
+    return totals
+
+
+def run_benchmark(records: Sequence[Mapping[str, Any]], patients: int, replays: int) -> dict[str, Any]:
+    chosen = pick_patients(records, patients)
+    # One untimed pass warms the snapshots, guideline tables and interned strings.
+    measure_latency(chosen[:1], 1)
+
+    started = time.perf_counter()
+    latency = measure_latency(chosen, replays)
+    elapsed = time.perf_counter() - started
+    allocations = measure_allocations(chosen)
+
+    traces = {step["id"]: (step.get("trace", ""), step["speaker"]) for step in SCENARIO_STEPS}
+    rows = []
+    for (phase, step_id), window in latency.items():
+        trace, speaker = traces.get(step_id, ("", ""))
+        rows.append(
+            {
+                "phase": phase,
+                "step": step_id,
+                "trace": trace,
+                "speaker": speaker,
+                "samples": len(window),
+                "p50_us": window.percentile(50),
+                "p95_us": window.percentile(95),
+                "max_us": window.percentile(100),
+                **allocations.get((phase, step_id), {}),
+            }
+        )
+    rows.sort(key=lambda row: (row["step"], ("seek", *PHASES).index(row["phase"])))
+
+    return {
+        "config": {
+            "households": len(records),
+            "patients": len(chosen),
+            "replays": replays,
+            "steps": len(SCENARIO_STEPS),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+        },
+        "totals": {
+            "seconds": elapsed,
+            "replays_per_sec": len(chosen) * replays / elapsed,
+            "steps_per_sec": len(chosen) * replays * len(SCENARIO_STEPS) / elapsed,
+        },
+        "steps": rows,
+    }
+
+
+def print_report(report: dict[str, Any]) -> None:
+    config, totals = report["config"], report["totals"]
+    print(
+        f"{config['patients']} patients x {config['replays']} replays of {config['steps']} steps "
+        f"({config['households']} households): {totals['seconds']:.2f}s, "
+        f"{totals['replays_per_sec']:.0f} replays/s, {totals['steps_per_sec']:.0f} steps/s"
+    )
+    print(f"{'step':>4}  {'phase':<15} {'trace':<16} {'p50 us':>8} {'p95 us':>8} {'max us':>9} {'net B':>8} {'peak B':>8} {'blocks':>7}")
+    for row in report["steps"]:
+        print(
+            f"{row['step']:>4}  {row['phase']:<15} {row['trace']:<16} {row['p50_us']:>8.1f} {row['p95_us']:>8.1f} "
+            f"{row['max_us']:>9.1f} {row['net_bytes']:>8.0f} {row['peak_bytes']:>8.0f} {row['blocks']:>7.1f}"
+        )
+
+
+def main() -> None:
+    from assets.generator import build_roster_records
+    from assets.patients import PATIENTS
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--households", type=int, default=1_000, help="Generated households in the roster.")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--patients", type=int, default=200, help="Households the scenario is replayed for.")
+    parser.add_argument("--replays", type=int, default=20, help="Timed replays per patient.")
+    parser.add_argument("--json", help="Also write the report as JSON to this path.")
+    args = parser.parse_args()
+
+    records = build_roster_records(PATIENTS, n=args.households, seed=args.seed)
+    report = run_benchmark(records, args.patients, args.replays)
+    print_report(report)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as handle:
+            json.dump(report, handle, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,209 @@
+﻿"""Indexed roster store for patient lookups and Home filters.
+
+RosterSnapshot is immutable and shared by every session in the process; RosterStore is a
+per-session copy-on-write overlay that holds only the records a session edited or added.
+"""
+
+from __future__ import annotations
+
+import threading
+from collections.abc import Sequence
+from types import MappingProxyType
+from typing import Any, Callable, Iterable, Iterator, Mapping
+
+from assets.records import CompactRoster
+
+def freeze_record(patient: Mapping[str, Any]) -> Mapping[str, Any]:
+    """Read-only view of a record, including its nested visit-field dicts."""
+    return MappingProxyType(
+        {key: MappingProxyType(dict(value)) if isinstance(value, Mapping) else value for key, value in patient.items()}
+    )
+
+
+class RosterSnapshot:
+    """Immutable compact patient records with an id index."""
+
+    def __init__(self, patients: CompactRoster | Iterable[Mapping[str, Any]] = ()) -> None:
+        self.records = patients if isinstance(patients, CompactRoster) else CompactRoster(patients)
+        ids = self.records.ids
+        self._position: dict[str, int] = dict(zip(ids, range(len(ids))))
+        if len(self._position) != len(ids):
+            seen: set[str] = set()
+            duplicate = next(patient_id for patient_id in ids if patient_id in seen or seen.add(patient_id))
+            raise ValueError(f"Duplicate patient id: {duplicate}")
+
+        self._meta: dict[str, Any] = {}
+        self._derived: dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def __contains__(self, patient_id: object) -> bool:
+        return patient_id in self._position
+
+    def get(self, patient_id: str) -> Mapping[str, Any] | None:
+        """A fresh view of the record on every call; see CompactRoster.__getitem__."""
+        pos = self._position.get(patient_id)
+        return None if pos is None else self.records[pos]
+
+    def position(self, patient_id: str) -> int:
+        return self._position[patient_id]
+
+    def meta(self, patient_id: str, compute: Callable[[Mapping[str, Any]], Any]) -> Any:
+        # Records never change, so derived metadata is computed once per process.
+        value = self._meta.get(patient_id)
+        if value is None:
+            value = self._meta[patient_id] = compute(self.get(patient_id))
+        return value
+
+    def derived(self, name: str, build: Callable[[Sequence[Mapping[str, Any]]], Any]) -> Any:
+        """Build a whole-roster structure (ranking, spatial index) once and share it across sessions."""
+        with self._lock:
+            if name not in self._derived:
+                self._derived[name] = build(self.records)
+            return self._derived[name]
+
+
+class RosterRecords(Sequence):
+    """Positional view of a RosterStore: snapshot records with overlay replacements, then added records."""
+
+    def __init__(self, store: "RosterStore") -> None:
+        self._store = store
+
+    def __len__(self) -> int:
+        return len(self._store)
+
+    def __getitem__(self, pos: Any) -> Any:
+        if isinstance(pos, slice):
+            return [self[i] for i in range(*pos.indices(len(self)))]
+        store = self._store
+        base = store.base.records
+        if pos < 0:
+            pos += len(self)
+        if pos >= len(base):
+            return store._added[pos - len(base)]
+        return store._changed.get(pos, base[pos])
+
+    def __iter__(self) -> Iterator[Mapping[str, Any]]:
+        changed = self._store._changed
+        if changed:
+            for pos, patient in enumerate(self._store.base.records):
+                yield changed.get(pos, patient)
+        else:
+            yield from self._store.base.records
+        yield from self._store._added
+
+
+class RosterStore:
+    """Per-session roster: a shared RosterSnapshot plus a copy-on-write overlay of edits and new records."""
+
+    def __init__(self, base: RosterSnapshot | Iterable[Mapping[str, Any]] = ()) -> None:
+        self.base = base if isinstance(base, RosterSnapshot) else RosterSnapshot(base)
+        self.revision = 0
+        self._changed: dict[int, Mapping[str, Any]] = {}
+        self._added: list[Mapping[str, Any]] = []
+        self._added_position: dict[str, int] = {}
+        self._versions: dict[str, int] = {}
+        self._meta: dict[str, tuple[int, Any]] = {}
+        self._watchers: list[Callable[[Mapping[str, Any] | None, Mapping[str, Any]], None]] = []
+        self._records = RosterRecords(self)
+
+    def __len__(self) -> int:
+        return len(self.base) + len(self._added)
+
+    def __contains__(self, patient_id: object) -> bool:
+        return patient_id in self.base or patient_id in self._added_position
+
+    def __iter__(self) -> Iterator[Mapping[str, Any]]:
+        return iter(self._records)
+
+    @property
+    def pristine(self) -> bool:
+        """True while the session has no edits, so snapshot-level caches apply as-is."""
+        return not self._changed and not self._added
+
+    @property
+    def records(self) -> Sequence[Mapping[str, Any]]:
+        return self.base.records if self.pristine else self._records
+
+    @property
+    def changed(self) -> Mapping[int, Mapping[str, Any]]:
+        """Edited snapshot records by position; edits to added records live in added."""
+        return MappingProxyType(self._changed)
+
+    @property
+    def added(self) -> Sequence[Mapping[str, Any]]:
+        return tuple(self._added)
+
+    def watch(self, callback: Callable[[Mapping[str, Any] | None, Mapping[str, Any]], None]) -> None:
+        """Call callback(old, new) after every add (old is None) or update, e.g. to keep aggregates current."""
+        self._watchers.append(callback)
+
+    def add(self, patient: Mapping[str, Any]) -> None:
+        patient_id = patient["id"]
+        if patient_id in self:
+            raise ValueError(f"Duplicate patient id: {patient_id}")
+
+        self._added_position[patient_id] = len(self.base) + len(self._added)
+        self._added.append(freeze_record(patient))
+        self._versions[patient_id] = 0
+        self.revision += 1
+        for callback in self._watchers:
+            callback(None, self._added[-1])
+
+    def update(self, patient_id: str, **fields: Any) -> Mapping[str, Any]:
+        """Replace a record with updated fields in the overlay and bump its version."""
+        pos = self.position(patient_id)
+        old = self.get(patient_id)
+        patient = freeze_record({**old, **fields})
+
+        if patient_id in self._added_position:
+            self._added[pos - len(self.base)] = patient
+        else:
+            self._changed[pos] = patient
+        self._versions[patient_id] = self.version(patient_id) + 1
+        self.revision += 1
+        self._meta.pop(patient_id, None)
+        for callback in self._watchers:
+            callback(old, patient)
+        return patient
+
+    def get(self, patient_id: str) -> Mapping[str, Any] | None:
+        pos = self.base._position.get(patient_id)
+        if pos is not None:
+            return self._changed.get(pos, self.base.records[pos])
+        pos = self._added_position.get(patient_id)
+        return None if pos is None else self._added[pos - len(self.base)]
+
+    def position(self, patient_id: str) -> int:
+        pos = self.base._position.get(patient_id)
+        return self._added_position[patient_id] if pos is None else pos
+
+    def version(self, patient_id: str) -> int:
+        return self._versions.get(patient_id, 0)
+
+    def is_current(self, patient: Mapping[str, Any]) -> bool:
+        """True if patient is what get() holds for its id, so meta() may stand in for computing on it.
+
+        Unedited snapshot records never change, so any copy counts (a fresh view, a database row); an edited
+        or added record counts only as the overlay's own object.
+        """
+        patient_id = patient.get("id")
+        if patient_id not in self._versions:
+            return patient_id in self.base
+        return self.get(patient_id) is patient
+
+    def meta(self, patient_id: str, compute: Callable[[Mapping[str, Any]], Any]) -> Any:
+        """Return derived metadata cached by id, recomputing only when the record version changed."""
+        version = self._versions.get(patient_id)
+        if version is None:
+            return self.base.meta(patient_id, compute)
+
+        cached = self._meta.get(patient_id)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+
+        value = compute(self.get(patient_id))
+        self._meta[patient_id] = (version, value)
+        return value
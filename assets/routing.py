@@ -0,0 +1,197 @@
+﻿"""Daily visit route planner: orders households to balance urgency against walking distance.
+
+The plan is an open walk from a start point through every stop. Its cost is the walking distance
+plus urgency_weight times the priority-weighted mean distance walked before reaching each stop, so
+0 gives the shortest walk and larger weights pull high-priority households earlier:
+
+    python -m assets.routing --households 20000 --stops 1000 --json route.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import math
+import platform
+import time
+from typing import Any, Sequence
+
+import numpy as np
+
+from assets.spatial import KM_PER_DEG_LAT
+
+DEFAULT_URGENCY_WEIGHT = 1.0
+# 2-opt stops improving once it has used this much time; the route so far is still valid.
+DEFAULT_TIME_BUDGET_S = 0.8
+# Moves that gain less than this many km are not worth another pass.
+MIN_GAIN_KM = 1e-9
+
+
+def project_km(lats: np.ndarray, lons: np.ndarray, origin_lat: float) -> np.ndarray:
+    """Equirectangular (x, y) in km; accurate to well under 1% across a catchment area."""
+    return np.column_stack((lons * KM_PER_DEG_LAT * math.cos(math.radians(origin_lat)), lats * KM_PER_DEG_LAT))
+
+
+def walk_km(lats: Sequence[float], lons: Sequence[float], start: tuple[float, float]) -> float:
+    """Walking km from start through the stops in the given order."""
+    points = project_km(np.array([start[0], *lats]), np.array([start[1], *lons]), start[0])
+    return float(np.hypot(*(points[1:] - points[:-1]).T).sum())
+
+
+def route_cost(points: np.ndarray, weights: np.ndarray, path: np.ndarray) -> tuple[float, float]:
+    """(walking km, priority-weighted mean km walked before each stop) of path, which starts at the start point."""
+    legs = np.hypot(*(points[path[1:]] - points[path[:-1]]).T)
+    arrival = np.concatenate(([0.0], np.cumsum(legs)))
+    return float(legs.sum()), float(weights[path] @ arrival)
+
+
+def nearest_neighbour(points: np.ndarray, relative_priority: np.ndarray, urgency_weight: float) -> np.ndarray:
+    """Greedy path from point 0: the next stop is the closest one, with distances shrunk for higher priority."""
+    n = len(points)
+    pull = 1 + urgency_weight * relative_priority
+    remaining = np.ones(n, dtype=bool)
+    remaining[0] = False
+    path = np.zeros(n, dtype=np.int64)
+    for step in range(1, n):
+        score = np.hypot(*(points - points[path[step - 1]]).T) / pull
+        score[~remaining] = np.inf
+        path[step] = nxt = int(np.argmin(score))
+        remaining[nxt] = False
+    return path
+
+
+def two_opt(
+    points: np.ndarray, weights: np.ndarray, path: np.ndarray, urgency_weight: float, deadline: float
+) -> tuple[np.ndarray, int]:
+    """Best-improvement 2-opt on the full cost; every k for a given i is scored in one vectorized step.
+
+    Reversing path[i..k] changes two legs and reverses arrival order inside the segment, so with
+    prefix sums of weight and weight * arrival each candidate's gain is O(1).
+    """
+    path = path.copy()
+    n = len(path)
+    moves = 0
+    stale = True
+    improved = True
+    while improved and time.perf_counter() < deadline:
+        improved = False
+        for i in range(1, n - 1):
+            if stale:
+                xy = points[path]
+                legs = np.hypot(*(xy[1:] - xy[:-1]).T)
+                arrival = np.concatenate(([0.0], np.cumsum(legs)))
+                w = weights[path]
+                cw = np.cumsum(w)
+                cwa = np.cumsum(w * arrival)
+                stale = False
+
+            k = np.arange(i + 1, n)
+            new_in = np.hypot(*(xy[i + 1 :] - xy[i - 1]).T)
+            # The leg after the segment only exists when the segment does not end the path.
+            new_out = np.append(np.hypot(*(xy[i + 2 :] - xy[i]).T), 0.0)
+            old_out = np.append(legs[i + 1 :], 0.0)
+            dist_delta = new_in - legs[i - 1] + new_out - old_out
+
+            segment_w = cw[k] - cw[i - 1]
+            segment_wa = cwa[k] - cwa[i - 1]
+            after_w = cw[-1] - cw[k]
+            wait_delta = segment_w * (arrival[i - 1] + new_in + arrival[k]) - 2 * segment_wa + after_w * dist_delta
+
+            gain = dist_delta + urgency_weight * wait_delta
+            best = int(np.argmin(gain))
+            if gain[best] < -MIN_GAIN_KM:
+                end = i + 1 + best
+                path[i : end + 1] = path[i : end + 1][::-1]
+                moves += 1
+                improved = stale = True
+                if time.perf_counter() >= deadline:
+                    break
+    return path, moves
+
+
+def plan_route(
+    lats: Sequence[float],
+    lons: Sequence[float],
+    priorities: Sequence[float],
+    start: tuple[float, float],
+    urgency_weight: float = DEFAULT_URGENCY_WEIGHT,
+    time_budget_s: float = DEFAULT_TIME_BUDGET_S,
+) -> dict[str, Any]:
+    """Visit order over the stops (indices into lats/lons), plus its walking km and how the plan was reached."""
+    started = time.perf_counter()
+    n = len(lats)
+    if n == 0:
+        return {"order": [], "km": 0.0, "weighted_arrival_km": 0.0, "greedy_km": 0.0, "moves": 0, "seconds": 0.0}
+
+    # Point 0 is the start; stop s is point s + 1.
+    points = project_km(np.array([start[0], *lats]), np.array([start[1], *lons]), start[0])
+    priority = np.maximum(np.asarray(priorities, dtype=np.float64), 0.0)
+    total = priority.sum()
+    weights = np.concatenate(([0.0], priority / total if total else priority))
+    relative = weights * n
+
+    path = nearest_neighbour(points, relative, urgency_weight)
+    greedy_km, _ = route_cost(points, weights, path)
+    path, moves = two_opt(points, weights, path, urgency_weight, started + time_budget_s)
+    km, weighted_arrival = route_cost(points, weights, path)
+    return {
+        "order": (path[1:] - 1).tolist(),
+        "km": km,
+        "weighted_arrival_km": weighted_arrival,
+        "greedy_km": greedy_km,
+        "moves": moves,
+        "seconds": time.perf_counter() - started,
+    }
+
+
+def main() -> None:
+    from assets.generator import build_roster_records
+    from assets.patients import PATIENTS
+    from assets.ranking import compute_patient_meta, priority_score
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--households", type=int, default=5_000, help="Generated households in the roster.")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--stops", type=int, default=1_000, help="Highest-priority households to route through.")
+    parser.add_argument("--urgency-weight", type=float, default=DEFAULT_URGENCY_WEIGHT)
+    parser.add_argument("--time-budget", type=float, default=DEFAULT_TIME_BUDGET_S, help="Seconds allowed for 2-opt.")
+    parser.add_argument("--json", help="Also write the report as JSON to this path.")
+    args = parser.parse_args()
+
+    records = build_roster_records(PATIENTS, n=args.households, seed=args.seed)
+    scored = sorted(((priority_score(compute_patient_meta(r)), r) for r in records), key=lambda item: -item[0])
+    chosen = scored[: args.stops]
+    lats = [r["lat"] for _, r in chosen]
+    lons = [r["lon"] for _, r in chosen]
+    priorities = [score for score, _ in chosen]
+    start = (float(np.mean(lats)), float(np.mean(lons)))
+
+    plan = plan_route(lats, lons, priorities, start, args.urgency_weight, args.time_budget)
+    # The Home list's priority order, walked as is, is the baseline the plan should beat.
+    listed_km = walk_km(lats, lons, start)
+
+    print(
+        f"{len(chosen)} stops from {len(records)} households: {plan['km']:.1f} km planned "
+        f"(greedy {plan['greedy_km']:.1f} km, priority order {listed_km:.1f} km), "
+        f"priority-weighted arrival {plan['weighted_arrival_km']:.1f} km, "
+        f"{plan['moves']} 2-opt moves in {plan['seconds'] * 1000:.0f} ms"
+    )
+    if args.json:
+        report = {
+            "config": {
+                "households": len(records),
+                "stops": len(chosen),
+                "urgency_weight": args.urgency_weight,
+                "time_budget_s": args.time_budget,
+                "python": platform.python_version(),
+                "machine": platform.machine(),
+            },
+            "plan": plan,
+            "priority_order_km": listed_km,
+        }
+        with open(args.json, "w", encoding="utf-8") as handle:
+            json.dump(report, handle, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -109,11 +109,6 @@ SCENARIO_STEPS = [
         "speaker": "COPILOT",
         "trace": "Triage",
         "text": "Structured summary:\n- danger sign: unable to drink / vomiting\n- RR 52\n- chest indrawing: yes",
-        "triage_update": {
-            "classification": "URGENT REFERRAL",
-            "color": "red",
-            "reasons": ["Danger sign present", "Respiratory distress"],
-        },
     },
     {
         "id": 14,
@@ -165,12 +160,10 @@ SCENARIO_STEPS = [
         "id": 17,
         "speaker": "SYSTEM",
         "trace": "Follow-up",
-        "text": "On-device: simulated • TTFT: 0.9s (mock) • 12 tok/s (mock) • No data leaves device (simulated)\nDemo complete ✅",
+        "text": "On-device: simulated • Edge metrics measured on this device (see Handoff) • No data leaves device (simulated)\nDemo complete ✅",
         "ui_event": "show_metrics",
         "metrics": [
             "On-device: simulated",
-            "TTFT: 0.9s (mock)",
-            "12 tok/s (mock)",
             "No data leaves device (simulated)",
         ],
     },
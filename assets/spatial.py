@@ -0,0 +1,130 @@
+﻿"""Uniform lat/lon grid index for map clicks and radius queries."""
+
+from __future__ import annotations
+
+import math
+from typing import Any, Sequence
+
+# Map clicks farther than this (in degrees) from every household select nothing.
+CLICK_THRESHOLD_DEG = 0.012
+# Cells are several times smaller than the click threshold so a click usually stops after one ring.
+DEFAULT_CELL_DEG = CLICK_THRESHOLD_DEG / 6
+EARTH_RADIUS_KM = 6371.0
+KM_PER_DEG_LAT = 111.32
+# Markers closer than this many screen pixels at the current zoom are merged into one cluster.
+CLUSTER_RADIUS_PX = 48
+TILE_SIZE_PX = 256
+
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    phi1 = math.radians(lat1)
+    phi2 = math.radians(lat2)
+    dphi = phi2 - phi1
+    dlam = math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlam / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def cluster_cell_deg(zoom: float) -> float:
+    return CLUSTER_RADIUS_PX * 360 / (TILE_SIZE_PX * 2**zoom)
+
+
+class GridIndex:
+    """Buckets households into square lat/lon cells so lookups only visit nearby cells."""
+
+    def __init__(self, patients: Sequence[dict[str, Any]], cell_deg: float = DEFAULT_CELL_DEG) -> None:
+        self.cell_deg = cell_deg
+        self.ids = [patient["id"] for patient in patients]
+        self.lats = [patient["lat"] for patient in patients]
+        self.lons = [patient["lon"] for patient in patients]
+        self.cells: dict[tuple[int, int], list[int]] = {}
+
+        for pos, (lat, lon) in enumerate(zip(self.lats, self.lons)):
+            self.cells.setdefault(self._cell(lat, lon), []).append(pos)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def _cell(self, lat: float, lon: float) -> tuple[int, int]:
+        return math.floor(lat / self.cell_deg), math.floor(lon / self.cell_deg)
+
+    def _candidates(self, lat: float, lon: float, lat_span: float, lon_span: float) -> list[int]:
+        row_lo, col_lo = self._cell(lat - lat_span, lon - lon_span)
+        row_hi, col_hi = self._cell(lat + lat_span, lon + lon_span)
+        found: list[int] = []
+        # A zoomed-out box spans far more cells than hold anyone, so walk the occupied cells instead.
+        if (row_hi - row_lo + 1) * (col_hi - col_lo + 1) > len(self.cells):
+            for (row, col), positions in self.cells.items():
+                if row_lo <= row <= row_hi and col_lo <= col <= col_hi:
+                    found.extend(positions)
+            return found
+        for row in range(row_lo, row_hi + 1):
+            for col in range(col_lo, col_hi + 1):
+                found.extend(self.cells.get((row, col), ()))
+        return found
+
+    def _ring(self, row: int, col: int, ring: int) -> list[int]:
+        if ring == 0:
+            return self.cells.get((row, col), [])
+        found: list[int] = []
+        for dr in range(-ring, ring + 1):
+            step = 1 if abs(dr) == ring else 2 * ring
+            for dc in range(-ring, ring + 1, step):
+                found.extend(self.cells.get((row + dr, col + dc), ()))
+        return found
+
+    def nearest(self, lat: float, lon: float, max_dist: float = CLICK_THRESHOLD_DEG) -> str | None:
+        """Closest household id strictly within max_dist degrees, ties going to the earlier roster entry."""
+        row, col = self._cell(lat, lon)
+        best = (max_dist, len(self.ids))
+
+        for ring in range(math.ceil(max_dist / self.cell_deg) + 2):
+            # Every cell in this ring is at least (ring - 1) cells away from the query point.
+            if (ring - 1) * self.cell_deg > best[0]:
+                break
+            for pos in self._ring(row, col, ring):
+                candidate = (math.hypot(self.lats[pos] - lat, self.lons[pos] - lon), pos)
+                if candidate < best:
+                    best = candidate
+
+        if best[0] < max_dist:
+            return self.ids[best[1]]
+        return None
+
+    def in_bounds(self, south: float, west: float, north: float, east: float) -> list[int]:
+        """Roster positions inside a lat/lon box, in roster order."""
+        lat_span = (north - south) / 2
+        lon_span = (east - west) / 2
+        candidates = self._candidates(south + lat_span, west + lon_span, lat_span, lon_span)
+        return sorted(
+            pos
+            for pos in candidates
+            if south <= self.lats[pos] <= north and west <= self.lons[pos] <= east
+        )
+
+    def clusters(self, positions: Sequence[int], zoom: float) -> list[list[int]]:
+        """Group positions that fall in the same zoom-dependent cell."""
+        cell = cluster_cell_deg(zoom)
+        groups: dict[tuple[int, int], list[int]] = {}
+        for pos in positions:
+            key = (math.floor(self.lats[pos] / cell), math.floor(self.lons[pos] / cell))
+            groups.setdefault(key, []).append(pos)
+        return list(groups.values())
+
+    def centroid(self, positions: Sequence[int]) -> tuple[float, float]:
+        lat = sum(self.lats[pos] for pos in positions) / len(positions)
+        lon = sum(self.lons[pos] for pos in positions) / len(positions)
+        return lat, lon
+
+    def within_km(self, lat: float, lon: float, radius_km: float) -> list[tuple[str, float]]:
+        """Household ids within radius_km of a point with their distances, nearest first."""
+        lat_span = radius_km / KM_PER_DEG_LAT
+        lon_span = radius_km / (KM_PER_DEG_LAT * max(math.cos(math.radians(lat)), 1e-6))
+
+        hits = []
+        for pos in self._candidates(lat, lon, lat_span, lon_span):
+            dist = haversine_km(lat, lon, self.lats[pos], self.lons[pos])
+            if dist <= radius_km:
+                hits.append((dist, pos))
+        hits.sort()
+        return [(self.ids[pos], dist) for dist, pos in hits]
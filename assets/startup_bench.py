@@ -0,0 +1,134 @@
+"""Startup benchmark: cold-start import cost and first-run time per tab, each in a fresh interpreter.
+
+Every sample starts a new Python process, so module caches are cold the way they are on a
+freshly launched device:
+
+    python -m assets.startup_bench --runs 5 --json startup.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import platform
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+from typing import Any
+
+ROOT = Path(__file__).parent.parent
+TABS = ("Home", "Triage", "Handoff")
+MAP_MODULES = ("folium", "streamlit_folium")
+
+# Import cost: streamlit itself, then the rest of app.py's module-level imports, then the map stack.
+IMPORT_PROBE = """
+import importlib, json, sys, time
+sys.path.insert(0, {root!r})
+started = time.perf_counter()
+import streamlit
+streamlit_at = time.perf_counter()
+import app
+app_at = time.perf_counter()
+lazy = [name for name in {map_modules!r} if name not in sys.modules]
+for name in {map_modules!r}:
+    importlib.import_module(name)
+map_at = time.perf_counter()
+print(json.dumps({{
+    "streamlit_s": streamlit_at - started,
+    "app_module_s": app_at - streamlit_at,
+    "map_stack_s": map_at - app_at,
+    "map_loaded_lazily": len(lazy) == len({map_modules!r}),
+}}))
+"""
+
+# First script run on one tab in a fresh process, then a warm rerun of the same tab.
+TAB_PROBE = """
+import json, sys, time
+started = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+at = AppTest.from_file({app!r}, default_timeout={timeout!r})
+at.session_state["active_tab"] = {tab!r}
+ready = time.perf_counter()
+at.run()
+first = time.perf_counter()
+at.run()
+rerun = time.perf_counter()
+print(json.dumps({{
+    "harness_s": ready - started,
+    "first_run_s": first - ready,
+    "rerun_s": rerun - first,
+    "map_imported": all(name in sys.modules for name in {map_modules!r}),
+    "exceptions": [exception.value for exception in at.exception],
+}}))
+"""
+
+
+def probe(code: str) -> dict[str, Any]:
+    completed = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True, cwd=ROOT
+    )
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def summarize(samples: list[dict[str, Any]]) -> dict[str, Any]:
+    """Median of each timing across samples; other fields are taken from the last sample."""
+    summary = dict(samples[-1])
+    for key, value in samples[-1].items():
+        if key.endswith("_s"):
+            summary[key] = statistics.median(sample[key] for sample in samples)
+    return summary
+
+
+def run_benchmark(runs: int, timeout: float) -> dict[str, Any]:
+    imports = summarize(
+        [probe(IMPORT_PROBE.format(root=str(ROOT), map_modules=MAP_MODULES)) for _ in range(runs)]
+    )
+    tabs = {
+        tab: summarize(
+            [
+                probe(
+                    TAB_PROBE.format(app=str(ROOT / "app.py"), timeout=timeout, tab=tab, map_modules=MAP_MODULES)
+                )
+                for _ in range(runs)
+            ]
+        )
+        for tab in TABS
+    }
+    return {
+        "config": {"runs": runs, "python": platform.python_version(), "machine": platform.machine()},
+        "imports": imports,
+        "tabs": tabs,
+    }
+
+
+def print_report(report: dict[str, Any]) -> None:
+    imports = report["imports"]
+    print(f"Median of {report['config']['runs']} fresh processes")
+    print(f"  import streamlit     {imports['streamlit_s'] * 1000:8.0f} ms")
+    print(f"  import app           {imports['app_module_s'] * 1000:8.0f} ms")
+    lazy = "deferred" if imports["map_loaded_lazily"] else "paid at import"
+    print(f"  map stack            {imports['map_stack_s'] * 1000:8.0f} ms ({lazy})")
+    print(f"  {'tab':<10} {'first run ms':>12} {'rerun ms':>9}  map loaded")
+    for tab, row in report["tabs"].items():
+        print(f"  {tab:<10} {row['first_run_s'] * 1000:>12.0f} {row['rerun_s'] * 1000:>9.0f}  {'yes' if row['map_imported'] else 'no'}")
+        for exception in row["exceptions"]:
+            print(f"    ! {exception}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=3, help="Fresh processes per measurement.")
+    parser.add_argument("--timeout", type=float, default=120, help="Seconds allowed per script run.")
+    parser.add_argument("--json", help="Also write the report as JSON to this path.")
+    args = parser.parse_args()
+
+    report = run_benchmark(args.runs, args.timeout)
+    print_report(report)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as handle:
+            json.dump(report, handle, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,369 @@
+﻿"""SQLite on-device store for households, visits and triage results."""
+
+from __future__ import annotations
+
+import json
+import math
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Callable, Iterable, Iterator, Mapping, Sequence
+
+from assets.ranking import FILTER_FLAGS, Cursor, RosterCounters, compute_patient_meta, priority_score
+from assets.spatial import DEFAULT_CELL_DEG
+
+DEFAULT_DB_PATH = Path(__file__).resolve().parent.parent / "data" / "chw_copilot.db"
+# Households are bucketed on the same grid the in-memory spatial index uses.
+GEO_BUCKET_DEG = DEFAULT_CELL_DEG
+INSERT_BATCH = 5000
+
+# One column per Home filter flag, named after the meta flag; each gets a partial index in rank order.
+FLAG_COLUMNS = tuple(FILTER_FLAGS.values())
+# rank is each household's position in this order, stored at load so pages are index range scans.
+RANK_ORDER = "priority DESC, pseudonym, pos"
+
+
+def _floor_sql(expr: str) -> str:
+    # floor() is only present when SQLite is built with math functions.
+    return f"(CAST({expr} AS INTEGER) - ({expr} < CAST({expr} AS INTEGER)))"
+
+
+HOUSEHOLDS_TABLE = f"""
+CREATE TABLE IF NOT EXISTS households (
+    pos INTEGER PRIMARY KEY,
+    id TEXT NOT NULL UNIQUE,
+    pseudonym TEXT NOT NULL,
+    status TEXT,
+    due_category TEXT,
+    due_date TEXT,
+    overdue_days INTEGER NOT NULL,
+    priority INTEGER NOT NULL,
+    rank INTEGER NOT NULL DEFAULT 0,
+    {", ".join(f"{column} INTEGER NOT NULL" for column in FLAG_COLUMNS)},
+    lat REAL NOT NULL,
+    lon REAL NOT NULL,
+    geo_lat INTEGER NOT NULL,
+    geo_lon INTEGER NOT NULL,
+    record TEXT NOT NULL
+);
+"""
+
+# Built after a bulk load rather than maintained row by row during it.
+HOUSEHOLDS_INDEXES = f"""
+CREATE INDEX IF NOT EXISTS idx_households_status ON households(status);
+CREATE INDEX IF NOT EXISTS idx_households_due_date ON households(due_date);
+CREATE INDEX IF NOT EXISTS idx_households_geo ON households(geo_lat, geo_lon);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_households_rank ON households(rank);
+{"".join(
+    f"CREATE INDEX IF NOT EXISTS idx_households_rank_{column} ON households(rank) WHERE {column} = 1;"
+    for column in FLAG_COLUMNS
+)}
+"""
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS settings (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS visits (
+    id INTEGER PRIMARY KEY,
+    household_id TEXT NOT NULL,
+    recorded_at TEXT NOT NULL,
+    fields TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_visits_household ON visits(household_id, id);
+CREATE TABLE IF NOT EXISTS triage_results (
+    id INTEGER PRIMARY KEY,
+    visit_id INTEGER NOT NULL REFERENCES visits(id),
+    household_id TEXT NOT NULL,
+    classification TEXT NOT NULL,
+    color TEXT,
+    reasons TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_triage_results_household ON triage_results(household_id, id);
+CREATE TABLE IF NOT EXISTS triage_runs (
+    id INTEGER PRIMARY KEY,
+    recorded_at TEXT NOT NULL,
+    households INTEGER NOT NULL,
+    seconds REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS batch_triage (
+    run_id INTEGER NOT NULL REFERENCES triage_runs(id),
+    household_id TEXT NOT NULL,
+    urgency INTEGER NOT NULL,
+    classification TEXT NOT NULL,
+    color TEXT NOT NULL,
+    reasons TEXT NOT NULL,
+    rr_delta INTEGER,
+    PRIMARY KEY (run_id, household_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_batch_triage_urgency ON batch_triage(run_id, urgency DESC);
+"""
+
+
+def due_date(meta: Mapping[str, Any], today: date) -> str | None:
+    if meta["overdue"]:
+        return (today - timedelta(days=meta["overdue_days"])).isoformat()
+    if meta["due_today"]:
+        return today.isoformat()
+    return None
+
+
+def roster_signature(base_count: int, n: int, seed: int) -> str:
+    return f"households-v3:{base_count}:{n}:{seed}"
+
+
+def open_roster_db(path: str, records: Sequence[Mapping[str, Any]], signature: str, today: date) -> "RosterDB":
+    """Open (creating if needed) the store at path; households are reloaded only when the signature changes."""
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    db = RosterDB(path)
+    if db.setting("roster_signature") != signature:
+        db.load_households(records, compute_patient_meta, signature, today)
+    return db
+
+
+class RosterDB:
+    """Roster and visit history in one SQLite file (WAL mode) behind a single shared connection.
+
+    Streamlit runs most reruns on a new thread, so a connection per thread would pile up; every
+    statement instead holds the lock until its rows are read.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA foreign_keys=ON")
+        with self.connection() as conn, conn:
+            # Household indexes come with load_households, which runs whenever the layout or roster changes.
+            conn.executescript(SCHEMA + HOUSEHOLDS_TABLE)
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        with self._lock:
+            yield self._conn
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def setting(self, key: str) -> str | None:
+        with self.connection() as conn:
+            row = conn.execute("SELECT value FROM settings WHERE key = ?", (key,)).fetchone()
+        return None if row is None else row[0]
+
+    def load_households(
+        self,
+        patients: Iterable[Mapping[str, Any]],
+        meta: Callable[[Mapping[str, Any]], Mapping[str, Any]],
+        signature: str,
+        today: date,
+    ) -> None:
+        """Rebuild the household table and its indexes; visits and triage results are kept."""
+        columns = ["pos", "id", "pseudonym", "status", "due_category", "due_date", "overdue_days", "priority"]
+        columns += [*FLAG_COLUMNS, "lat", "lon", "geo_lat", "geo_lon", "record"]
+        insert = f"INSERT INTO households ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})"
+
+        with self.connection() as conn:
+            # Dropped rather than emptied so a store written by an older layout picks up the current columns.
+            conn.executescript("DROP TABLE IF EXISTS households;" + HOUSEHOLDS_TABLE)
+            counters = RosterCounters()
+            with conn:
+                batch = []
+                for pos, patient in enumerate(patients):
+                    info = meta(patient)
+                    counters.apply(None, info)
+                    batch.append(
+                        (
+                            pos,
+                            patient["id"],
+                            patient["pseudonym"],
+                            patient.get("status"),
+                            patient.get("due_category"),
+                            due_date(info, today),
+                            info["overdue_days"],
+                            priority_score(info),
+                            *(int(info[flag]) for flag in FLAG_COLUMNS),
+                            patient["lat"],
+                            patient["lon"],
+                            math.floor(patient["lat"] / GEO_BUCKET_DEG),
+                            math.floor(patient["lon"] / GEO_BUCKET_DEG),
+                            json.dumps(dict(patient), default=dict),
+                        )
+                    )
+                    if len(batch) >= INSERT_BATCH:
+                        conn.executemany(insert, batch)
+                        batch.clear()
+                conn.executemany(insert, batch)
+                conn.execute(
+                    "UPDATE households SET rank = ordered.rank FROM ("
+                    f"SELECT pos, ROW_NUMBER() OVER (ORDER BY {RANK_ORDER}) - 1 AS rank FROM households"
+                    ") AS ordered WHERE households.pos = ordered.pos"
+                )
+            conn.executescript(HOUSEHOLDS_INDEXES)
+            with conn:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)",
+                    [("roster_counts", json.dumps(counters.to_json())), ("roster_signature", signature)],
+                )
+
+    def count(self, filter_name: str = "All") -> int:
+        column = FILTER_FLAGS.get(filter_name)
+        where = f"WHERE {column} = 1" if column else ""
+        with self.connection() as conn:
+            return conn.execute(f"SELECT COUNT(*) FROM households {where}").fetchone()[0]
+
+    def counters(self) -> RosterCounters:
+        """Per-flag household totals recorded when the households were loaded."""
+        return RosterCounters.from_json(json.loads(self.setting("roster_counts")))
+
+    def get(self, patient_id: str) -> dict[str, Any] | None:
+        with self.connection() as conn:
+            row = conn.execute("SELECT record FROM households WHERE id = ?", (patient_id,)).fetchone()
+        return None if row is None else json.loads(row[0])
+
+    def search(self, query: str, limit: int) -> list[str]:
+        """Ids of households whose id or pseudonym contains query (case-insensitive): an exact id first, then priority order."""
+        pattern = "%" + query.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+        with self.connection() as conn:
+            rows = conn.execute(
+                "SELECT id FROM households WHERE id LIKE ?1 ESCAPE '\\' OR pseudonym LIKE ?1 ESCAPE '\\' "
+                "ORDER BY id != ?3, rank LIMIT ?2",
+                (pattern, limit, query),
+            ).fetchall()
+        return [patient_id for (patient_id,) in rows]
+
+    def page(self, filter_name: str, cursor: Cursor | None, limit: int) -> tuple[list[dict[str, Any]], Cursor | None]:
+        """Same contract as RosterRanking.page, returning records; each section is a range scan on a rank index."""
+        column = FILTER_FLAGS.get(filter_name)
+        sections = ["1"] if column is None else [f"{column} = 1", f"{column} = 0"]
+        section, after = cursor or (0, -1)
+
+        rows: list[tuple[int, int, str]] = []
+        # Reading one row past the page tells whether another page exists.
+        with self.connection() as conn:
+            for index in range(section, len(sections)):
+                fetched = conn.execute(
+                    f"SELECT rank, record FROM households WHERE {sections[index]} AND rank > ? ORDER BY rank LIMIT ?",
+                    (after if index == section else -1, limit + 1 - len(rows)),
+                )
+                rows += [(index, rank, record) for rank, record in fetched]
+                if len(rows) > limit:
+                    break
+
+        records = [json.loads(record) for _, _, record in rows[:limit]]
+        if len(rows) <= limit:
+            return records, None
+        index, rank, _ = rows[limit - 1]
+        return records, (index, rank)
+
+    def centroid(self) -> tuple[float, float]:
+        with self.connection() as conn:
+            return conn.execute("SELECT AVG(lat), AVG(lon) FROM households").fetchone()
+
+    def clusters(
+        self,
+        bounds: tuple[float, float, float, float] | None,
+        cell_deg: float,
+        exclude_ids: Iterable[str] = (),
+    ) -> list[tuple[int, float, float, dict[str, Any] | None]]:
+        """Group households in the viewport into cell_deg cells.
+
+        Returns (count, lat, lon, record) per cell in roster order; record is set only for single households.
+        """
+        where = []
+        params: list[Any] = [cell_deg, cell_deg]
+        if bounds is not None:
+            south, west, north, east = bounds
+            where.append("geo_lat BETWEEN ? AND ? AND geo_lon BETWEEN ? AND ?")
+            params += [
+                math.floor(south / GEO_BUCKET_DEG),
+                math.floor(north / GEO_BUCKET_DEG),
+                math.floor(west / GEO_BUCKET_DEG),
+                math.floor(east / GEO_BUCKET_DEG),
+            ]
+            where.append("lat BETWEEN ? AND ? AND lon BETWEEN ? AND ?")
+            params += [south, north, west, east]
+        excluded = list(exclude_ids)
+        if excluded:
+            where.append(f"id NOT IN ({', '.join('?' * len(excluded))})")
+            params += excluded
+
+        with self.connection() as conn:
+            rows = conn.execute(
+                f"""
+                SELECT COUNT(*), AVG(lat), AVG(lon), CASE WHEN COUNT(*) = 1 THEN MIN(record) END
+                FROM (
+                    SELECT pos, lat, lon, record, lat / ? AS cell_lat, lon / ? AS cell_lon
+                    FROM households
+                    {"WHERE " + " AND ".join(where) if where else ""}
+                )
+                GROUP BY {_floor_sql("cell_lat")}, {_floor_sql("cell_lon")}
+                ORDER BY MIN(pos)
+                """,
+                params,
+            ).fetchall()
+        return [(count, lat, lon, json.loads(record) if record else None) for count, lat, lon, record in rows]
+
+    def record_visit(self, household_id: str, fields: Mapping[str, Any], triage: Mapping[str, Any]) -> int:
+        """Store one completed visit and its triage result; returns the visit id."""
+        with self.connection() as conn, conn:
+            visit_id = conn.execute(
+                "INSERT INTO visits (household_id, recorded_at, fields) VALUES (?, ?, ?)",
+                (household_id, datetime.now(timezone.utc).isoformat(timespec="seconds"), json.dumps(dict(fields))),
+            ).lastrowid
+            conn.execute(
+                "INSERT INTO triage_results (visit_id, household_id, classification, color, reasons) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (
+                    visit_id,
+                    household_id,
+                    triage.get("classification", ""),
+                    triage.get("color"),
+                    json.dumps(list(triage.get("reasons", []))),
+                ),
+            )
+        return visit_id
+
+    def write_batch_triage(self, rows: Iterable[tuple[Any, ...]], households: int, seconds: float) -> int:
+        """Store one batch triage run in a single transaction; rows come from triage.triage_rows()."""
+        with self.connection() as conn, conn:
+            run_id = conn.execute(
+                "INSERT INTO triage_runs (recorded_at, households, seconds) VALUES (?, ?, ?)",
+                (datetime.now(timezone.utc).isoformat(timespec="seconds"), households, seconds),
+            ).lastrowid
+            insert = (
+                "INSERT INTO batch_triage (run_id, household_id, urgency, classification, color, reasons, rr_delta) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)"
+            )
+            batch = []
+            for row in rows:
+                batch.append((run_id, *row))
+                if len(batch) >= INSERT_BATCH:
+                    conn.executemany(insert, batch)
+                    batch.clear()
+            conn.executemany(insert, batch)
+        return run_id
+
+    def batch_triage_top(self, run_id: int, limit: int) -> list[dict[str, Any]]:
+        with self.connection() as conn:
+            rows = conn.execute(
+                "SELECT household_id, urgency, classification, color, reasons, rr_delta FROM batch_triage "
+                "WHERE run_id = ? ORDER BY urgency DESC, household_id LIMIT ?",
+                (run_id, limit),
+            ).fetchall()
+        return [
+            {
+                "household_id": household_id,
+                "urgency": urgency,
+                "classification": classification,
+                "color": color,
+                "reasons": json.loads(reasons),
+                "rr_delta": rr_delta,
+            }
+            for household_id, urgency, classification, color, reasons, rr_delta in rows
+        ]
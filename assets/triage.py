@@ -0,0 +1,167 @@
+﻿"""Headless batch triage: urgency and classification for every household's current visit.
+
+Re-triage the on-device roster without Streamlit:
+
+    python -m assets.triage --households 100000 --top 10
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import time
+from typing import Any, Iterator, Mapping, Sequence
+
+import numpy as np
+
+from assets.guideline import AGE_FIELD, CLASSIFICATIONS, GUIDELINE, GuidelineEngine
+from assets.records import CompactRoster
+
+URGENT_RR = 50
+
+
+def score_urgency(patient: Mapping[str, Any], current_fields: Mapping[str, Any] | None = None) -> int:
+    score = 0
+    if patient.get("status") == "urgent follow-up":
+        score += 2
+    fields = current_fields or patient.get("current_visit_seed", {})
+    if fields.get("danger_sign"):
+        score += 2
+    if fields.get("chest_indrawing"):
+        score += 1
+    if (fields.get("rr") or 0) >= URGENT_RR:
+        score += 1
+    return score
+
+
+def urgency_columns(status_urgent: np.ndarray, danger_sign: np.ndarray, chest_indrawing: np.ndarray, rr: np.ndarray) -> np.ndarray:
+    """score_urgency over whole columns."""
+    return (2 * status_urgent + 2 * danger_sign + chest_indrawing + (rr >= URGENT_RR)).astype(np.int64)
+
+
+def batch_urgency(
+    patients: Sequence[Mapping[str, Any]], current_rows: Sequence[Mapping[str, Any] | None] | None = None
+) -> np.ndarray:
+    """score_urgency for many households at once; current_rows[i] overrides patient i's seeded current visit."""
+    current_rows = current_rows or [None] * len(patients)
+    fields = [current or patient.get("current_visit_seed", {}) for patient, current in zip(patients, current_rows)]
+    n = len(patients)
+    return urgency_columns(
+        np.fromiter((patient.get("status") == "urgent follow-up" for patient in patients), dtype=bool, count=n),
+        np.fromiter((bool(row.get("danger_sign")) for row in fields), dtype=bool, count=n),
+        np.fromiter((bool(row.get("chest_indrawing")) for row in fields), dtype=bool, count=n),
+        np.fromiter((row.get("rr") or 0 for row in fields), dtype=np.float64, count=n),
+    )
+
+
+def _numeric_column(records: CompactRoster, name: str) -> tuple[np.ndarray, np.ndarray]:
+    try:
+        return records.numeric_column(name)
+    except KeyError:
+        # A finding the roster never records (e.g. seizures) is absent for every household.
+        return np.zeros(len(records)), np.zeros(len(records), dtype=bool)
+
+
+def _fields_column(rows: list[Mapping[str, Any]], key: str) -> tuple[np.ndarray, np.ndarray]:
+    values = [fields.get(key) for fields in rows]
+    present = np.fromiter((value is not None for value in values), dtype=bool, count=len(rows))
+    return np.fromiter((value or 0 for value in values), dtype=np.float64, count=len(rows)), present
+
+
+def visit_arrays(records: Sequence[Mapping[str, Any]], engine: GuidelineEngine = GUIDELINE) -> dict[str, Any]:
+    """Current-visit findings as (values, present) NumPy columns keyed by field, plus the inputs for
+    urgency and RR delta; a CompactRoster is read without decoding rows."""
+    if isinstance(records, CompactRoster):
+        columns = {key: _numeric_column(records, f"current_visit_seed.{key}") for key in engine.findings}
+        columns[AGE_FIELD] = _numeric_column(records, AGE_FIELD)
+        last_rr = _numeric_column(records, "last_visit_fields.rr")
+        statuses = records.column("status")
+        ids: Sequence[str] = records.ids
+    else:
+        current = [patient.get("current_visit_seed") or {} for patient in records]
+        columns = {key: _fields_column(current, key) for key in engine.findings}
+        columns[AGE_FIELD] = _fields_column(records, AGE_FIELD)
+        last_rr = _fields_column([patient.get("last_visit_fields") or {} for patient in records], "rr")
+        statuses = [patient.get("status") for patient in records]
+        ids = [patient["id"] for patient in records]
+    return {
+        "ids": ids,
+        "columns": columns,
+        "last_rr": last_rr,
+        "status_urgent": np.array([status == "urgent follow-up" for status in statuses], dtype=bool),
+    }
+
+
+def batch_triage(records: Sequence[Mapping[str, Any]], engine: GuidelineEngine = GUIDELINE) -> dict[str, Any]:
+    """Urgency, classification code, guideline outcome and RR delta for every household, vectorized."""
+    a = visit_arrays(records, engine)
+    columns = a["columns"]
+    n = len(a["ids"])
+    rr, rr_present = columns["rr"]
+    rr = np.where(rr_present, rr, 0)
+    danger_sign = columns["danger_sign"][0].astype(bool)
+    indrawing = columns["chest_indrawing"][0].astype(bool)
+
+    urgency = urgency_columns(a["status_urgent"], danger_sign, indrawing, rr)
+    outcome = engine.evaluate_columns(columns, n)
+
+    last_rr, last_rr_present = a["last_rr"]
+    with_delta = rr_present & last_rr_present & (outcome != engine.pending)
+    rr_delta = np.where(with_delta, rr - last_rr, np.nan)
+
+    return {
+        "ids": a["ids"],
+        "urgency": urgency,
+        "classification": engine.outcome_codes[outcome],
+        "outcome": outcome,
+        "rr_delta": rr_delta,
+    }
+
+
+def triage_rows(
+    result: dict[str, Any], engine: GuidelineEngine = GUIDELINE
+) -> Iterator[tuple[str, int, str, str, str, int | None]]:
+    """(household_id, urgency, classification, color, reasons JSON, rr_delta) rows for a bulk insert."""
+    reason_json = [json.dumps(outcome["reasons"]) for outcome in engine.outcomes]
+    deltas = [None if np.isnan(delta) else int(delta) for delta in result["rr_delta"].tolist()]
+    for patient_id, urgency, outcome, delta in zip(result["ids"], result["urgency"].tolist(), result["outcome"].tolist(), deltas):
+        triage = engine.outcomes[outcome]
+        yield patient_id, urgency, triage["classification"], triage["color"], reason_json[outcome], delta
+
+
+def main() -> None:
+    from assets.generator import REF_DATE, build_roster_records
+    from assets.patients import PATIENTS
+    from assets.storage import DEFAULT_DB_PATH, open_roster_db, roster_signature
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--db", default=os.environ.get("CHW_ROSTER_DB", str(DEFAULT_DB_PATH)))
+    parser.add_argument("--households", type=int, default=int(os.environ.get("CHW_DUMMY_HOUSEHOLDS", "18")))
+    parser.add_argument("--seed", type=int, default=int(os.environ.get("CHW_DUMMY_SEED", "42")))
+    parser.add_argument("--top", type=int, default=10, help="Print this many households by urgency.")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    records = build_roster_records(PATIENTS, n=args.households, seed=args.seed)
+    signature = roster_signature(len(PATIENTS), args.households, args.seed)
+    db = open_roster_db(args.db, records, signature, today=REF_DATE)
+    loaded = time.perf_counter()
+
+    result = batch_triage(records)
+    triaged = time.perf_counter()
+    run_id = db.write_batch_triage(triage_rows(result), households=len(records), seconds=triaged - loaded)
+    written = time.perf_counter()
+
+    print(f"Run {run_id}: {len(records)} households")
+    print(f"  load {loaded - started:.2f}s, triage {triaged - loaded:.3f}s, write {written - triaged:.2f}s")
+    counts = np.bincount(result["classification"], minlength=len(CLASSIFICATIONS))
+    for (label, _), count in zip(CLASSIFICATIONS, counts.tolist()):
+        print(f"  {label:<24} {count}")
+    for row in db.batch_triage_top(run_id, args.top):
+        print(f"  {row['household_id']:<10} urgency {row['urgency']}  {row['classification']}  {', '.join(row['reasons'])}")
+    db.close()
+
+
+if __name__ == "__main__":
+    main()
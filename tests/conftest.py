@@ -0,0 +1,35 @@
+"""Households shared by the test modules: the demo roster plus a fixed generated one."""
+
+from __future__ import annotations
+
+from collections.abc import Mapping
+
+import pytest
+
+from assets.generator import build_roster_records, generate_dummy_patients
+from assets.patients import PATIENTS
+
+DUMMY_HOUSEHOLDS = 1_000
+DUMMY_SEED = 7
+
+
+@pytest.fixture(scope="session")
+def patients():
+    # Few distinct pseudonyms, so ties on (priority, pseudonym) exercise the ranking's stable sort.
+    return PATIENTS + generate_dummy_patients(PATIENTS, n=DUMMY_HOUSEHOLDS, seed=DUMMY_SEED)
+
+
+@pytest.fixture(scope="session")
+def records():
+    """The same households built column-wise, as the app loads them."""
+    return build_roster_records(PATIENTS, n=DUMMY_HOUSEHOLDS, seed=DUMMY_SEED)
+
+
+@pytest.fixture(scope="session")
+def plain():
+    """Turns a compact record view back into the dict it was built from."""
+
+    def plain(record):
+        return {key: dict(value) if isinstance(value, Mapping) else value for key, value in record.items()}
+
+    return plain
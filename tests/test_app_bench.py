@@ -0,0 +1,14 @@
+"""The app benchmark's memory figures must track the app, not the AppTest harness."""
+
+from __future__ import annotations
+
+from assets.app_bench import bench_size, environ, harness_baseline, memory_grows, shared_script_cache
+
+
+def test_cold_start_memory_grows_with_the_roster(tmp_path):
+    with shared_script_cache(), environ(CHW_ROSTER_DB=str(tmp_path / "bench.db")):
+        baseline = harness_baseline(60)
+        results = [row for households in (24, 5_000) for row in bench_size(households, 1, 120, baseline)]
+
+    assert all(row["exceptions"] == [] for row in results)
+    assert memory_grows(results)
@@ -0,0 +1,53 @@
+"""batch_deltas must give every household exactly what compute_deltas gives it."""
+
+from __future__ import annotations
+
+import random
+
+import pytest
+
+from assets.conversation import DELTA_FLAGS, batch_deltas, compute_deltas
+from assets.generator import generate_dummy_patients
+from assets.patients import PATIENTS
+
+FLAG_CHOICES = [True, False, None, "yes", 0, 1]
+RR_CHOICES = [None, 30, 30.5, 44, 48.5, 52]
+
+
+def random_fields(rng):
+    fields = {key: rng.choice(FLAG_CHOICES) for key in DELTA_FLAGS if rng.random() < 0.8}
+    if rng.random() < 0.9:
+        fields["rr"] = rng.choice(RR_CHOICES)
+    return fields
+
+
+def assert_matches_compute_deltas(last_rows, current_rows):
+    deltas = batch_deltas(last_rows, current_rows)
+    for row, (last, current) in enumerate(zip(last_rows, current_rows)):
+        expected = compute_deltas(last, current)
+        assert {key: deltas[key][row] for key in deltas} == expected
+        assert type(deltas["rr_delta"][row]) is type(expected["rr_delta"])
+
+
+def test_random_rows_match_compute_deltas():
+    rng = random.Random(2)
+    last_rows = [rng.choice([None, {}, random_fields(rng)]) for _ in range(2_000)]
+    current_rows = [random_fields(rng) for _ in range(2_000)]
+    assert_matches_compute_deltas(last_rows, current_rows)
+
+
+def test_roster_visits_match_compute_deltas():
+    patients = PATIENTS + generate_dummy_patients(PATIENTS, n=500, seed=6)
+    assert_matches_compute_deltas(
+        [patient.get("last_visit_fields") for patient in patients],
+        [patient.get("current_visit_seed") or {} for patient in patients],
+    )
+
+
+@pytest.mark.parametrize(("last_rr", "current_rr", "delta"), [(30, 48.5, 18.5), (48.5, 30, -18.5), (44, 52, 8)])
+def test_rr_delta_keeps_fractions(last_rr, current_rr, delta):
+    assert batch_deltas([{"rr": last_rr}], [{"rr": current_rr}])["rr_delta"] == [delta]
+
+
+def test_empty_batch():
+    assert batch_deltas([], []) == {"rr_delta": [], **{key: [] for key in DELTA_FLAGS}}
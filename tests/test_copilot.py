@@ -0,0 +1,68 @@
+"""OpenAICompatBackend against the local mock server: streamed text, keep-alive reuse and dropped replies."""
+
+from __future__ import annotations
+
+import threading
+import time
+
+import pytest
+
+from assets.copilot import CopilotBackendError, OpenAICompatBackend
+from assets.mock_server import MockServer
+
+REPLY = "Check for chest indrawing, then count the breaths for one full minute."
+
+
+@pytest.fixture
+def server():
+    server = MockServer(tokens_per_sec=0, ttft=0, reply=REPLY).start()
+    yield server
+    server.stop()
+
+
+def wait_until(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+def test_stream_returns_the_reply_text(server):
+    backend = OpenAICompatBackend(server.base_url, server.model)
+    assert "".join(backend.stream({})) == REPLY
+    assert "".join(backend.stream({"extra_body": {"mock_reply": "Refer now."}})) == "Refer now."
+    backend.close()
+
+
+def test_replies_reuse_one_connection(server):
+    backend = OpenAICompatBackend(server.base_url, server.model)
+    for _ in range(5):
+        assert "".join(backend.stream({})) == REPLY
+    assert server.requests_served == 5
+    assert server.connections_opened == 1
+    backend.close()
+
+
+def test_a_reply_cut_off_mid_stream_raises():
+    server = MockServer(tokens_per_sec=20, ttft=0, reply=REPLY).start()
+    backend = OpenAICompatBackend(server.base_url, server.model)
+    chunks = backend.stream({})
+    assert next(chunks) == "Check "
+
+    server.stop()
+    with pytest.raises(CopilotBackendError):
+        list(chunks)
+    backend.close()
+
+
+def test_stop_ends_idle_keep_alive_handlers():
+    before = set(threading.enumerate())
+    server = MockServer(tokens_per_sec=0, ttft=0, reply=REPLY).start()
+    backend = OpenAICompatBackend(server.base_url, server.model)
+    assert "".join(backend.stream({})) == REPLY
+
+    # The pooled connection is still open, so its handler thread is waiting for the next request.
+    assert len(set(threading.enumerate()) - before) == 2
+    server.stop()
+    assert wait_until(lambda: not set(threading.enumerate()) - before)
+    backend.close()
@@ -0,0 +1,108 @@
+"""The compiled guideline must reproduce the scripted triage and the hand-written batch rules it replaced."""
+
+from __future__ import annotations
+
+import itertools
+import random
+
+import pytest
+
+from assets import conversation
+from assets.guideline import GUIDELINE, PENDING_REASON
+from assets.patients import PATIENTS
+from assets.scenario import SCENARIO_STEPS
+from assets.triage import batch_triage
+
+SCRIPTED_STEP_ID = 13
+SCRIPTED_RESULT = {
+    "classification": "URGENT REFERRAL",
+    "color": "red",
+    "reasons": ["Danger sign present", "Respiratory distress"],
+}
+PENDING_RESULT = {"classification": "Pending", "color": "yellow", "reasons": [PENDING_REASON]}
+
+
+def old_batch_rules(fields, age_months):
+    """The classification and reasons the vectorized triage computed before the decision table."""
+    if not fields:
+        return PENDING_RESULT
+    danger = bool(fields.get("danger_sign") or fields.get("unable_to_drink") or fields.get("vomiting_everything"))
+    indrawing = bool(fields.get("chest_indrawing"))
+    rr = fields.get("rr")
+    fast = rr is not None and rr >= (50 if (age_months or 0) < 12 else 40)
+    reasons = [
+        reason
+        for reason, fired in (
+            ("Danger sign present", danger),
+            ("Respiratory distress", indrawing),
+            ("Fast breathing for age", fast and not indrawing),
+            ("No danger signs or fast breathing", not danger and not indrawing and not fast),
+        )
+        if fired
+    ]
+    if danger or indrawing:
+        return {"classification": "URGENT REFERRAL", "color": "red", "reasons": reasons}
+    if fast:
+        return {"classification": "CLINIC REVIEW TODAY", "color": "yellow", "reasons": reasons}
+    return {"classification": "HOME CARE & FOLLOW-UP", "color": "green", "reasons": reasons}
+
+
+@pytest.fixture(scope="module")
+def households(patients):
+    # Ages and rates on either side of every fast-breathing threshold.
+    grid = [
+        {
+            "id": f"g{pos}",
+            "age_months": age,
+            "status": "normal follow-up",
+            "current_visit_seed": {
+                "rr": rr,
+                "danger_sign": danger,
+                "unable_to_drink": False,
+                "vomiting_everything": False,
+                "chest_indrawing": indrawing,
+            },
+        }
+        for pos, (age, rr, danger, indrawing) in enumerate(
+            itertools.product([5, 11, 12, 59, 60, 70], [None, 39, 40, 49, 50], [False, True], [False, True, None])
+        )
+    ]
+    return patients + grid
+
+
+@pytest.mark.parametrize("patient", PATIENTS, ids=lambda patient: patient["id"])
+def test_scenario_replay_matches_the_scripted_result(patient):
+    state = conversation.HeadlessState()
+    conversation.seek(state, -1, patient)
+    assert state.triage_result == PENDING_RESULT
+
+    for step in SCENARIO_STEPS:
+        conversation.apply_step(state, step, step["text"], now=0.0)
+        expected = SCRIPTED_RESULT if step["id"] >= SCRIPTED_STEP_ID else PENDING_RESULT
+        assert state.triage_result == expected, f"step {step['id']}"
+
+
+def test_scalar_evaluation_matches_the_old_rules(households):
+    for patient in households:
+        fields = patient.get("current_visit_seed") or {}
+        state = {**fields, "age_months": patient.get("age_months")}
+        assert GUIDELINE.evaluate(state) == old_batch_rules(fields, patient.get("age_months")), patient["id"]
+
+
+def test_batch_evaluation_matches_the_scalar_path(households):
+    result = batch_triage(households)
+    for patient, outcome in zip(households, result["outcome"].tolist()):
+        state = {**(patient.get("current_visit_seed") or {}), "age_months": patient.get("age_months")}
+        assert GUIDELINE.outcomes[outcome] == GUIDELINE.evaluate(state), patient["id"]
+
+
+def test_incremental_session_matches_a_full_evaluation(households):
+    rng = random.Random(8)
+    for patient in rng.sample(households, 200):
+        final = {**(patient.get("current_visit_seed") or {}), "age_months": patient.get("age_months")}
+        session = GUIDELINE.session({"age_months": None})
+        fields = list(final.items())
+        rng.shuffle(fields)
+        for field, value in fields:
+            session.update({field: value})
+        assert session.result == GUIDELINE.evaluate(final), patient["id"]
@@ -0,0 +1,82 @@
+"""RosterRanking must order households exactly like the original sorted(key=(-priority, pseudonym))."""
+
+from __future__ import annotations
+
+import pytest
+
+from assets.ranking import FILTER_FLAGS, RankingOverlay, RosterRanking, compute_patient_meta, priority_score
+
+
+@pytest.fixture(scope="module")
+def ranking(patients):
+    return RosterRanking(patients, compute_patient_meta)
+
+
+def reference_order(patients):
+    return sorted(range(len(patients)), key=lambda i: (-priority_score(compute_patient_meta(patients[i])), patients[i]["pseudonym"]))
+
+
+def test_order_key_matches_sorted(patients, ranking):
+    assert ranking.order.tolist() == reference_order(patients)
+    assert [ranking.scores[i] for i in ranking.order] == sorted(ranking.scores.tolist(), reverse=True)
+
+
+def list_order(patients, filter_name):
+    """Filter matches in priority order, then (for flag filters) everyone else."""
+    order = reference_order(patients)
+    flag = FILTER_FLAGS.get(filter_name)
+    matched = [i for i in order if flag is None or compute_patient_meta(patients[i])[flag]]
+    return matched + [i for i in order if i not in set(matched)]
+
+
+@pytest.mark.parametrize("limit", [1, 6, 50, 10_000])
+def test_first_page_is_a_prefix_of_the_order(patients, ranking, limit):
+    positions, cursor = ranking.page("All", None, limit)
+    assert positions.tolist() == reference_order(patients)[:limit]
+    assert (cursor is None) == (limit >= len(patients))
+
+
+@pytest.mark.parametrize("filter_name", ["All", *FILTER_FLAGS])
+def test_pages_walk_the_whole_list_once(patients, ranking, filter_name):
+    expected = list_order(patients, filter_name)
+    seen, cursor = [], None
+    while True:
+        rows, cursor = ranking.page(filter_name, cursor, 6)
+        seen.extend(rows.tolist())
+        if cursor is None:
+            break
+    assert seen == expected
+
+
+@pytest.fixture(scope="module")
+def edited(patients):
+    """The roster after a session's visits and new households: (every record, overlay rows by position)."""
+    edited = list(patients)
+    edited[3] = {**patients[3], "status": "urgent follow-up"}
+    edited[40] = {**patients[40], "due_category": "overdue", "overdue_days": 5}
+    urgent = next(pos for pos, patient in enumerate(patients) if patient["status"] == "urgent follow-up")
+    edited[urgent] = {**patients[urgent], "status": "normal follow-up"}
+    edited[77] = {**patients[77], "pseudonym": "Aaron Z."}
+    edited += [{**patients[7], "id": "new1"}, {**patients[0], "id": "new2", "status": "urgent follow-up"}]
+
+    positions = [3, 40, urgent, 77, len(patients), len(patients) + 1]
+    rows = {pos: (edited[pos]["pseudonym"], compute_patient_meta(edited[pos])) for pos in positions}
+    return edited, rows
+
+
+@pytest.mark.parametrize("filter_name", ["All", *FILTER_FLAGS])
+@pytest.mark.parametrize("limit", [1, 6, 50])
+def test_overlay_pages_match_a_rebuild(ranking, edited, filter_name, limit):
+    records, rows = edited
+    overlay = RankingOverlay(ranking, rows)
+    rebuilt = RosterRanking(records, compute_patient_meta)
+
+    cursor = None
+    while True:
+        positions, next_cursor = overlay.page(filter_name, cursor, limit)
+        expected, expected_cursor = rebuilt.page(filter_name, cursor, limit)
+        assert positions.tolist() == expected.tolist()
+        assert next_cursor == expected_cursor
+        if next_cursor is None:
+            break
+        cursor = next_cursor
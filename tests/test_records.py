@@ -0,0 +1,58 @@
+"""CompactRoster must hand back exactly the records it was given."""
+
+from __future__ import annotations
+
+import numpy as np
+import pytest
+
+from assets.patients import PATIENTS
+from assets.records import CompactRoster
+
+
+def test_append_round_trips_every_record(patients, plain):
+    roster = CompactRoster(patients)
+    assert len(roster) == len(patients)
+    assert [plain(record) for record in roster] == patients
+    assert roster[-1]["id"] == patients[-1]["id"]
+
+
+def test_column_build_matches_the_dict_generator(patients, records, plain):
+    assert [plain(record) for record in records] == patients
+
+
+def test_values_outside_the_schema_are_kept_verbatim(plain):
+    odd = {
+        **PATIENTS[0],
+        "id": "odd",
+        "age_months": 2**40,
+        "status": 3,
+        "last_visit_fields": {"rr": 48.5, "danger_sign": True},
+        "nickname": "Ami",
+    }
+    roster = CompactRoster([PATIENTS[1], odd])
+    assert plain(roster[1]) == odd
+    assert plain(roster[0]) == PATIENTS[1]
+    assert roster.column("status") == [PATIENTS[1]["status"], 3]
+
+
+def test_absent_fields_stay_absent(plain):
+    sparse = {"id": "s1", "pseudonym": "Sparse", "current_visit_seed": {"rr": 40}}
+    record = CompactRoster([sparse])[0]
+    assert plain(record) == sparse
+    assert "lat" not in record
+    assert record.get("lat", "missing") == "missing"
+    with pytest.raises(KeyError):
+        record["last_visit_fields"]
+
+
+def test_numeric_column_matches_the_records(patients, records):
+    values, present = records.numeric_column("current_visit_seed.rr")
+    expected = [(p.get("current_visit_seed") or {}).get("rr") for p in patients]
+    assert present.tolist() == [value is not None for value in expected]
+    assert np.array_equal(values[present], [value for value in expected if value is not None])
+
+
+def test_views_of_one_row_are_equal_but_not_shared(records):
+    first, again = records[3], records[3]
+    assert first == again and first is not again
+    assert first != records[4]
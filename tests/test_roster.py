@@ -0,0 +1,93 @@
+"""RosterStore serves derived metadata from its per-version cache, and its watchers keep aggregates current."""
+
+from __future__ import annotations
+
+import random
+
+from assets.ranking import META_FLAGS, RosterCounters, compute_patient_meta
+from assets.roster import RosterSnapshot, RosterStore
+
+
+class CountingMeta:
+    """compute_patient_meta that records which households it was asked for."""
+
+    def __init__(self) -> None:
+        self.calls: list[str] = []
+
+    def __call__(self, patient):
+        self.calls.append(patient["id"])
+        return compute_patient_meta(patient)
+
+
+def test_copies_of_a_snapshot_record_share_its_cached_meta(records, plain):
+    store = RosterStore(RosterSnapshot(records))
+    compute = CountingMeta()
+    patient_id = records[5]["id"]
+
+    # A fresh view per lookup, and a plain dict as the database hands back, are all the same household.
+    for patient in (store.get(patient_id), store.get(patient_id), plain(records[5])):
+        assert store.is_current(patient)
+        assert store.meta(patient["id"], compute) == compute_patient_meta(patient)
+    assert compute.calls == [patient_id]
+
+
+def test_only_the_overlay_object_of_an_edited_record_is_current(records):
+    store = RosterStore(RosterSnapshot(records))
+    patient_id = records[5]["id"]
+    before = store.get(patient_id)
+    after = store.update(patient_id, status="visit recorded")
+
+    assert store.get(patient_id) is after and store.is_current(after)
+    assert not store.is_current(before)
+    assert not store.is_current({**after})
+    assert not store.is_current({"id": "not-in-roster"})
+
+
+def test_an_update_invalidates_only_that_records_meta(records):
+    store = RosterStore(RosterSnapshot(records))
+    compute = CountingMeta()
+    edited, other, added = records[5]["id"], records[6]["id"], "new1"
+    store.add({**records[7], "id": added})
+    for patient_id in (edited, other, added):
+        store.meta(patient_id, compute)
+
+    store.update(edited, status="urgent follow-up")
+    store.update(added, status="urgent follow-up")
+    assert (store.version(edited), store.version(other), store.version(added)) == (1, 0, 1)
+
+    compute.calls.clear()
+    for patient_id in (edited, other, added):
+        assert store.meta(patient_id, compute) == compute_patient_meta(store.get(patient_id))
+    assert compute.calls == [edited, added]
+    assert store.meta(edited, compute)["is_urgent"]
+    assert compute.calls == [edited, added]
+
+
+def test_incremental_counters_match_a_full_rescan(records):
+    store = RosterStore(RosterSnapshot(records))
+    counters = RosterCounters()
+    for patient in store:
+        counters.apply(None, compute_patient_meta(patient))
+    # The same wiring as the app's session counters.
+    store.watch(
+        lambda old, new: counters.apply(None if old is None else compute_patient_meta(old), compute_patient_meta(new))
+    )
+
+    rng = random.Random(23)
+    edits = [
+        {"status": "urgent follow-up"},
+        {"status": "normal follow-up", "facility_referral_pending": False},
+        {"due_category": "overdue", "overdue_days": 4},
+        {"due_category": "due_today", "overdue_days": 0},
+        {"last_visit_date": None},
+    ]
+    for step in range(200):
+        if step % 10 == 0:
+            store.add({**rng.choice(records), "id": f"new{step}"})
+        else:
+            patient = rng.choice(list(store))
+            store.update(patient["id"], **rng.choice(edits))
+
+    metas = [compute_patient_meta(patient) for patient in store]
+    assert counters.total == len(metas) == len(records) + 20
+    assert counters.counts == {flag: sum(bool(meta[flag]) for meta in metas) for flag in META_FLAGS}
@@ -0,0 +1,96 @@
+"""Route planning: 2-opt only ever improves the route and stops at a local optimum."""
+
+from __future__ import annotations
+
+import itertools
+
+import numpy as np
+import pytest
+
+from assets import routing
+from assets.routing import nearest_neighbour, plan_route, project_km, route_cost, two_opt
+
+
+class StepClock:
+    """Stands in for the time module so a deadline counts clock reads instead of seconds."""
+
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def perf_counter(self) -> float:
+        self.now += 1
+        return self.now
+
+
+def random_stops(n, seed):
+    rng = np.random.default_rng(seed)
+    lats = -1.95 + rng.normal(0, 0.02, n)
+    lons = 30.06 + rng.normal(0, 0.02, n)
+    priorities = rng.integers(0, 160, n).astype(float)
+    return lats, lons, priorities
+
+
+def problem(n, seed):
+    lats, lons, priorities = random_stops(n, seed)
+    start = (float(lats.mean()), float(lons.mean()))
+    points = project_km(np.array([start[0], *lats]), np.array([start[1], *lons]), start[0])
+    weights = np.concatenate(([0.0], priorities / priorities.sum()))
+    return points, weights
+
+
+def full_cost(points, weights, path, urgency_weight):
+    km, waiting = route_cost(points, weights, path)
+    return km + urgency_weight * waiting
+
+
+@pytest.mark.parametrize("urgency_weight", [0.0, 1.0, 4.0])
+def test_every_extra_move_lowers_the_cost(monkeypatch, urgency_weight):
+    points, weights = problem(60, seed=1)
+    greedy = nearest_neighbour(points, weights * 60, urgency_weight)
+    clock = StepClock()
+    monkeypatch.setattr(routing, "time", clock)
+
+    costs, moves = [], []
+    # The clock is read once per pass and once per move, so small budgets stop part-way through.
+    for budget in range(80):
+        path, made = two_opt(points, weights, greedy, urgency_weight, clock.now + budget)
+        costs.append(full_cost(points, weights, path, urgency_weight))
+        moves.append(made)
+    assert moves[0] == 0 and moves[-1] > 1
+    assert len(set(moves)) > 2
+    assert costs[0] == pytest.approx(full_cost(points, weights, greedy, urgency_weight))
+    assert all(later <= earlier + 1e-9 for earlier, later in zip(costs, costs[1:]))
+
+
+@pytest.mark.parametrize("urgency_weight", [0.0, 1.0, 4.0])
+def test_converged_route_has_no_improving_reversal(urgency_weight):
+    points, weights = problem(25, seed=2)
+    greedy = nearest_neighbour(points, weights * 25, urgency_weight)
+    path, _ = two_opt(points, weights, greedy, urgency_weight, float("inf"))
+
+    best = full_cost(points, weights, path, urgency_weight)
+    for i, k in itertools.combinations(range(1, len(path)), 2):
+        candidate = path.copy()
+        candidate[i : k + 1] = candidate[i : k + 1][::-1]
+        assert full_cost(points, weights, candidate, urgency_weight) >= best - 1e-9
+
+
+@pytest.mark.parametrize("n", [0, 1, 2, 200])
+def test_plan_visits_every_stop_once(n):
+    lats, lons, priorities = random_stops(n, seed=3)
+    plan = plan_route(lats.tolist(), lons.tolist(), priorities.tolist(), (-1.95, 30.06))
+    assert sorted(plan["order"]) == list(range(n))
+
+
+def test_distance_only_plan_is_no_longer_than_greedy():
+    lats, lons, priorities = random_stops(200, seed=5)
+    plan = plan_route(lats.tolist(), lons.tolist(), priorities.tolist(), (-1.95, 30.06), urgency_weight=0.0)
+    assert plan["km"] <= plan["greedy_km"] + 1e-9
+    assert plan["km"] == pytest.approx(routing.walk_km(lats[plan["order"]], lons[plan["order"]], (-1.95, 30.06)))
+
+
+def test_zero_priorities_still_plan_a_route():
+    lats, lons, _ = random_stops(30, seed=4)
+    plan = plan_route(lats.tolist(), lons.tolist(), [0.0] * 30, (-1.95, 30.06))
+    assert sorted(plan["order"]) == list(range(30))
+    assert plan["weighted_arrival_km"] == 0.0
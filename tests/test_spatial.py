@@ -0,0 +1,61 @@
+"""GridIndex lookups must return exactly what a scan over every household would."""
+
+from __future__ import annotations
+
+import math
+import random
+
+import pytest
+
+from assets.spatial import CLICK_THRESHOLD_DEG, GridIndex, haversine_km
+
+
+@pytest.fixture(scope="module")
+def index(patients):
+    return GridIndex(patients)
+
+
+def query_points(patients, count=200):
+    rng = random.Random(11)
+    south, north = min(p["lat"] for p in patients), max(p["lat"] for p in patients)
+    west, east = min(p["lon"] for p in patients), max(p["lon"] for p in patients)
+    return [(rng.uniform(south - 0.02, north + 0.02), rng.uniform(west - 0.02, east + 0.02)) for _ in range(count)]
+
+
+def brute_nearest(patients, lat, lon, max_dist=CLICK_THRESHOLD_DEG):
+    best = min(((math.hypot(p["lat"] - lat, p["lon"] - lon), pos) for pos, p in enumerate(patients)), default=None)
+    return patients[best[1]]["id"] if best and best[0] < max_dist else None
+
+
+def test_nearest_matches_a_full_scan(patients, index):
+    for lat, lon in query_points(patients):
+        assert index.nearest(lat, lon) == brute_nearest(patients, lat, lon)
+
+
+def test_nearest_ties_go_to_the_earlier_entry():
+    twins = [{"id": "a", "lat": 1.0, "lon": 2.0}, {"id": "b", "lat": 1.0, "lon": 2.0}]
+    assert GridIndex(twins).nearest(1.0001, 2.0001) == "a"
+    assert GridIndex(twins).nearest(5.0, 5.0) is None
+
+
+@pytest.mark.parametrize("radius_km", [0.2, 0.5, 3.0])
+def test_within_km_matches_a_full_scan(patients, index, radius_km):
+    for lat, lon in query_points(patients, 40):
+        hits = index.within_km(lat, lon, radius_km)
+        expected = sorted(
+            (haversine_km(lat, lon, p["lat"], p["lon"]), pos)
+            for pos, p in enumerate(patients)
+            if haversine_km(lat, lon, p["lat"], p["lon"]) <= radius_km
+        )
+        assert hits == [(patients[pos]["id"], dist) for dist, pos in expected]
+
+
+@pytest.mark.parametrize("span", [0.005, 0.05, 40.0])
+def test_in_bounds_matches_a_full_scan(patients, index, span):
+    # The widest box covers far more cells than are occupied, which takes the occupied-cell path.
+    for lat, lon in query_points(patients, 20):
+        box = (lat - span, lon - span, lat + span, lon + span)
+        expected = [
+            pos for pos, p in enumerate(patients) if box[0] <= p["lat"] <= box[2] and box[1] <= p["lon"] <= box[3]
+        ]
+        assert index.in_bounds(*box) == expected
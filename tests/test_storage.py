@@ -0,0 +1,120 @@
+"""The SQLite store must agree with the in-memory roster and keep visits across reloads."""
+
+from __future__ import annotations
+
+import threading
+import pytest
+
+from assets.generator import REF_DATE
+from assets.patients import PATIENTS
+from assets.ranking import FILTER_FLAGS, META_FLAGS, RosterRanking, compute_patient_meta, priority_score
+from assets.storage import open_roster_db, roster_signature
+
+
+@pytest.fixture(scope="module")
+def ranking(records):
+    return RosterRanking(records, compute_patient_meta)
+
+
+@pytest.fixture
+def db(tmp_path, records):
+    store = open_roster_db(str(tmp_path / "roster.db"), records, "fixture", REF_DATE)
+    yield store
+    store.close()
+
+
+def test_get_returns_the_stored_record(db, records, plain):
+    for record in records[::37]:
+        assert db.get(record["id"]) == plain(record)
+    assert db.get("missing") is None
+
+
+def test_counters_match_the_records(db, records):
+    metas = [compute_patient_meta(record) for record in records]
+    counters = db.counters()
+    assert counters.total == len(records)
+    assert counters.counts == {flag: sum(bool(meta[flag]) for meta in metas) for flag in META_FLAGS}
+    assert all(db.count(name) == counters.filter_count(name) for name in ["All", *FILTER_FLAGS])
+
+
+def test_households_reload_only_when_the_signature_changes(tmp_path, records):
+    path = str(tmp_path / "roster.db")
+    signature = roster_signature(len(PATIENTS), 300, 9)
+    db = open_roster_db(path, records, signature, REF_DATE)
+    db.record_visit("p001", {"rr": 40}, {"classification": "Home care", "color": "green", "reasons": ["ok"]})
+    db.close()
+
+    # Same signature: the stored households are trusted even if the records passed in differ.
+    db = open_roster_db(path, records[:10], signature, REF_DATE)
+    assert db.count() == len(records)
+    db.close()
+
+    db = open_roster_db(path, records[:10], roster_signature(len(PATIENTS), 4, 9), REF_DATE)
+    assert db.count() == 10
+    assert db.setting("roster_signature") == roster_signature(len(PATIENTS), 4, 9)
+    # Visit history survives a household reload.
+    with db.connection() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM visits WHERE household_id = 'p001'").fetchone() == (1,)
+        triage = conn.execute("SELECT classification, color FROM triage_results WHERE household_id = 'p001'")
+        assert triage.fetchall() == [("Home care", "green")]
+    db.close()
+
+
+def test_one_connection_serves_many_threads(db, records):
+    errors = []
+
+    def work(offset):
+        try:
+            for record in records[offset::16]:
+                assert db.get(record["id"])["id"] == record["id"]
+                db.count("Urgent")
+        except Exception as exc:
+            errors.append(exc)
+
+    threads = [threading.Thread(target=work, args=(offset,)) for offset in range(16)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+
+
+@pytest.mark.parametrize("filter_name", ["All", *FILTER_FLAGS])
+@pytest.mark.parametrize("limit", [1, 6, 50])
+def test_pages_match_the_in_memory_ranking(db, records, ranking, filter_name, limit):
+    pages, cursor = 0, None
+    seen = []
+    while True:
+        rows, db_cursor = db.page(filter_name, cursor, limit)
+        positions, expected_cursor = ranking.page(filter_name, cursor, limit)
+        assert [row["id"] for row in rows] == [records[pos]["id"] for pos in positions]
+        assert db_cursor == expected_cursor
+        seen += [row["id"] for row in rows]
+        pages += 1
+        cursor = db_cursor
+        if cursor is None:
+            break
+    # Every household appears exactly once across the pages.
+    assert len(seen) == len(set(seen)) == len(records)
+    assert pages == -(-len(records) // limit)
+
+
+def test_search_matches_ids_and_names(db, records, ranking):
+    name = records[0]["pseudonym"]
+    expected = [records[pos]["id"] for pos in ranking.order if name.lower() in records[pos]["pseudonym"].lower()]
+    assert db.search(name.upper(), 1_000) == expected
+    assert db.search(name, 3) == expected[:3]
+
+
+def test_search_puts_an_exact_id_first(tmp_path):
+    by_priority = sorted(PATIENTS, key=lambda p: priority_score(compute_patient_meta(p)))
+    renamed = [{**by_priority[0], "id": "x1"}, {**by_priority[-1], "id": "x10"}, {**by_priority[2], "id": "x11"}]
+    db = open_roster_db(str(tmp_path / "search.db"), renamed, "search-test", REF_DATE)
+    assert db.search("x1", 5) == ["x1", "x10", "x11"]
+    assert db.search("x", 5) == ["x10", "x11", "x1"]
+    db.close()
+
+
+def test_search_treats_like_wildcards_literally(db):
+    assert db.search("%", 5) == []
+    assert db.search("_", 5) == []
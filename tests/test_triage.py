@@ -0,0 +1,27 @@
+"""Vectorized urgency must score every household exactly like score_urgency."""
+
+from __future__ import annotations
+
+import random
+
+from assets.triage import batch_triage, batch_urgency, score_urgency
+
+
+def test_batch_urgency_matches_score_urgency(patients):
+    assert batch_urgency(patients).tolist() == [score_urgency(patient) for patient in patients]
+
+
+def test_current_rows_override_the_seeded_visit(patients):
+    rng = random.Random(5)
+    visits = [
+        {"rr": rng.choice([None, 49.5, 50, 61]), "danger_sign": rng.random() < 0.5, "chest_indrawing": rng.random() < 0.5}
+        for _ in patients
+    ]
+    current_rows = [rng.choice([None, {}, visit]) for visit in visits]
+    expected = [score_urgency(patient, current) for patient, current in zip(patients, current_rows)]
+    assert batch_urgency(patients, current_rows).tolist() == expected
+
+
+def test_batch_triage_urgency_matches_score_urgency(patients, records):
+    assert batch_triage(records)["urgency"].tolist() == [score_urgency(patient) for patient in patients]
+    assert batch_triage(patients)["urgency"].tolist() == [score_urgency(patient) for patient in patients]